@@ -1,6 +1,5 @@
 import os
 import json
-import requests
 import base64
 from datetime import datetime
 import pytz
@@ -9,27 +8,132 @@ import operator
 
 KST = pytz.timezone('Asia/Seoul')
 from typing import TypedDict, Annotated, List
+import threading
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 # OpenAI 및 LangChain 관련 임포트
-from openai import OpenAI
-from langchain_openai import ChatOpenAI
+# (openai / langchain_openai / langgraph는 무거워서 처음 사용할 때 import - get_* 함수 참고)
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
-from langchain_core.tools import tool
-from langgraph.graph import StateGraph, END
+from langchain_core.tools import StructuredTool
+
+from safety_rules import classify_answer, SAFE, DANGER
+from kakao_client import kakao_client, KakaoAPIError
+from startup import timed
+from metrics import LLM_HTTP_TIMEOUT, llm_call, make_http_client, make_async_http_client, timed_node, tool_latency, record_chat_trace, chat_budget_exhausted, analysis_outcomes, analysis_wasted_tokens
+from analysis_schema import ANALYSIS_JSON_SCHEMA, extract_json, validate_analysis, analysis_error, is_analysis_error
+from model_router import model_router, analysis_looks_confident
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 KAKAO_API_KEY = os.getenv("KAKAO_API_KEY")
 
-# 일반 OpenAI 클라이언트 (analyze_food용)
-client = OpenAI(api_key=OPENAI_API_KEY)
+# 분석/챗봇/안전 검사 모델은 요청마다 model_router가 등급(small/large)으로 고름 (MODEL_TIER_SMALL/MODEL_TIER_LARGE)
+ANALYSIS_RETRY_MODEL = os.getenv("ANALYSIS_RETRY_MODEL", "gpt-4o-mini")          # 빠진 필드만 채우는 텍스트 재시도용
+ANALYSIS_RESPONSE_FORMAT = os.getenv("ANALYSIS_RESPONSE_FORMAT", "json_schema")  # json_schema(strict) 또는 json_object
+SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "gpt-4o-mini")
+
+# 채팅 요청 하나의 실행 예산 (chatbot↔tools, chatbot↔safety_check 반복이 끝없이 돌지 않도록)
+CHAT_MAX_TOOL_ROUNDS = int(os.getenv("CHAT_MAX_TOOL_ROUNDS", 2))          # 도구 실행 라운드 수
+CHAT_MAX_SAFETY_RETRIES = int(os.getenv("CHAT_MAX_SAFETY_RETRIES", 2))    # 안전 검사 실패 후 다시 생성하는 횟수
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", 45))     # 요청 전체 제한 시간
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 1))                    # OpenAI SDK 재시도 횟수 (SDK 기본값 2)
+LLM_MIN_TIMEOUT = 1.0                                                      # 제한 시간이 거의 다 됐어도 호출 한 번에 주는 최소 시간
+
+# LLM 클라이언트와 그래프는 처음 사용할 때 한 번만 만듦 (워커 부팅 시간 단축)
+_lazy_lock = threading.Lock()
+_client = None
+_async_client = None
+_llms = {}  # (용도, 모델) -> LangChain LLM (등급마다 모델이 다르므로 모델별로 하나씩)
+_summary_llm = None
+_app_graph = None
+
+def get_openai_client():
+    """일반 OpenAI 클라이언트 (analyze_food용)"""
+    global _client
+    if _client is None:
+        with _lazy_lock:
+            if _client is None:
+                with timed("lazy.openai_client"):
+                    from openai import OpenAI
+                    _client = OpenAI(api_key=OPENAI_API_KEY, http_client=make_http_client(),
+                                     max_retries=LLM_MAX_RETRIES)
+    return _client
+
+def get_async_openai_client():
+    """비동기 OpenAI 클라이언트 (analyze_food_async용 - asgi_app.py 경로)"""
+    global _async_client
+    if _async_client is None:
+        with _lazy_lock:
+            if _async_client is None:
+                with timed("lazy.async_openai_client"):
+                    from openai import AsyncOpenAI
+                    _async_client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=make_async_http_client(),
+                                                max_retries=LLM_MAX_RETRIES)
+    return _async_client
+
+def _cached_llm(kind: str, model: str, factory):
+    llm = _llms.get((kind, model))
+    if llm is None:
+        with _lazy_lock:
+            llm = _llms.get((kind, model))
+            if llm is None:
+                with timed(f"lazy.{kind}_llm"):
+                    llm = _llms[(kind, model)] = factory()
+    return llm
+
+def _chat_openai(model: str, temperature: float, **kwargs):
+    # request_timeout을 안 주면 ChatOpenAI가 timeout=None(무제한)으로 클라이언트를 만듦
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model, temperature=temperature, http_client=make_http_client(),
+                      http_async_client=make_async_http_client(), request_timeout=LLM_HTTP_TIMEOUT,
+                      max_retries=LLM_MAX_RETRIES, **kwargs)
+
+def get_llm_with_tools(model: str):
+    """챗봇 노드용 LLM (도구 바인딩 포함)"""
+    # stream_usage: 스트리밍 응답에도 입력/출력 토큰 수(usage_metadata)를 받음
+    return _cached_llm("chat", model, lambda: _chat_openai(model, 0.7, stream_usage=True)
+                       .bind_tools(list(TOOLS.values())))
+
+def get_final_answer_llm(model: str):
+    """도구 라운드를 다 쓴 뒤 쓰는 챗봇 LLM (도구 정의는 유지하되 호출은 못 하게 해서 바로 답하게 함)"""
+    return _cached_llm("final_answer", model, lambda: _chat_openai(model, 0.7, stream_usage=True)
+                       .bind_tools(list(TOOLS.values()), tool_choice="none"))
+
+def get_checker_llm(model: str):
+    """안전 검사 노드용 LLM (요청마다 새로 만들지 않고 재사용)"""
+    return _cached_llm("checker", model, lambda: _chat_openai(model, 0))
+
+def get_summary_llm():
+    """대화 요약용 LLM (오래된 대화를 짧게 압축하는 용도라 작은 모델 사용)"""
+    global _summary_llm
+    if _summary_llm is None:
+        with _lazy_lock:
+            if _summary_llm is None:
+                with timed("lazy.summary_llm"):
+                    _summary_llm = _chat_openai(SUMMARY_MODEL, 0)
+    return _summary_llm
 
 # =========================================================
-# 1. 도구(Tool) 정의 - LangChain @tool 데코레이터 사용
+# 1. 도구(Tool) 정의 - 동기(invoke)/비동기(ainvoke) 구현을 함께 가진 LangChain 도구
 # =========================================================
-@tool
-def search_restaurants(location: str, menu_keyword: str):
+def _format_places(docs: list) -> str:
+    if not docs:
+        return "NOT_FOUND: 검색 결과가 없습니다."
+    # AI가 읽기 좋게 문자열로 요약해서 반환
+    results = []
+    for doc in docs:
+        results.append(f"이름: {doc['place_name']}, URL: {doc['place_url']}, 카테고리: {doc['category_name']}")
+    return "\n".join(results)
+
+def _search_error(e: Exception) -> str:
+    if isinstance(e, KakaoAPIError):
+        return f"API 호출 에러: {e.status_code}"
+    return f"검색 중 에러 발생: {e}"
+
+def _search_restaurants(location: str, menu_keyword: str):
     """
     특정 지역의 식당이나 메뉴를 카카오맵에서 검색합니다.
     location: 검색할 지역 (예: 강남역, 홍대)
@@ -37,27 +141,27 @@ def search_restaurants(location: str, menu_keyword: str):
     """
     if not KAKAO_API_KEY:
         return "Error: 카카오 API 키가 없습니다."
+    try:
+        return _format_places(kakao_client.search_keyword(location, menu_keyword))
+    except Exception as e:
+        return _search_error(e)
 
-    url = "https://dapi.kakao.com/v2/local/search/keyword.json"
-    headers = {"Authorization": f"KakaoAK {KAKAO_API_KEY}"}
-    query = f"{location} {menu_keyword}".strip()
-    
+async def _asearch_restaurants(location: str, menu_keyword: str):
+    if not KAKAO_API_KEY:
+        return "Error: 카카오 API 키가 없습니다."
     try:
-        response = requests.get(url, headers=headers, params={"query": query, "size": 3})
-        if response.status_code == 200:
-            docs = response.json().get('documents', [])
-            if not docs:
-                return "NOT_FOUND: 검색 결과가 없습니다."
-            
-            # AI가 읽기 좋게 문자열로 요약해서 반환
-            results = []
-            for doc in docs:
-                results.append(f"이름: {doc['place_name']}, URL: {doc['place_url']}, 카테고리: {doc['category_name']}")
-            return "\n".join(results)
-        else:
-            return f"API 호출 에러: {response.status_code}"
+        return _format_places(await kakao_client.asearch_keyword(location, menu_keyword))
     except Exception as e:
-        return f"검색 중 에러 발생: {e}"
+        return _search_error(e)
+
+search_restaurants = StructuredTool.from_function(func=_search_restaurants, coroutine=_asearch_restaurants,
+                                                  name="search_restaurants")
+
+# 챗봇이 쓸 수 있는 도구 (여기에 추가하면 LLM 바인딩과 tool_node 병렬 실행에 그대로 반영됨)
+TOOLS = {t.name: t for t in [search_restaurants]}
+TOOL_TIMEOUTS = {"search_restaurants": float(os.getenv("SEARCH_TOOL_TIMEOUT", 8))}  # 초
+TOOL_TIMEOUT_DEFAULT = float(os.getenv("TOOL_TIMEOUT", 10))
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", 4))  # 한 번의 tool_node에서 동시에 실행할 도구 수
 
 # =========================================================
 # 2. 식단 분석 함수 (기존 코드 유지)
@@ -80,7 +184,7 @@ ANALYSIS_PROMPT = """
 }
 """
 
-def analyze_food(text_input: str = None, image_bytes: bytes = None, user_profile: dict = None):
+def _analysis_messages(text_input: str, image_bytes: bytes, user_profile: dict, image_mime: str):
     messages = [{"role": "system", "content": ANALYSIS_PROMPT}]
     
     if user_profile:
@@ -90,17 +194,226 @@ def analyze_food(text_input: str = None, image_bytes: bytes = None, user_profile
     if text_input: user_content.append({"type": "text", "text": text_input})
     if image_bytes:
         b64_img = base64.b64encode(image_bytes).decode('utf-8')
-        user_content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64_img}"}})
+        user_content.append({"type": "image_url", "image_url": {"url": f"data:{image_mime};base64,{b64_img}"}})
     
     messages.append({"role": "user", "content": user_content})
+    return messages
+
+ANALYSIS_RETRY_PROMPT = """
+[보완 요청]
+이전 분석 응답에서 다음 항목이 빠졌거나 형식이 맞지 않았습니다: {missing}
+[이전 분석 결과]에 있는 값은 그대로 두고, 빠진 항목을 채운 전체 JSON을 위 포맷으로 다시 반환하세요.
+"""
+
+analysis_stats = {"ok": 0, "repaired": 0, "failed": 0, "error": 0, "wasted_tokens": 0}  # error: LLM 호출 자체 실패
+_analysis_lock = threading.Lock()
+
+def _analysis_response_format():
+    if ANALYSIS_RESPONSE_FORMAT == "json_object":
+        return {"type": "json_object"}
+    return {"type": "json_schema",
+            "json_schema": {"name": "food_analysis", "strict": True, "schema": ANALYSIS_JSON_SCHEMA}}
+
+def _read_analysis(res):
+    """응답 → (검증된 필드, 빠진 필드 목록, 원문)"""
+    raw = res.choices[0].message.content or ""
+    partial, missing = validate_analysis(extract_json(raw))
+    return partial, missing, raw
+
+def _retry_messages(text_input: str, partial: dict, raw: str, missing: list):
+    """
+    빠진 필드만 채우는 텍스트 전용 재요청 (이미지는 다시 보내지 않고 첫 응답의 분석 결과를 재사용)
+    첫 응답에서 건진 것도 없고 텍스트 입력도 없으면 None
+    """
+    if not (partial or text_input):
+        return None
+    parts = []
+    if text_input:
+        parts.append(f"[입력] {text_input}")
+    if partial:
+        parts.append(f"[이전 분석 결과] {json.dumps(partial, ensure_ascii=False)}")
+    elif raw:
+        parts.append(f"[이전 응답] {raw[:2000]}")
+    system = ANALYSIS_PROMPT + ANALYSIS_RETRY_PROMPT.format(missing=", ".join(missing))
+    return [{"role": "system", "content": system}, {"role": "user", "content": "\n".join(parts)}]
 
+def _record_analysis(outcome: str, wasted: list = ()):
+    """wasted: 결과를 쓰지 못한 호출의 (모델, 토큰 수)"""
+    tokens = sum(n for _, n in wasted)
+    with _analysis_lock:
+        analysis_stats[outcome] += 1
+        analysis_stats["wasted_tokens"] += tokens
+    analysis_outcomes.inc(outcome=outcome)
+    for model, n in wasted:
+        if n:
+            analysis_wasted_tokens.inc(n, model=model)
+
+def _total_tokens(res) -> int:
+    return (res.usage.total_tokens or 0) if res is not None and res.usage else 0
+
+def _first_analysis(res, text_input: str):
+    """첫 응답 검증 → (완성된 결과 또는 None, 재시도 메시지 또는 None, 부분 결과)"""
+    partial, missing, raw = _read_analysis(res)
+    if not missing:
+        _record_analysis("ok")
+        return partial, None, partial
+    retry = _retry_messages(text_input, partial, raw, missing)
+    if retry is not None:
+        print(f"🧩 [Analyze] 응답 검증 실패 ({', '.join(missing)}) → 텍스트 재시도 ({ANALYSIS_RETRY_MODEL})")
+    return None, retry, partial
+
+def _merge_retry(first_res, route: dict, partial: dict, retry_res) -> dict:
+    """재시도 결과로 빠진 필드만 채움 (첫 응답에서 검증된 값이 우선)"""
+    retried = _read_analysis(retry_res)[0] if retry_res is not None else {}
+    result, missing = validate_analysis({**retried, **partial})
+    if missing:
+        _record_analysis("failed", [(route["model"], _total_tokens(first_res)),
+                                    (ANALYSIS_RETRY_MODEL, _total_tokens(retry_res))])
+        print(f"❌ [Analyze] 재시도 후에도 검증 실패: {', '.join(missing)}")
+        return analysis_error("분석 결과 형식 오류")
+    # 첫 응답에서 아무것도 못 건졌으면 그 호출은 통째로 버린 셈
+    _record_analysis("repaired", [] if partial else [(route["model"], _total_tokens(first_res))])
+    return result
+
+# 빠진 필드만 채우는 텍스트 재시도는 항상 작은 모델 (라우팅 결정으로 세지 않음)
+_RETRY_ROUTE = {"kind": "analysis", "tier": "small", "model": ANALYSIS_RETRY_MODEL, "reason": "repair"}
+
+def _create_analysis(client, route: dict, messages: list, node: str):
+    with model_router.call(node, route) as call:
+        res = client.chat.completions.create(model=route["model"], messages=messages, max_tokens=600,
+                                             response_format=_analysis_response_format())
+        call.record_usage(res.usage.prompt_tokens, res.usage.completion_tokens)
+    return res
+
+async def _acreate_analysis(client, route: dict, messages: list, node: str):
+    with model_router.call(node, route) as call:
+        res = await client.chat.completions.create(model=route["model"], messages=messages, max_tokens=600,
+                                                   response_format=_analysis_response_format())
+        call.record_usage(res.usage.prompt_tokens, res.usage.completion_tokens)
+    return res
+
+def _analyze_once(route: dict, messages: list, text_input: str) -> dict:
+    """route의 모델로 분석 1회 (검증 실패 시 텍스트 재시도 포함)"""
     try:
-        res = client.chat.completions.create(model="gpt-4o", messages=messages, max_tokens=600)
-        content = res.choices[0].message.content.replace("```json", "").replace("```", "").strip()
-        return json.loads(content)
+        res = _create_analysis(get_openai_client(), route, messages, "analyze_food")
     except Exception as e:
         print(f"Analyze Error: {e}")
-        return {"food_name": "Error", "blood_sugar_level": "알 수 없음", "summary": "분석 실패"}
+        _record_analysis("error")
+        return analysis_error("분석 요청 실패")
+
+    result, retry, partial = _first_analysis(res, text_input)
+    if result is not None:
+        return result
+    retry_res = None
+    if retry is not None:
+        try:
+            retry_res = _create_analysis(get_openai_client(), _RETRY_ROUTE, retry, "analyze_food_retry")
+        except Exception as e:
+            print(f"Analyze Retry Error: {e}")
+    return _merge_retry(res, route, partial, retry_res)
+
+async def _aanalyze_once(route: dict, messages: list, text_input: str) -> dict:
+    try:
+        res = await _acreate_analysis(get_async_openai_client(), route, messages, "analyze_food")
+    except Exception as e:
+        print(f"Analyze Error: {e}")
+        _record_analysis("error")
+        return analysis_error("분석 요청 실패")
+
+    result, retry, partial = _first_analysis(res, text_input)
+    if result is not None:
+        return result
+    retry_res = None
+    if retry is not None:
+        try:
+            retry_res = await _acreate_analysis(get_async_openai_client(), _RETRY_ROUTE, retry,
+                                                "analyze_food_retry")
+        except Exception as e:
+            print(f"Analyze Retry Error: {e}")
+    return _merge_retry(res, route, partial, retry_res)
+
+def _analysis_escalation(route: dict, result: dict):
+    """작은 모델 결과를 큰 모델로 다시 분석해야 하면 그 이유, 아니면 None"""
+    if route["tier"] != "small":
+        return None
+    if is_analysis_error(result):
+        return "invalid"
+    if not analysis_looks_confident(result):
+        return "ratio_sum"
+    return None
+
+def analyze_food(text_input: str = None, image_bytes: bytes = None, user_profile: dict = None,
+                 image_mime: str = "image/jpeg"):
+    """
+    식단 분석 (structured output + 검증)
+    - 모델은 model_router가 고름 (짧은 텍스트는 작은 모델, 사진/긴 설명은 큰 모델)
+    - 검증에 실패한 필드는 작은 모델로 텍스트만 다시 요청해서 채움
+    - 작은 모델 결과가 실패했거나 미덥지 않으면 큰 모델로 한 번 더, 그래도 안 되면 analysis_error() 결과 반환
+    """
+    messages = _analysis_messages(text_input, image_bytes, user_profile, image_mime)
+    route = model_router.route_analysis(text_input, bool(image_bytes))
+    result = _analyze_once(route, messages, text_input)
+    reason = _analysis_escalation(route, result)
+    if reason:
+        result = _analyze_once(model_router.escalate(route, reason), messages, text_input)
+    return result
+
+async def analyze_food_async(text_input: str = None, image_bytes: bytes = None, user_profile: dict = None,
+                             image_mime: str = "image/jpeg"):
+    """analyze_food의 비동기 버전 (LLM 응답을 기다리는 동안 이벤트 루프가 다른 요청을 처리)"""
+    messages = _analysis_messages(text_input, image_bytes, user_profile, image_mime)
+    route = model_router.route_analysis(text_input, bool(image_bytes))
+    result = await _aanalyze_once(route, messages, text_input)
+    reason = _analysis_escalation(route, result)
+    if reason:
+        result = await _aanalyze_once(model_router.escalate(route, reason), messages, text_input)
+    return result
+
+def get_analysis_stats():
+    with _analysis_lock:
+        stats = dict(analysis_stats)
+    total = stats["ok"] + stats["repaired"] + stats["failed"]
+    # 첫 응답이 검증을 통과하지 못한 비율 (재시도로 복구된 것 포함)
+    stats["parse_failure_rate"] = round((stats["repaired"] + stats["failed"]) / total, 3) if total else 0.0
+    return stats
+
+BATCH_ANALYSIS_PROMPT = ANALYSIS_PROMPT + """
+[일괄 분석]
+사용자 메시지에 번호가 붙은 여러 음식이 주어집니다. 각 음식을 위 포맷으로 따로 분석하고,
+입력 순서 그대로 다음 형태의 JSON 하나로만 반환하세요.
+{"results": [{"index": 0, ...위 포맷...}, {"index": 1, ...}]}
+"""
+
+def analyze_food_batch(text_inputs: list, user_profile: dict = None):
+    """
+    텍스트 식단 여러 개를 LLM 요청 한 번으로 분석
+    반환값: 입력과 같은 길이의 리스트 (분석에 실패한 항목은 None)
+    """
+    system = BATCH_ANALYSIS_PROMPT
+    if user_profile:
+        system += f"\n[사용자 정보] {user_profile}"
+    numbered = "\n".join(f"{i}. {text}" for i, text in enumerate(text_inputs))
+    messages = [{"role": "system", "content": system}, {"role": "user", "content": numbered}]
+
+    results = [None] * len(text_inputs)
+    try:
+        route = model_router.route_batch_analysis()
+        with model_router.call("analyze_food_batch", route) as call:
+            res = get_openai_client().chat.completions.create(model=route["model"], messages=messages,
+                                                              max_tokens=500 * len(text_inputs),
+                                                              response_format={"type": "json_object"})
+            call.record_usage(res.usage.prompt_tokens, res.usage.completion_tokens)
+        for item in (extract_json(res.choices[0].message.content) or {}).get("results", []):
+            if not isinstance(item, dict):
+                continue
+            index = item.pop("index", None)
+            result, missing = validate_analysis(item)
+            # 형식이 맞지 않는 항목은 None으로 두면 호출한 쪽(batch_analysis)이 개별 분석으로 다시 시도
+            if isinstance(index, int) and 0 <= index < len(results) and not missing:
+                results[index] = result
+    except Exception as e:
+        print(f"Batch Analyze Error: {e}")
+    return results
 
 # =========================================================
 # 3. LangGraph 상태 및 노드 정의 
@@ -109,14 +422,54 @@ class AgentState(TypedDict):
     messages: Annotated[List, operator.add]
     user_profile: dict
     current_time: str
+    conversation_summary: str
+    trace: Annotated[List, operator.add]  # 실행된 노드 순서 [{"node", "ms"}] (요청별 추적)
+    # 실행 예산: {"max_tool_rounds", "max_safety_retries", "deadline"(epoch 초)} + 지금까지 사용량
+    budget: dict
+    tool_rounds: int
+    safety_retries: int
+    budget_exhausted: str  # 예산이 바닥나 대체 답변으로 끝났을 때 어떤 한도였는지
+    model_route: dict      # 챗봇 모델 등급 (model_router.route_chat, 에스컬레이션되면 이후 턴 끝까지 큰 모델)
 
-# LangChain LLM 초기화
-llm = ChatOpenAI(model="gpt-4o", temperature=0.7)
-llm_with_tools = llm.bind_tools([search_restaurants])
+# 예산이 바닥났을 때 내보내는 안전한 기본 답변 (안전 검사를 통과한 답변이 없을 때)
+BUDGET_FALLBACK_ANSWER = (
+    "지금은 추천을 끝까지 완성하지 못했어요. 😥\n"
+    "혈당 관리를 위해 채소와 단백질 위주의 가벼운 식사(예: 생선구이 정식, 두부 요리, 닭가슴살 샐러드)를 권해드려요. "
+    "늦은 시간이라면 따뜻한 두유나 삶은 계란 정도로 가볍게 드세요.\n"
+    "잠시 후 다시 물어봐 주시면 주변 식당까지 찾아드릴게요."
+)
 
-def chatbot_node(state: AgentState):
-    """메인 챗봇 노드"""
-    print("🤖 [LangGraph] Chatbot node started")
+budget_stats = {"tool_rounds": 0, "safety_retries": 0, "deadline": 0}
+_budget_lock = threading.Lock()
+
+def _record_budget_exhausted(limit: str):
+    with _budget_lock:
+        budget_stats[limit] += 1
+    chat_budget_exhausted.inc(limit=limit)
+    print(f"⛔ [LangGraph] 실행 예산 초과: {limit}")
+
+def _deadline_passed(state) -> bool:
+    deadline = (state.get("budget") or {}).get("deadline")
+    return deadline is not None and time.time() >= deadline
+
+def _within_deadline(llm, state):
+    """
+    남은 실행 예산 안에서 끝나도록 호출별 타임아웃을 붙인 LLM
+    (제한 시간 검사는 노드 사이에서만 하므로, 멈춘 호출 하나가 예산을 넘겨 워커를 잡지 않게 함)
+    """
+    deadline = (state.get("budget") or {}).get("deadline")
+    if deadline is None:
+        return llm
+    # SDK가 재시도하면 시도마다 타임아웃이 새로 적용되므로 남은 시간을 시도 수로 나눔
+    per_attempt = (deadline - time.time()) / (LLM_MAX_RETRIES + 1)
+    return llm.bind(timeout=min(LLM_HTTP_TIMEOUT, max(LLM_MIN_TIMEOUT, per_attempt)))
+
+def _tool_rounds_left(state) -> bool:
+    budget = state.get("budget") or {}
+    return state.get("tool_rounds", 0) < budget.get("max_tool_rounds", CHAT_MAX_TOOL_ROUNDS)
+
+def _chatbot_request(state: AgentState):
+    """챗봇 LLM 입력 준비 → (메시지, 사용할 LLM, 상태 업데이트)"""
     profile = state["user_profile"]
     now = state["current_time"]
     
@@ -160,44 +513,211 @@ def chatbot_node(state: AgentState):
     - 도구 결과가 "NOT_FOUND"라면 솔직하게 말하고, 주변에 있을 법한 다른 건강 메뉴(예: 서브웨이, 국밥집 등)를 대안으로 제시하세요.
     - 도구 결과의 URL을 `[식당명](URL)` 형태로 링크를 거세요.
     """
+    if state.get("conversation_summary"):
+        system_msg += f"""
+    [이전 대화 요약]
+    {state["conversation_summary"]}
+    """
     
     messages = [SystemMessage(content=system_msg)] + state["messages"]
+    update = {}
+    last = state["messages"][-1] if state["messages"] else None
+    route = state.get("model_route") or model_router.route_chat(_last_user_text(state["messages"]))
+    if route["tier"] == "small" and isinstance(last, HumanMessage) and last.name == "safety_guard":
+        # 작은 모델 답변이 안전 검사에서 걸렸으면 다시 생성은 큰 모델로
+        route = model_router.escalate(route, "safety")
+        update["model_route"] = route
+    llm = get_llm_with_tools(route["model"])
+    if not _tool_rounds_left(state):
+        # 도구 라운드를 다 썼으면 지금까지의 검색 결과로 바로 답하게 함
+        if isinstance(last, ToolMessage):
+            update["budget_exhausted"] = "tool_rounds"  # 집계는 실행이 끝날 때 한 번 (_finish_trace)
+        llm = get_final_answer_llm(route["model"])
+    return messages, llm, update, route
+
+def _empty_reply(route: dict, response) -> bool:
+    """작은 모델이 도구 호출도 답변도 없이 끝냄 → 큰 모델로 다시"""
+    return route["tier"] == "small" and not response.tool_calls and not str(response.content or "").strip()
+
+def _reroute_llm(state: AgentState, route: dict):
+    if not _tool_rounds_left(state):
+        return get_final_answer_llm(route["model"])
+    return get_llm_with_tools(route["model"])
+
+def chatbot_node(state: AgentState):
+    """메인 챗봇 노드"""
+    print("🤖 [LangGraph] Chatbot node started")
+    messages, llm, update, route = _chatbot_request(state)
+    try:
+        with model_router.call("chatbot", route) as call:
+            response = _within_deadline(llm, state).invoke(messages)
+            call.record_message(response)
+        if _empty_reply(route, response):
+            route = update["model_route"] = model_router.escalate(route, "empty_reply")
+            with model_router.call("chatbot", route) as call:
+                response = _within_deadline(_reroute_llm(state, route), state).invoke(messages)
+                call.record_message(response)
+        print("🤖 [LangGraph] Chatbot response generated")
+        update["messages"] = [response]
+        return update
+    except Exception as e:
+        print(f"❌ [LangGraph] Error in chatbot_node: {e}")
+        raise e
+
+async def achatbot_node(state: AgentState):
+    """chatbot_node의 비동기 버전 (graph.ainvoke/astream에서 사용)"""
+    print("🤖 [LangGraph] Chatbot node started")
+    messages, llm, update, route = _chatbot_request(state)
     try:
-        response = llm_with_tools.invoke(messages)
+        with model_router.call("chatbot", route) as call:
+            response = await _within_deadline(llm, state).ainvoke(messages)
+            call.record_message(response)
+        if _empty_reply(route, response):
+            route = update["model_route"] = model_router.escalate(route, "empty_reply")
+            with model_router.call("chatbot", route) as call:
+                response = await _within_deadline(_reroute_llm(state, route), state).ainvoke(messages)
+                call.record_message(response)
         print("🤖 [LangGraph] Chatbot response generated")
-        return {"messages": [response]}
+        update["messages"] = [response]
+        return update
     except Exception as e:
         print(f"❌ [LangGraph] Error in chatbot_node: {e}")
         raise e
 
+def _tool_done(tool_call, started: float, outcome: str):
+    elapsed = time.perf_counter() - started
+    tool_latency.observe(elapsed, tool=tool_call["name"], outcome=outcome)
+    print(f"🛠️ [LangGraph] 도구 완료 {tool_call['name']} {tool_call['args']} ({elapsed * 1000:.0f}ms)")
+
+def _run_tool(tool_call):
+    """도구 하나 실행 → (결과 문자열, 에러 여부)"""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        res = TOOLS[tool_call["name"]].invoke(tool_call["args"])
+        return str(res), False
+    except Exception as e:
+        outcome = "error"
+        print(f"❌ [LangGraph] 도구 실패 {tool_call['name']}: {e}")
+        return f"도구 실행 에러: {e}", True
+    finally:
+        _tool_done(tool_call, started, outcome)
+
+async def _arun_tool(tool_call):
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        res = await TOOLS[tool_call["name"]].ainvoke(tool_call["args"])
+        return str(res), False
+    except Exception as e:
+        outcome = "error"
+        print(f"❌ [LangGraph] 도구 실패 {tool_call['name']}: {e}")
+        return f"도구 실행 에러: {e}", True
+    finally:
+        _tool_done(tool_call, started, outcome)
+
+def _unknown_tool_outputs(tool_calls: list) -> list:
+    # 모든 tool_call에 응답 메시지가 있어야 하므로 모르는 도구도 에러 메시지로 답함
+    return [None if tool_call["name"] in TOOLS else (f"알 수 없는 도구: {tool_call['name']}", True)
+            for tool_call in tool_calls]
+
+def _tool_update(state: AgentState, tool_calls: list, outputs: list):
+    results = []
+    for tool_call, (content, failed) in zip(tool_calls, outputs):
+        results.append(ToolMessage(tool_call_id=tool_call["id"], content=content,
+                                   status="error" if failed else "success"))
+    return {"messages": results, "tool_rounds": state.get("tool_rounds", 0) + 1}
+
 def tool_node(state: AgentState):
-    """도구 실행 노드"""
+    """
+    도구 실행 노드 - LLM이 한 번에 여러 도구 호출을 요청하면 동시에 실행
+    (최대 TOOL_MAX_CONCURRENCY개, 도구별 타임아웃, 결과는 tool_calls 순서대로)
+    """
     last_message = state["messages"][-1]
     if not last_message.tool_calls:
         return {"messages": []}
 
-    results = []
-    for tool_call in last_message.tool_calls:
-        if tool_call["name"] == "search_restaurants":
-            print(f"🛠️ [LangGraph] 도구 실행: {tool_call['args']}")
-            res = search_restaurants.invoke(tool_call["args"])
-            results.append(ToolMessage(tool_call_id=tool_call["id"], content=str(res)))
-            
-    return {"messages": results}
+    tool_calls = last_message.tool_calls
+    outputs = _unknown_tool_outputs(tool_calls)
+    futures = {}
+    runnable = [i for i, output in enumerate(outputs) if output is None]
+    if runnable:
+        workers = min(TOOL_MAX_CONCURRENCY, len(runnable))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat-tool")
+        started = time.monotonic()
+        try:
+            for i in runnable:
+                futures[i] = executor.submit(_run_tool, tool_calls[i])
+            for n, i in enumerate(runnable):
+                # 동시 실행 수를 넘는 호출은 앞 호출이 끝나야 시작하므로 그만큼 기다릴 시간을 늘림
+                timeout = TOOL_TIMEOUTS.get(tool_calls[i]["name"], TOOL_TIMEOUT_DEFAULT)
+                deadline = started + timeout * (n // workers + 1)
+                try:
+                    outputs[i] = futures[i].result(timeout=max(0.0, deadline - time.monotonic()))
+                except FutureTimeoutError:
+                    print(f"⏱️ [LangGraph] 도구 타임아웃 {tool_calls[i]['name']} ({timeout}s)")
+                    outputs[i] = (f"도구 실행 시간 초과 ({timeout:.0f}초)", True)
+        finally:
+            # 타임아웃된 호출은 기다리지 않음 (스레드는 HTTP 타임아웃으로 곧 끝남)
+            executor.shutdown(wait=False, cancel_futures=True)
+    return _tool_update(state, tool_calls, outputs)
 
-def safety_check_node(state: AgentState):
-    """(Self-Correction) 당뇨 환자 안전 검사 노드"""
+async def atool_node(state: AgentState):
+    """tool_node의 비동기 버전 - 스레드 대신 코루틴으로 동시 실행 (동시 실행 수/도구별 타임아웃은 동일)"""
+    last_message = state["messages"][-1]
+    if not last_message.tool_calls:
+        return {"messages": []}
+
+    tool_calls = last_message.tool_calls
+    outputs = _unknown_tool_outputs(tool_calls)
+    semaphore = asyncio.Semaphore(TOOL_MAX_CONCURRENCY)
+
+    async def run(i):
+        timeout = TOOL_TIMEOUTS.get(tool_calls[i]["name"], TOOL_TIMEOUT_DEFAULT)
+        async with semaphore:
+            try:
+                outputs[i] = await asyncio.wait_for(_arun_tool(tool_calls[i]), timeout)
+            except asyncio.TimeoutError:
+                print(f"⏱️ [LangGraph] 도구 타임아웃 {tool_calls[i]['name']} ({timeout}s)")
+                outputs[i] = (f"도구 실행 시간 초과 ({timeout:.0f}초)", True)
+
+    await asyncio.gather(*(run(i) for i, output in enumerate(outputs) if output is None))
+    return _tool_update(state, tool_calls, outputs)
+
+def _last_user_text(messages: list) -> str:
+    """사용자가 마지막으로 보낸 메시지 (safety_guard 교정 메시지는 제외)"""
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage) and msg.name != "safety_guard":
+            return msg.content
+    return ""
+
+def _safety_precheck(state: AgentState):
+    """
+    규칙 기반 1차 판정 → (검사 결과, LLM 검사 프롬프트)
+    - 검사할 필요 없음/안전: ("SAFE", None) / 확실한 위험: ("DANGER: 이유", None)
+    - 애매함: (None, 프롬프트) → LLM으로 2차 검사
+    """
     last_message = state["messages"][-1]
     profile = state["user_profile"]
     
     # 툴 호출이나 시스템 메시지면 건너뜀
     if not isinstance(last_message, AIMessage) or last_message.tool_calls:
-        return {"messages": []}
+        return "SAFE", None
 
     # 당뇨 환자일 때만 엄격하게 검사 (Self-Correction 동작)
-    if "당뇨" in str(profile.get('diabetes_type')):
-        checker_llm = ChatOpenAI(model="gpt-4o", temperature=0)
-        check_prompt = f"""
+    if "당뇨" not in str(profile.get('diabetes_type')):
+        return "SAFE", None
+    
+    # 1차: 규칙 기반 판정 (확실한 경우 LLM 호출 생략)
+    verdict, reason = classify_answer(last_message.content, state["current_time"],
+                                      _last_user_text(state["messages"]))
+    if verdict == SAFE:
+        return "SAFE", None
+    if verdict == DANGER:
+        return f"DANGER: {reason}", None
+    
+    # 2차: 애매한 답변만 LLM으로 검사
+    check_prompt = f"""
         사용자는 '{profile.get('diabetes_type')}' 환자입니다.
         AI 답변: "{last_message.content}"
         
@@ -205,49 +725,168 @@ def safety_check_node(state: AgentState):
         혈당에 치명적인 음식을 '강력 추천'하고 있다면 "DANGER: [이유]"를 출력하세요.
         안전하다면 "SAFE"를 출력하세요.
         """
-        check_res = checker_llm.invoke([HumanMessage(content=check_prompt)])
-        
-        if check_res.content.startswith("DANGER"):
-            print(f"🚨 [LangGraph] 안전 검사 실패: {check_res.content}")
-            correction_msg = f"잠깐! 사용자는 당뇨 환자야. 방금 추천은 위험해. ({check_res.content}) 내용을 반영해서 더 안전한 메뉴로 다시 대답해."
-            return {"messages": [HumanMessage(content=correction_msg, name="safety_guard")]}
-            
+    return None, check_prompt
+
+def _safety_update(state: AgentState, check_result: str):
+    if check_result.startswith("DANGER"):
+        print(f"🚨 [LangGraph] 안전 검사 실패: {check_result}")
+        correction_msg = f"잠깐! 사용자는 당뇨 환자야. 방금 추천은 위험해. ({check_result}) 내용을 반영해서 더 안전한 메뉴로 다시 대답해."
+        return {"messages": [HumanMessage(content=correction_msg, name="safety_guard")],
+                "safety_retries": state.get("safety_retries", 0) + 1}
     return {"messages": []}
 
+def _clear_verdict(check_result: str) -> bool:
+    return check_result.strip().startswith(("SAFE", "DANGER"))
+
+def _check_safety(state: AgentState, check_prompt: str) -> str:
+    """작은 모델로 검사하고, 판정이 SAFE/DANGER 어느 쪽도 아니면 큰 모델로 다시 검사"""
+    route = model_router.route_safety()
+    while True:
+        with model_router.call("safety_check", route) as call:
+            checked = _within_deadline(get_checker_llm(route["model"]), state).invoke([HumanMessage(content=check_prompt)])
+            call.record_message(checked)
+        if route["tier"] != "small" or _clear_verdict(checked.content):
+            return checked.content.strip()
+        route = model_router.escalate(route, "ambiguous")
+
+async def _acheck_safety(state: AgentState, check_prompt: str) -> str:
+    route = model_router.route_safety()
+    while True:
+        with model_router.call("safety_check", route) as call:
+            checked = await _within_deadline(get_checker_llm(route["model"]), state).ainvoke([HumanMessage(content=check_prompt)])
+            call.record_message(checked)
+        if route["tier"] != "small" or _clear_verdict(checked.content):
+            return checked.content.strip()
+        route = model_router.escalate(route, "ambiguous")
+
+def safety_check_node(state: AgentState):
+    """(Self-Correction) 당뇨 환자 안전 검사 노드"""
+    check_result, check_prompt = _safety_precheck(state)
+    if check_prompt:
+        check_result = _check_safety(state, check_prompt)
+    return _safety_update(state, check_result)
+
+async def asafety_check_node(state: AgentState):
+    """safety_check_node의 비동기 버전"""
+    check_result, check_prompt = _safety_precheck(state)
+    if check_prompt:
+        check_result = await _acheck_safety(state, check_prompt)
+    return _safety_update(state, check_result)
+
 # =========================================================
 # 4. 그래프 구성 (Workflow)
 # =========================================================
-workflow = StateGraph(AgentState)
-
-workflow.add_node("chatbot", chatbot_node)
-workflow.add_node("tools", tool_node)
-workflow.add_node("safety_check", safety_check_node)
-
-workflow.set_entry_point("chatbot")
+def budget_fallback_node(state: AgentState):
+    """실행 예산 초과 → 예외 대신 안전한 기본 답변으로 마무리"""
+    budget = state.get("budget") or {}
+    if _deadline_passed(state):
+        limit = "deadline"
+    elif state.get("safety_retries", 0) > budget.get("max_safety_retries", CHAT_MAX_SAFETY_RETRIES):
+        limit = "safety_retries"
+    else:
+        limit = "tool_rounds"
+    return {"messages": [AIMessage(content=BUDGET_FALLBACK_ANSWER, name="budget_fallback")],
+            "budget_exhausted": limit}
 
 def route_tools(state: AgentState):
     if state["messages"][-1].tool_calls:
+        # 제한 시간이 지났거나 (도구 호출 금지에도) 도구를 또 요청하면 더 돌지 않음
+        if _deadline_passed(state) or not _tool_rounds_left(state):
+            return "fallback"
         return "tools"
     return "safety_check"
 
-workflow.add_conditional_edges("chatbot", route_tools, {"tools": "tools", "safety_check": "safety_check"})
-workflow.add_edge("tools", "chatbot")
-
 def route_safety(state: AgentState):
+    from langgraph.graph import END
     last_message = state["messages"][-1]
     if isinstance(last_message, HumanMessage) and last_message.name == "safety_guard":
+        budget = state.get("budget") or {}
+        if _deadline_passed(state) or \
+                state.get("safety_retries", 0) > budget.get("max_safety_retries", CHAT_MAX_SAFETY_RETRIES):
+            return "fallback"
         return "chatbot" # 다시 생성해!
     return END
 
-workflow.add_conditional_edges("safety_check", route_safety, {"chatbot": "chatbot", END: END})
+def _traced(name, node_fn, anode_fn=None):
+    """
+    노드 실행 시간을 지표로 남기고 상태의 trace에 실행 기록 추가
+    invoke/stream은 node_fn, ainvoke/astream은 anode_fn(없으면 node_fn을 그대로 - 블로킹 I/O가 없는 노드만)
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    def finish(update, started):
+        update = dict(update or {})
+        update["trace"] = [{"node": name, "ms": round((time.perf_counter() - started) * 1000, 1)}]
+        return update
+
+    def run(state):
+        started = time.perf_counter()
+        with timed_node(name):
+            update = node_fn(state)
+        return finish(update, started)
+
+    async def arun(state):
+        started = time.perf_counter()
+        with timed_node(name):
+            update = await anode_fn(state) if anode_fn else node_fn(state)
+        return finish(update, started)
+
+    return RunnableLambda(run, afunc=arun, name=name)
+
+def build_graph():
+    from langgraph.graph import StateGraph, END
+    
+    workflow = StateGraph(AgentState)
+    
+    workflow.add_node("chatbot", _traced("chatbot", chatbot_node, achatbot_node))
+    workflow.add_node("tools", _traced("tools", tool_node, atool_node))
+    workflow.add_node("safety_check", _traced("safety_check", safety_check_node, asafety_check_node))
+    workflow.add_node("fallback", _traced("fallback", budget_fallback_node))
+    
+    workflow.set_entry_point("chatbot")
+    
+    workflow.add_conditional_edges("chatbot", route_tools,
+                                   {"tools": "tools", "safety_check": "safety_check", "fallback": "fallback"})
+    workflow.add_edge("tools", "chatbot")
+    workflow.add_conditional_edges("safety_check", route_safety,
+                                   {"chatbot": "chatbot", "fallback": "fallback", END: END})
+    workflow.add_edge("fallback", END)
+    
+    return workflow.compile()
 
-app_graph = workflow.compile()
+def get_app_graph():
+    """컴파일된 LangGraph (첫 채팅 요청 때 한 번만 컴파일)"""
+    global _app_graph
+    if _app_graph is None:
+        with _lazy_lock:
+            if _app_graph is None:
+                with timed("lazy.app_graph"):
+                    _app_graph = build_graph()
+    return _app_graph
 
 # =========================================================
 # 5. 외부 호출용 Wrapper 함수
 # =========================================================
-def chat_with_nutritionist(user_profile: dict, recent_logs: list, chat_history: list):
+def summarize_conversation(summary: str, messages: list) -> str:
+    """이전 요약 + 밀려난 대화 메시지 → 새 누적 요약 (conversation.start_turn에서 사용)"""
+    dialog = "\n".join(f"{'사용자' if m['role'] == 'user' else '영양사'}: {m['content']}" for m in messages)
+    prompt = f"""
+    당신은 AI 영양사와 사용자의 대화를 요약합니다.
+    [기존 요약]
+    {summary or "(없음)"}
+    
+    [새 대화]
+    {dialog}
     
+    기존 요약에 새 대화를 합쳐 5줄 이내로 요약하세요.
+    사용자의 선호/기피 음식, 언급한 장소, 이미 추천받은 메뉴와 식당, 건강 관련 사실은 반드시 남기세요.
+    """
+    with llm_call("summary", SUMMARY_MODEL) as call:
+        summarized = get_summary_llm().invoke([HumanMessage(content=prompt)])
+        call.record_message(summarized)
+    return summarized.content.strip()
+
+def _build_graph_inputs(user_profile: dict, recent_logs: list, chat_history: list, summary: str = None):
     now_str = datetime.now(KST).strftime("%H시 %M분")
     
     # 메시지 변환 (Dict -> LangChain Message)
@@ -262,12 +901,127 @@ def chat_with_nutritionist(user_profile: dict, recent_logs: list, chat_history:
         if lc_messages and isinstance(lc_messages[-1], HumanMessage):
              lc_messages[-1].content += f"\n\n[참고: 최근 식사 기록]\n{log_text}"
     
-    inputs = {
+    return {
         "messages": lc_messages,
         "user_profile": user_profile,
-        "current_time": now_str
+        "current_time": now_str,
+        "conversation_summary": summary or "",
+        "trace": [],
+        "budget": {
+            "max_tool_rounds": CHAT_MAX_TOOL_ROUNDS,
+            "max_safety_retries": CHAT_MAX_SAFETY_RETRIES,
+            "deadline": time.time() + CHAT_DEADLINE_SECONDS,
+        },
+        "tool_rounds": 0,
+        "safety_retries": 0,
+        "budget_exhausted": "",
+        # 최근 식사 기록을 붙이기 전의 사용자 메시지로 판단
+        "model_route": model_router.route_chat(chat_history[-1]["content"] if chat_history else "")
     }
+
+def _usage_of(messages: list) -> dict:
+    """이번 실행에서 chatbot LLM이 쓴 토큰 수 (usage_metadata가 있는 AIMessage 합계)"""
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "llm_calls": 0}
+    for msg in messages:
+        meta = getattr(msg, "usage_metadata", None) if isinstance(msg, AIMessage) else None
+        if meta:
+            usage["prompt_tokens"] += meta.get("input_tokens", 0)
+            usage["completion_tokens"] += meta.get("output_tokens", 0)
+            usage["llm_calls"] += 1
+    return usage
+
+def _finish_trace(records: list, budget_exhausted: str, model: str) -> dict:
+    """
+    실행 한 번의 노드 기록 집계 + 예산 초과 기록
+    (도구 라운드 소진은 chatbot 노드와 fallback 노드가 모두 표시할 수 있어 요청당 한 번만 여기서 셈)
+    """
+    trace = record_chat_trace(records)
+    if budget_exhausted:
+        _record_budget_exhausted(budget_exhausted)
+    trace["budget_exhausted"] = budget_exhausted or None
+    trace["model"] = model
+    return trace
+
+def _chat_result(result: dict):
+    trace = _finish_trace(result.get("trace", []), result.get("budget_exhausted"),
+                          (result.get("model_route") or {}).get("model"))
+    return result["messages"][-1].content, _usage_of(result["messages"]), trace
+
+def chat_with_nutritionist(user_profile: dict, recent_logs: list, chat_history: list, summary: str = None):
+    """반환값: (최종 답변, 토큰 사용량 dict, 노드 실행 기록 dict)"""
+    inputs = _build_graph_inputs(user_profile, recent_logs, chat_history, summary)
     
     # 그래프 실행
-    result = app_graph.invoke(inputs)
-    return result["messages"][-1].content
\ No newline at end of file
+    return _chat_result(get_app_graph().invoke(inputs))
+
+async def achat_with_nutritionist(user_profile: dict, recent_logs: list, chat_history: list, summary: str = None):
+    """chat_with_nutritionist의 비동기 버전 (같은 그래프를 ainvoke로 실행)"""
+    inputs = _build_graph_inputs(user_profile, recent_logs, chat_history, summary)
+    return _chat_result(await get_app_graph().ainvoke(inputs))
+
+class _ChatStream:
+    """
+    그래프 스트림 청크 → (이벤트 이름, 데이터) 변환 (stream/astream 공통)
+    - node:    노드(chatbot/tools/safety_check) 실행 완료
+    - token:   chatbot 노드가 생성 중인 답변 토큰
+    - retract: safety_check가 DANGER 판정 → 지금까지 흘려보낸 답변 폐기 (곧 다시 생성됨)
+    - done:    최종 답변 + 토큰 사용량 + 노드 실행 기록
+    """
+    def __init__(self):
+        self.final_reply = ""
+        self.generated = []
+        self.trace = []
+        self.budget_exhausted = None
+        self.model = None
+
+    def events(self, mode, chunk):
+        if mode == "messages":
+            message, metadata = chunk
+            # 안전 검사용 LLM/도구 결과는 사용자에게 보여주지 않음
+            if metadata.get("langgraph_node") != "chatbot":
+                return
+            if isinstance(message.content, str) and message.content:
+                yield "token", {"text": message.content}
+            return
+        
+        for node_name, update in chunk.items():
+            new_messages = (update or {}).get("messages", [])
+            self.trace.extend((update or {}).get("trace", []))
+            self.budget_exhausted = (update or {}).get("budget_exhausted") or self.budget_exhausted
+            self.model = ((update or {}).get("model_route") or {}).get("model") or self.model
+            yield "node", {"name": node_name}
+            if node_name == "fallback":
+                # 이미 흘려보낸 (안전하지 않을 수 있는) 답변을 지우고 기본 답변으로 대체
+                self.final_reply = new_messages[-1].content
+                yield "retract", {"reason": f"실행 예산 초과 ({self.budget_exhausted})"}
+                continue
+            for msg in new_messages:
+                if node_name == "chatbot":
+                    self.generated.append(msg)
+                if node_name == "chatbot" and isinstance(msg, AIMessage) and not msg.tool_calls:
+                    self.final_reply = msg.content
+                if isinstance(msg, HumanMessage) and msg.name == "safety_guard":
+                    self.final_reply = ""
+                    yield "retract", {"reason": msg.content}
+
+    def done(self):
+        trace = _finish_trace(self.trace, self.budget_exhausted, self.model)
+        return "done", {"reply": self.final_reply, "usage": _usage_of(self.generated), "trace": trace}
+
+def stream_chat_with_nutritionist(user_profile: dict, recent_logs: list, chat_history: list, summary: str = None):
+    """그래프 실행 과정을 (이벤트 이름, 데이터) 튜플로 흘려보내는 제너레이터 (SSE용, 이벤트는 _ChatStream 참고)"""
+    inputs = _build_graph_inputs(user_profile, recent_logs, chat_history, summary)
+    stream = _ChatStream()
+    for mode, chunk in get_app_graph().stream(inputs, stream_mode=["messages", "updates"]):
+        yield from stream.events(mode, chunk)
+    yield stream.done()
+
+async def astream_chat_with_nutritionist(user_profile: dict, recent_logs: list, chat_history: list,
+                                         summary: str = None):
+    """stream_chat_with_nutritionist의 비동기 버전 (async 제너레이터)"""
+    inputs = _build_graph_inputs(user_profile, recent_logs, chat_history, summary)
+    stream = _ChatStream()
+    async for mode, chunk in get_app_graph().astream(inputs, stream_mode=["messages", "updates"]):
+        for event in stream.events(mode, chunk):
+            yield event
+    yield stream.done()
@@ -0,0 +1,152 @@
+# analysis_cache.py
+import os
+import json
+import hashlib
+import threading
+import unicodedata
+from datetime import timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from cache import TTLCache, MISSING
+from database import SessionLocal, AnalysisCacheEntry, get_kst_now
+
+# 캐시 설정 (환경 변수로 조정 가능)
+CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL", 7 * 24 * 3600))  # 기본 7일
+CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 512))     # 워커별 메모리 캐시 크기
+DB_CACHE_MAX_ROWS = int(os.getenv("ANALYSIS_CACHE_DB_MAX_ROWS", 20000))   # DB 캐시 최대 행 수
+DB_EVICT_EVERY = 100  # N번 저장할 때마다 DB 정리
+
+# 분석 프롬프트에 들어가는 프로필 항목 (이 값이 바뀌면 결과도 달라짐)
+PROFILE_KEYS = ("diabetes_type", "health_goal", "age", "gender")
+
+
+def normalize_text(text: str) -> str:
+    """공백/대소문자/유니코드 정규화 ("현미밥과  고등어 구이 " == "현미밥과 고등어 구이")"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split()).lower()
+
+
+def hash_image(image_bytes: bytes) -> str:
+    if not image_bytes:
+        return ""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def make_cache_key(text: str = None, image_hash: str = "", user_profile: dict = None) -> str:
+    profile = user_profile or {}
+    payload = {
+        "text": normalize_text(text),
+        "image": image_hash or "",
+        "profile": {k: profile.get(k) for k in PROFILE_KEYS},
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    2단계 분석 결과 캐시
+    - 1단계: 워커 메모리 (LRU + TTL)
+    - 2단계: DB analysis_cache 테이블 (모든 gunicorn 워커가 공유)
+    """
+
+    def __init__(self, session_factory=SessionLocal, ttl=CACHE_TTL_SECONDS,
+                 max_entries=CACHE_MAX_ENTRIES, db_max_rows=DB_CACHE_MAX_ROWS):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.db_max_rows = db_max_rows
+        self.memory = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self.db_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is not MISSING:
+            return dict(value)
+
+        db = self.session_factory()
+        try:
+            entry = db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.cache_key == key).first()
+            now = get_kst_now()
+            if entry is None or entry.expires_at <= now:
+                with self._lock:
+                    self.misses += 1
+                return None
+            entry.last_used_at = now
+            entry.hit_count = (entry.hit_count or 0) + 1
+            db.commit()
+            result = json.loads(entry.result_json)
+        finally:
+            db.close()
+
+        with self._lock:
+            self.db_hits += 1
+        self.memory.set(key, result)
+        return dict(result)
+
+    def set(self, key: str, result: dict):
+        self.memory.set(key, dict(result))
+
+        now = get_kst_now()
+        expires_at = now + timedelta(seconds=self.ttl)
+        result_json = json.dumps(result, ensure_ascii=False)
+        db = self.session_factory()
+        try:
+            entry = db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.cache_key == key).first()
+            if entry is None:
+                db.add(AnalysisCacheEntry(cache_key=key, result_json=result_json,
+                                          created_at=now, last_used_at=now, expires_at=expires_at))
+            else:
+                entry.result_json = result_json
+                entry.last_used_at = now
+                entry.expires_at = expires_at
+            db.commit()
+        except IntegrityError:
+            # 다른 워커가 같은 키를 먼저 저장한 경우 - 결과는 동일하므로 무시
+            db.rollback()
+        finally:
+            db.close()
+
+        with self._lock:
+            self.stores += 1
+            should_evict = self.stores % DB_EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """만료된 행을 지우고, 최대 행 수를 넘으면 가장 오래 사용되지 않은 행부터 삭제"""
+        db = self.session_factory()
+        try:
+            db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.expires_at <= get_kst_now())\
+              .delete(synchronize_session=False)
+            count = db.query(func.count(AnalysisCacheEntry.id)).scalar()
+            overflow = count - self.db_max_rows
+            if overflow > 0:
+                old_ids = [row.id for row in db.query(AnalysisCacheEntry.id)
+                           .order_by(AnalysisCacheEntry.last_used_at.asc()).limit(overflow)]
+                db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.id.in_(old_ids))\
+                  .delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self):
+        memory = self.memory.stats()
+        lookups = memory["hits"] + self.db_hits + self.misses
+        return {
+            "memory": memory,
+            "memory_hits": memory["hits"],
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round((memory["hits"] + self.db_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+analysis_cache = AnalysisCache()
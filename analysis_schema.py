@@ -0,0 +1,163 @@
+# analysis_schema.py
+# 식단 분석 응답(ANALYSIS_PROMPT 포맷) 검증 모델 + 깨진/잘린 JSON 복구
+import json
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+IMPACT_LEVELS = ("낮음", "보통", "높음", "매우 높음")
+ANALYSIS_ERROR = "Error"  # 분석 실패 결과의 food_name (저장/캐시하지 않음)
+REPAIR_MAX_CUTS = 30      # 잘린 JSON에서 마지막 항목을 잘라 가며 다시 시도하는 횟수
+
+
+class FoodAnalysis(BaseModel):
+    food_name: str = Field(min_length=1)
+    blood_sugar_impact: Literal[IMPACT_LEVELS]
+    carbs_ratio: int = Field(ge=0, le=100)
+    protein_ratio: int = Field(ge=0, le=100)
+    fat_ratio: int = Field(ge=0, le=100)
+    summary: str = Field(min_length=1)
+    action_guide: str = Field(min_length=1)
+    detailed_action_guide: str = Field(min_length=1)
+    alternatives: str = Field(min_length=1)
+
+    @field_validator("blood_sugar_impact", mode="before")
+    @classmethod
+    def _normalize_impact(cls, value):
+        # "매우높음", " 높음 " 같은 표기 차이는 맞춰 줌
+        if isinstance(value, str):
+            compact = value.replace(" ", "")
+            for level in IMPACT_LEVELS:
+                if compact == level.replace(" ", ""):
+                    return level
+        return value
+
+    @field_validator("carbs_ratio", "protein_ratio", "fat_ratio", mode="before")
+    @classmethod
+    def _parse_ratio(cls, value):
+        # "40%", "40.5" → 40
+        if isinstance(value, str):
+            value = value.strip().rstrip("%").strip()
+            try:
+                value = float(value)
+            except ValueError:
+                return value
+        if isinstance(value, float):
+            return round(value)
+        return value
+
+    @field_validator("alternatives", mode="before")
+    @classmethod
+    def _join_list(cls, value):
+        if isinstance(value, list):
+            return ", ".join(str(v) for v in value)
+        return value
+
+
+class PartialFoodAnalysis(FoodAnalysis):
+    """검증을 통과한 필드만 남긴 부분 결과용 (검증 규칙은 FoodAnalysis와 같음)"""
+    food_name: Optional[str] = Field(default=None, min_length=1)
+    blood_sugar_impact: Optional[Literal[IMPACT_LEVELS]] = None
+    carbs_ratio: Optional[int] = Field(default=None, ge=0, le=100)
+    protein_ratio: Optional[int] = Field(default=None, ge=0, le=100)
+    fat_ratio: Optional[int] = Field(default=None, ge=0, le=100)
+    summary: Optional[str] = Field(default=None, min_length=1)
+    action_guide: Optional[str] = Field(default=None, min_length=1)
+    detailed_action_guide: Optional[str] = Field(default=None, min_length=1)
+    alternatives: Optional[str] = Field(default=None, min_length=1)
+
+
+ANALYSIS_FIELDS = tuple(FoodAnalysis.model_fields)
+
+# OpenAI structured outputs(strict)용 스키마 - strict 모드는 모든 필드 required + 추가 필드 금지
+ANALYSIS_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "food_name": {"type": "string"},
+        "blood_sugar_impact": {"type": "string", "enum": list(IMPACT_LEVELS)},
+        "carbs_ratio": {"type": "integer"},
+        "protein_ratio": {"type": "integer"},
+        "fat_ratio": {"type": "integer"},
+        "summary": {"type": "string"},
+        "action_guide": {"type": "string"},
+        "detailed_action_guide": {"type": "string"},
+        "alternatives": {"type": "string"},
+    },
+    "required": list(ANALYSIS_FIELDS),
+    "additionalProperties": False,
+}
+
+
+def _close_brackets(text: str):
+    """열린 괄호를 닫은 문자열 (문자열 값 중간에서 잘렸으면 None - 잘린 값은 쓰지 않음)"""
+    stack, in_string, escaped = [], False, False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if in_string:
+        return None
+    return text.rstrip().rstrip(",") + "".join(reversed(stack))
+
+
+def extract_json(text: str):
+    """
+    LLM 응답 문자열 → dict (실패하면 None)
+    코드 펜스/앞뒤 설명은 무시하고, max_tokens로 잘린 응답은 마지막 완전한 항목까지만 살려서 닫음
+    """
+    if not text:
+        return None
+    start = text.find("{")
+    if start < 0:
+        return None
+    body = text[start:]
+    try:
+        obj, _ = json.JSONDecoder().raw_decode(body)
+        return obj if isinstance(obj, dict) else None
+    except ValueError:
+        pass
+
+    for _ in range(REPAIR_MAX_CUTS):
+        closed = _close_brackets(body)
+        if closed:
+            try:
+                obj = json.loads(closed)
+                return obj if isinstance(obj, dict) else None
+            except ValueError:
+                pass
+        cut = body.rfind(",")
+        if cut <= 0:
+            return None
+        body = body[:cut]
+    return None
+
+
+def validate_analysis(data) -> tuple:
+    """반환값: (검증된 필드 dict, 빠졌거나 잘못된 필드 목록) - 목록이 비어 있으면 완전한 결과"""
+    if not isinstance(data, dict):
+        return {}, list(ANALYSIS_FIELDS)
+    try:
+        return FoodAnalysis.model_validate(data).model_dump(), []
+    except ValidationError as e:
+        invalid = {err["loc"][0] for err in e.errors() if err["loc"]}
+    kept = {k: v for k, v in data.items() if k in ANALYSIS_FIELDS and k not in invalid}
+    partial = PartialFoodAnalysis.model_validate(kept).model_dump(exclude_none=True)
+    return partial, [f for f in ANALYSIS_FIELDS if f not in partial]
+
+
+def analysis_error(reason: str) -> dict:
+    return {"food_name": ANALYSIS_ERROR, "blood_sugar_impact": "알 수 없음", "summary": "분석 실패", "error": reason}
+
+
+def is_analysis_error(result) -> bool:
+    return not result or result.get("food_name") == ANALYSIS_ERROR
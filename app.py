@@ -1,38 +1,62 @@
 import os
+import json
+import time
+import hmac
 import secrets
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Optional
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-from dotenv import load_dotenv
+from startup import timed, startup_report, print_startup_report
 
-from database import SessionLocal, init_db, FoodLog, User, HealthLog
-from ai_service import analyze_food, chat_with_nutritionist
+with timed("import.flask"):
+    from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context, g, send_file
+    from dotenv import load_dotenv
+    import click
+
+with timed("import.database"):
+    from sqlalchemy.exc import IntegrityError
+    from database import SessionLocal, db_session, pool_stats, engine, init_db, get_kst_now, FoodLog, User, HealthLog, KST, bump_data_version
+
+with timed("import.ai_service"):
+    from ai_service import chat_with_nutritionist, stream_chat_with_nutritionist, get_app_graph, get_openai_client, budget_stats, get_analysis_stats
+
+with timed("import.services"):
+    from analysis_cache import analysis_cache
+    from job_queue import AnalysisJobQueue, JobQueueFull, sweep_jobs
+    from services import run_food_analysis, get_chat_context, AnalysisFailed
+    from safety_rules import get_prescreen_stats
+    from kakao_client import kakao_client
+    from pagination import keyset_page, parse_limit, InvalidCursor
+    from image_pipeline import preprocess_image, get_pipeline_stats
+    from storage import upload_storage, is_valid_key, content_type, IMMUTABLE_CACHE_CONTROL
+    from batch_analysis import run_batch_analysis, BATCH_MAX_ITEMS
+    from rollups import record_meals, record_glucose, get_rollups, backfill as backfill_rollups
+    from security import password_hasher, login_limiter, HashingBusy
+    from user_context import user_context
+    from metrics import render as render_metrics
+    from conversation import start_turn, finish_turn, conversation_stats, ConversationNotFound
+    from meal_response import get_meal_responses
+    from model_router import model_router
+    from dashboard import build_dashboard, get_data_version, make_etag, serialize_food_log, serialize_health_log, dashboard_stats
+    from glucose import ingest_readings, iter_records, get_series, InvalidPayload, TooManyReadings, parse_timestamp, reading_time
 
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", secrets.token_hex(16))
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB limit
 
-if not os.path.exists(app.config['UPLOAD_FOLDER']):
-    os.makedirs(app.config['UPLOAD_FOLDER'])
-
-init_db()
-
-# --- Password Context ---
-from passlib.context import CryptContext
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 운영용 엔드포인트(/api/stats, /metrics) 접근 토큰 - "Authorization: Bearer <토큰>"
+# 설정하지 않으면 프록시를 거치지 않은 로컬 요청(127.0.0.1)만 허용
+OPS_TOKEN = os.getenv("OPS_TOKEN")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or OPS_TOKEN  # Prometheus scrape 설정의 bearer_token
 
 def ensure_demo_user():
     db = SessionLocal()
     try:
         demo_user = db.query(User).filter(User.username == "demo").first()
         if not demo_user:
-            demo_pw = pwd_context.hash("demo1234")
+            demo_pw = password_hasher.hash("demo1234")
             new_user = User(
                 username="demo", 
                 hashed_password=demo_pw,
@@ -70,24 +94,92 @@ def ensure_demo_user():
                 )
             ]
             db.add_all(sample_logs)
+            db.flush()
+            record_meals(db, new_user.id, sample_logs)
             db.commit()
             print("Successfully created demo user and sample data.")
     finally:
         db.close()
 
-ensure_demo_user()
+def bootstrap():
+    """
+    프로세스 전체에서 한 번만 필요한 작업 (스키마 생성/마이그레이션, 데모 계정)
+    gunicorn preload_app=True면 마스터에서 한 번만 실행되고 워커는 fork로 물려받음
+    """
+    with timed("init.init_db"):
+        init_db()
+    with timed("init.demo_user"):
+        try:
+            ensure_demo_user()
+        except HashingBusy as e:
+            # 데모 계정은 없어도 서비스는 동작함 (다음 부팅 때 다시 만듦)
+            print(f"⚠️ [Init] 데모 계정 생성 건너뜀: {e}")
+    with timed("init.sweep_jobs"):
+        # 지난 실행에서 끝나지 못한 분석 작업은 실패로 표시, 오래된 작업 행은 삭제
+        try:
+            result = sweep_jobs()
+            if result["failed"] or result["expired"]:
+                print(f"🧹 [Init] 중단된 분석 작업 {result['failed']}건 실패 처리, 만료 {result['expired']}건 삭제")
+        except Exception as e:
+            print(f"⚠️ [Init] 분석 작업 정리 건너뜀: {e}")
+
+def init_worker():
+    """워커 프로세스마다 fork 직후 실행 (gunicorn.conf.py의 post_fork)"""
+    # (import/bootstrap 시간은 마스터에서 한 번만 쓰인 값이 그대로 보임)
+    with timed("worker.init"):
+        # 마스터가 bootstrap에서 연 DB 커넥션을 자식 프로세스가 같이 쓰지 않도록 풀을 비움
+        engine.dispose(close=False)
+        password_hasher.after_fork()
+        # 선택: 첫 요청이 느리지 않도록 LLM 클라이언트/그래프를 미리 만듦
+        if os.getenv("WARM_LLM_ON_BOOT", "false").lower() in ("1", "true", "yes"):
+            get_openai_client()
+            get_app_graph()
+    print_startup_report("worker")
+
+bootstrap()
 
 # --- Helpers ---
 def get_db():
-    db = SessionLocal()
-    try:
-        return db
-    finally:
-        pass # Handle closing in a teardown function
+    """요청 범위 DB 세션 (요청이 끝나면 shutdown_session에서 자동으로 정리, 커넥션은 첫 쿼리 때 받음)"""
+    return db_session()
 
 @app.teardown_appcontext
 def shutdown_session(exception=None):
-    pass # SessionLocal is handled manually or we can use a middleware/decorator
+    # 예외가 나도 커밋되지 않은 트랜잭션은 롤백되고 커넥션은 풀로 반환됨
+    db_session.remove()
+
+def save_upload(file):
+    """
+    업로드 원본을 저장하고, 분석용으로 줄인 이미지와 기록 목록용 썸네일을 준비
+    원본/썸네일은 내용 해시 키로 저장 (storage.py) → 같은 사진을 다시 올려도 파일은 하나
+    반환값: 업로드 정보 dict (파일이 없으면 None)
+    """
+    if not file:
+        return None
+    # 요청 본문(werkzeug가 임시 파일로 받아 둔 스트림)을 청크 단위로 저장
+    stored = upload_storage.save_stream(file.stream)
+    # 같은 스트림을 처음부터 다시 디코딩 (원본 전체를 bytes로 읽지 않음 - 메모리에는 줄인 이미지만)
+    file.stream.seek(0)
+    processed = preprocess_image(file.stream)
+    thumbnail_filename = None
+    if processed["thumbnail"]:
+        thumbnail_filename = upload_storage.save_bytes(processed["thumbnail"])["key"]
+    
+    return {
+        "image_filename": stored["key"],
+        "thumbnail_filename": thumbnail_filename,
+        "img_bytes": processed["bytes"],
+        "image_mime": processed["mime"],
+        "saved_bytes": processed["saved_bytes"],
+        "deduplicated": stored["deduplicated"]
+    }
+
+def paged_response(items, next_cursor):
+    """목록은 그대로 반환하고, 다음 페이지 커서는 X-Next-Cursor 헤더로 전달"""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 def login_required(f):
     from functools import wraps
@@ -98,6 +190,28 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def _is_direct_local_request():
+    # 같은 호스트의 리버스 프록시를 거친 요청도 remote_addr가 127.0.0.1이므로 X-Forwarded-For가 있으면 외부 요청으로 봄
+    return request.remote_addr in ("127.0.0.1", "::1") and 'X-Forwarded-For' not in request.headers
+
+def ops_token_required(token):
+    """운영용 엔드포인트 보호 (token이 없으면 로컬 요청만 허용)"""
+    from functools import wraps
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if token:
+                supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+                allowed = hmac.compare_digest(supplied.encode(), token.encode())
+            else:
+                allowed = _is_direct_local_request()
+            if not allowed:
+                return Response("Unauthorized\n", status=401, mimetype='text/plain',
+                                headers={'WWW-Authenticate': 'Bearer'})
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
 # --- Routes ---
 
 @app.route('/')
@@ -111,25 +225,37 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
+        ip = request.remote_addr
+        
+        # 실패가 반복된 IP/아이디는 해시 계산 전에 바로 거절
+        if login_limiter.is_blocked(ip, username):
+            flash('로그인 시도가 너무 많습니다. 잠시 후 다시 시도해 주세요.')
+            return render_template('login.html'), 429
         
-        db = SessionLocal()
+        db = get_db()
         user = db.query(User).filter(User.username == username).first()
-        db.close()
         
-        if user and (check_password_hash(user.hashed_password, password) or (username == "demo" and password == "demo1234")):
-            # Note: The database currently uses bcrypt via passlib, but main.py uses pwd_context
-            # I should be careful with password verification logic if I change it.
-            # Let's check how main.py does it.
+        if user and password:
+            # 해시 검증(수백 ms) 동안 커넥션을 붙잡지 않도록 읽기 트랜잭션을 먼저 끝내 풀에 반환
+            user_id, hashed_password = user.id, user.hashed_password
+            db.rollback()
+            try:
+                ok, new_hash = password_hasher.verify_and_update(password, hashed_password)
+            except HashingBusy:
+                flash('지금은 로그인 요청이 많습니다. 잠시 후 다시 시도해 주세요.')
+                return render_template('login.html'), 503
             
-            # For now, let's use the same logic as main.py (FastAPI) which is bcrypt
-            from passlib.context import CryptContext
-            pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-            
-            if user and pwd_context.verify(password, user.hashed_password):
-                session['user_id'] = user.id
-                session['username'] = user.username
+            if ok:
+                # 해시 비용(BCRYPT_ROUNDS)이 바뀌었으면 새 비용으로 다시 저장
+                if new_hash:
+                    db.query(User).filter(User.id == user_id).update({User.hashed_password: new_hash})
+                    db.commit()
+                login_limiter.reset(username)
+                session['user_id'] = user_id
+                session['username'] = username
                 return redirect(url_for('index'))
-            
+        
+        login_limiter.record_failure(ip, username)
         flash('아이디 또는 비밀번호가 올바르지 않습니다.')
     return render_template('login.html')
 
@@ -139,21 +265,21 @@ def signup():
         username = request.form.get('username')
         password = request.form.get('password')
         
-        db = SessionLocal()
+        db = get_db()
         existing_user = db.query(User).filter(User.username == username).first()
         if existing_user:
-            db.close()
             flash('이미 존재하는 아이디입니다.')
             return redirect(url_for('signup'))
         
-        from passlib.context import CryptContext
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        hashed_pw = pwd_context.hash(password)
+        try:
+            hashed_pw = password_hasher.hash(password)
+        except HashingBusy:
+            flash('지금은 요청이 많습니다. 잠시 후 다시 시도해 주세요.')
+            return redirect(url_for('signup'))
         
         new_user = User(username=username, hashed_password=hashed_pw)
         db.add(new_user)
         db.commit()
-        db.close()
         
         flash('회원가입이 완료되었습니다. 로그인해 주세요.')
         return redirect(url_for('login'))
@@ -167,7 +293,7 @@ def logout():
 @app.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
-    db = SessionLocal()
+    db = get_db()
     user = db.query(User).filter(User.id == session['user_id']).first()
     
     if request.method == 'POST':
@@ -180,9 +306,10 @@ def profile():
         user.hba1c = float(request.form.get('hba1c', 0)) or None
         user.activity_level = request.form.get('activity_level')
         user.health_goal = request.form.get('health_goal')
+        bump_data_version(db, user.id)
         
         db.commit()
-        db.close()
+        user_context.invalidate(user.id)
         flash('프로필이 업데이트되었습니다.')
         return redirect(url_for('index'))
     
@@ -197,145 +324,423 @@ def profile():
         "activity_level": user.activity_level,
         "health_goal": user.health_goal
     }
-    db.close()
     return render_template('profile.html', user=user_data)
 
 @app.route('/profile_data')
 @login_required
 def profile_data():
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == session['user_id']).first()
+    user = user_context.get_profile(get_db(), session['user_id'])
     data = {
-        "gender": user.gender,
-        "age": user.age
+        "gender": user["gender"],
+        "age": user["age"]
     }
-    db.close()
     return jsonify(data)
 
 @app.route('/api/health/sugar', methods=['GET', 'POST'])
 @login_required
 def health_sugar():
-    db = SessionLocal()
+    db = get_db()
     if request.method == 'POST':
         data = request.json
         new_log = HealthLog(
+            created_at=reading_time(get_kst_now()),
             sugar_level=data.get('sugar_level'),
             note=data.get('note'),
             owner_id=session['user_id']
         )
         db.add(new_log)
+        try:
+            db.flush()
+        except IntegrityError:
+            # 같은 시각(초)의 측정값은 한 건만 저장 (일괄 업로드와 같은 기준)
+            db.rollback()
+            return jsonify({"error": "같은 시각의 측정값이 이미 있습니다."}), 409
+        record_glucose(db, session['user_id'], [(new_log.created_at, new_log.sugar_level)])
+        bump_data_version(db, session['user_id'])
         db.commit()
-        db.close()
         return jsonify({"msg": "Logged"})
     
-    logs = db.query(HealthLog).filter(HealthLog.owner_id == session['user_id'])\
-             .order_by(HealthLog.created_at.desc()).limit(20).all()
-    result = [{
-        "created_at": log.created_at.strftime("%m-%d %H:%M"),
-        "sugar_level": log.sugar_level,
-        "note": log.note
-    } for log in logs]
-    db.close()
-    return jsonify(result)
+    query = db.query(HealthLog).filter(HealthLog.owner_id == session['user_id'])
+    try:
+        logs, next_cursor = keyset_page(query, HealthLog, request.args.get('cursor'),
+                                        parse_limit(request.args.get('limit'), 20))
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    return paged_response([serialize_health_log(log) for log in logs], next_cursor)
+
+@app.route('/api/health/sugar/bulk', methods=['POST'])
+@login_required
+def health_sugar_bulk():
+    """
+    CGM 측정값 일괄 저장 (JSON 배열 / NDJSON / CSV)
+    각 측정값: {"timestamp": ISO8601 또는 epoch 초, "sugar_level": mg/dL, "note": 선택}
+    같은 시각의 측정값은 한 번만 저장됨
+    """
+    records = iter_records(request.stream, request.content_type)
+    try:
+        report = ingest_readings(get_db(), session['user_id'], records)
+    except InvalidPayload as e:
+        return jsonify({"error": str(e)}), 400
+    except TooManyReadings as e:
+        return jsonify({"error": str(e)}), 413
+    return jsonify(report)
+
+@app.route('/api/health/sugar/series')
+@login_required
+def health_sugar_series():
+    """차트용 혈당 구간 집계 (start/end: ISO8601, 기본 최근 24시간 / bucket: 초, 생략하면 자동)"""
+    try:
+        end = parse_timestamp(request.args['end']) if request.args.get('end') else get_kst_now()
+        start = parse_timestamp(request.args['start']) if request.args.get('start') else end - timedelta(hours=24)
+        bucket = int(request.args['bucket']) if request.args.get('bucket') else None
+    except ValueError:
+        return jsonify({"error": "start/end는 ISO8601, bucket은 초 단위 정수입니다."}), 400
+    if start >= end:
+        return jsonify({"error": "start가 end보다 늦습니다."}), 400
+    if bucket is not None and bucket < 60:
+        return jsonify({"error": "bucket은 60초 이상이어야 합니다."}), 400
+    
+    return jsonify(get_series(get_db(), session['user_id'], start, end, bucket))
 
 @app.route('/api/analyze', methods=['POST'])
 @login_required
 def analyze():
     text = request.form.get('text')
-    file = request.files.get('file')
-    
-    image_filename = None
-    if file:
-        image_filename = f"{secrets.token_hex(8)}_{secure_filename(file.filename)}"
-        file.seek(0) # Reset before saving if needed, but analyze_food might have read it
-        # Actually file.read() was called above, so we need to handle it.
-        # Let's fix the file reading logic to allow both analyze and save.
+    upload = save_upload(request.files.get('file'))
     
-    # Let's re-read image_bytes if file exists
-    if file:
-        file.seek(0)
-        img_bytes = file.read()
-        file.seek(0)
-        file.save(os.path.join(app.config['UPLOAD_FOLDER'], image_filename))
+    try:
+        result, cache_status = run_food_analysis(get_db(), session['user_id'], text, upload)
+    except AnalysisFailed as e:
+        # 실패한 분석은 기록으로 남기지 않음 (업로드 파일은 참조가 없으니 storage-gc가 정리)
+        return jsonify({"error": f"분석에 실패했습니다: {e}"}), 502
     
+    response = jsonify(result)
+    response.headers['X-Analysis-Cache'] = cache_status
+    if upload:
+        response.headers['X-Image-Bytes-Saved'] = str(upload["saved_bytes"])
+    return response
+
+def run_analysis_job(payload):
+    """백그라운드 스레드에서 실행되는 분석 작업 (요청 컨텍스트 없음)"""
     db = SessionLocal()
-    user = db.query(User).filter(User.id == session['user_id']).first()
+    try:
+        result, _ = run_food_analysis(db, payload["user_id"], payload["text"], payload["upload"])
+        return result
+    finally:
+        db.close()
+
+analysis_jobs = AnalysisJobQueue(runner=run_analysis_job)
+
+@app.route('/api/analyze/jobs', methods=['POST'])
+@login_required
+def submit_analysis_job():
+    """분석 작업을 큐에 넣고 job_id를 즉시 반환 (결과는 폴링으로 조회)"""
+    try:
+        # 자리부터 잡고 업로드 저장 (대기열이 가득 차면 이미지 저장/변환 없이 바로 503)
+        with analysis_jobs.reserve() as slot:
+            payload = {
+                "user_id": session['user_id'],
+                "text": request.form.get('text'),
+                "upload": save_upload(request.files.get('file'))
+            }
+            job_id = slot.submit(session['user_id'], payload)
+    except JobQueueFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
     
-    profile = {
-        "diabetes_type": user.diabetes_type, 
-        "health_goal": user.health_goal,
-        "age": user.age, 
-        "gender": user.gender
-    }
+    response = jsonify({"job_id": job_id, "status": "queued"})
+    response.headers['Location'] = url_for('get_analysis_job', job_id=job_id)
+    return response, 202
+
+@app.route('/api/analyze/jobs/<job_id>')
+@login_required
+def get_analysis_job(job_id):
+    job = analysis_jobs.get(job_id, session['user_id'])
+    if job is None:
+        return jsonify({"error": "작업을 찾을 수 없습니다."}), 404
+    return jsonify(job)
+
+@app.route('/api/analyze/batch', methods=['POST'])
+@login_required
+def analyze_batch():
+    """
+    식단 일괄 분석 (다른 앱 기록 가져오기)
+    - JSON: {"items": [{"text": "김치찌개", "eaten_at": "2026-09-01T12:30"}, ...]}
+    - multipart: items 필드(JSON 문자열)의 항목에 {"file": "<파일 필드 이름>"}으로 이미지 지정
+    """
+    if request.is_json:
+        raw_items = (request.json or {}).get('items')
+    else:
+        try:
+            raw_items = json.loads(request.form.get('items', '[]'))
+        except ValueError:
+            return jsonify({"error": "items 형식이 올바르지 않습니다."}), 400
+    
+    if not isinstance(raw_items, list) or not raw_items:
+        return jsonify({"error": "분석할 항목이 없습니다."}), 400
+    if len(raw_items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"한 번에 최대 {BATCH_MAX_ITEMS}개까지 분석할 수 있습니다."}), 413
     
-    result = analyze_food(text, img_bytes, profile)
+    items = []
+    for i, raw in enumerate(raw_items):
+        if not isinstance(raw, dict):
+            return jsonify({"error": f"{i}번 항목 형식이 올바르지 않습니다."}), 400
+        text = (raw.get('text') or '').strip() or None
+        file = request.files.get(raw['file']) if raw.get('file') else None
+        if not text and not file:
+            return jsonify({"error": f"{i}번 항목에 음식 정보가 없습니다."}), 400
+        
+        eaten_at = None
+        if raw.get('eaten_at'):
+            try:
+                eaten_at = datetime.fromisoformat(raw['eaten_at'])
+            except (TypeError, ValueError):
+                return jsonify({"error": f"{i}번 항목의 eaten_at 형식이 올바르지 않습니다."}), 400
+            if eaten_at.tzinfo is not None:
+                eaten_at = eaten_at.astimezone(KST).replace(tzinfo=None)
+        items.append({"text": text, "file": file, "eaten_at": eaten_at})
     
-    log = FoodLog(
-        input_type="image" if file else "text",
-        food_description=result.get("food_name", text or "Unknown"),
-        blood_sugar_impact=result.get("blood_sugar_impact"),
-        carbs_ratio=result.get("carbs_ratio"),
-        protein_ratio=result.get("protein_ratio"),
-        fat_ratio=result.get("fat_ratio"),
-        summary=result.get("summary"),
-        action_guide=result.get("action_guide"),
-        detailed_action_guide=result.get("detailed_action_guide"),
-        alternatives=result.get("alternatives"),
-        image_path=image_filename,
-        owner_id=user.id
-    )
-    db.add(log)
-    db.commit()
-    db.close()
+    for item in items:
+        item["upload"] = save_upload(item.pop("file"))
     
-    return jsonify(result)
+    return jsonify(run_batch_analysis(get_db(), session['user_id'], items))
 
 @app.route('/api/history')
 @login_required
 def history():
-    db = SessionLocal()
-    logs = db.query(FoodLog).filter(FoodLog.owner_id == session['user_id'])\
-             .order_by(FoodLog.created_at.desc()).limit(10).all()
+    db = get_db()
+    query = db.query(FoodLog).filter(FoodLog.owner_id == session['user_id'])
+    try:
+        logs, next_cursor = keyset_page(query, FoodLog, request.args.get('cursor'),
+                                        parse_limit(request.args.get('limit'), 10))
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return paged_response([serialize_food_log(log) for log in logs], next_cursor)
+
+@app.route('/api/dashboard')
+@login_required
+def dashboard():
+    """
+    기록 탭 데이터 한 번에 (식단 기록 첫 페이지, 혈당 기록, 프로필 요약, 차트용 혈당 시리즈)
+    If-None-Match가 현재 버전과 같으면 버전만 읽고 304
+    """
+    db = get_db()
+    user_id = session['user_id']
+    version = get_data_version(db, user_id)
+    etag = make_etag(user_id, version)
     
-    result = []
-    for log in logs:
-        result.append({
-            "created_at": log.created_at.strftime("%m-%d %H:%M"),
-            "food_description": log.food_description,
-            "blood_sugar_impact": log.blood_sugar_impact,
-            "carbs_ratio": log.carbs_ratio,
-            "protein_ratio": log.protein_ratio,
-            "fat_ratio": log.fat_ratio,
-            "summary": log.summary,
-            "detailed_action_guide": log.detailed_action_guide,
-            "image_path": log.image_path
-        })
-    db.close()
-    return jsonify(result)
+    if request.if_none_match.contains_weak(etag):
+        dashboard_stats["not_modified"] += 1
+        response = app.response_class(status=304)
+    else:
+        dashboard_stats["full"] += 1
+        response = jsonify(build_dashboard(db, user_id, version))
+    response.set_etag(etag, weak=True)
+    # 브라우저가 매번 재검증하도록 (캐시는 하되 쓰기 전에 ETag 확인)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/api/rollups')
+@login_required
+def rollups():
+    """
+    기간별 식단/혈당 집계 (집계 테이블만 읽음)
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD (기본: 최근 7일)
+    """
+    today = get_kst_now().date()
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else today
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=6)
+    except ValueError:
+        return jsonify({"error": "날짜 형식은 YYYY-MM-DD 입니다."}), 400
+    if start > end:
+        return jsonify({"error": "start가 end보다 늦습니다."}), 400
+    
+    return jsonify(get_rollups(get_db(), session['user_id'], start, end))
+
+def new_chat_message(data):
+    """이번 턴의 사용자 메시지 (이전 클라이언트처럼 전체 기록을 보내면 마지막 사용자 메시지만 사용)"""
+    if data.get('message'):
+        return data['message'].strip()
+    for msg in reversed(data.get('messages') or []):
+        if msg.get("role") == "user":
+            return (msg.get("content") or "").strip()
+    return ""
+
+@app.route('/api/analytics/meal-response')
+@login_required
+def meal_response():
+    """식사별 실제 혈당 반응 (start/end: YYYY-MM-DD, 기본 최근 30일)"""
+    today = get_kst_now().date()
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else today
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({"error": "날짜 형식은 YYYY-MM-DD 입니다."}), 400
+    if start > end:
+        return jsonify({"error": "start가 end보다 늦습니다."}), 400
+    
+    start_dt = datetime.combine(start, datetime.min.time())
+    end_dt = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    return jsonify(get_meal_responses(get_db(), session['user_id'], start_dt, end_dt))
 
 @app.route('/api/chat', methods=['POST'])
 @login_required
 def chat():
-    data = request.json
-    messages = data.get('messages', [])
-    
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == session['user_id']).first()
+    """
+    대화 기록은 서버에 저장 - 클라이언트는 {conversation_id, message}만 보냄
+    (conversation_id가 없으면 새 대화 시작)
+    """
+    data = request.json or {}
+    message = new_chat_message(data)
+    if not message:
+        return jsonify({"error": "메시지를 입력해주세요."}), 400
     
-    profile = {
-        "diabetes_type": user.diabetes_type or "정보 없음", 
-        "health_goal": user.health_goal or "일반 건강 관리"
-    }
+    db = get_db()
+    profile, logs = get_chat_context(db, session['user_id'])
     
-    recent = db.query(FoodLog).filter(FoodLog.owner_id == user.id).order_by(FoodLog.created_at.desc()).limit(5).all()
-    logs = [{"time": l.created_at.strftime("%H:%M"), "desc": l.food_description} for l in recent]
-    db.close()
+    try:
+        turn = start_turn(db, session['user_id'], data.get('conversation_id'), message)
+    except ConversationNotFound:
+        return jsonify({"error": "대화를 찾을 수 없습니다."}), 404
     
     try:
-        reply = chat_with_nutritionist(profile, logs, messages)
-        return jsonify({"reply": reply})
+        reply, usage, trace = chat_with_nutritionist(profile, logs, turn["history"], turn["summary"])
+        finish_turn(db, turn["conversation_id"], reply, usage["prompt_tokens"] or None)
+        usage["context_tokens"] = turn["context_tokens"]
+        return jsonify({"reply": reply, "conversation_id": turn["conversation_id"],
+                        "usage": usage, "trace": trace})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def sse_event(event, data):
+    """Server-Sent Events 한 건을 문자열로 변환"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+@login_required
+def chat_stream():
+    """챗봇 답변을 SSE로 스트리밍 (토큰/노드 이벤트/안전 검사 철회)"""
+    data = request.json or {}
+    message = new_chat_message(data)
+    if not message:
+        return jsonify({"error": "메시지를 입력해주세요."}), 400
+    
+    # 스트리밍이 끝날 때까지 DB 커넥션을 붙잡지 않도록 미리 조회하고 바로 반환
+    db = get_db()
+    profile, logs = get_chat_context(db, session['user_id'])
+    try:
+        turn = start_turn(db, session['user_id'], data.get('conversation_id'), message)
+    except ConversationNotFound:
+        return jsonify({"error": "대화를 찾을 수 없습니다."}), 404
+    finally:
+        db_session.remove()
+    
+    def generate():
+        yield sse_event("conversation", {"conversation_id": turn["conversation_id"]})
+        try:
+            for event, payload in stream_chat_with_nutritionist(profile, logs, turn["history"], turn["summary"]):
+                if event == "done":
+                    # 답변이 끝난 뒤에만 잠깐 새 세션으로 저장
+                    db = SessionLocal()
+                    try:
+                        finish_turn(db, turn["conversation_id"], payload["reply"],
+                                    payload["usage"]["prompt_tokens"] or None)
+                    finally:
+                        db.close()
+                    payload["usage"]["context_tokens"] = turn["context_tokens"]
+                    payload["conversation_id"] = turn["conversation_id"]
+                yield sse_event(event, payload)
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # 프록시(nginx 등) 버퍼링 방지
+    return response
+
+@app.route('/media/<key>')
+def media(key):
+    """업로드 이미지 제공 - 키가 내용 해시라 내용이 바뀌지 않으므로 immutable 캐시"""
+    if not is_valid_key(key):
+        return jsonify({"error": "파일을 찾을 수 없습니다."}), 404
+    path = upload_storage.local_path(key)
+    try:
+        if path is not None:
+            response = send_file(path, mimetype=content_type(key), etag=key, conditional=True)
+        else:
+            response = send_file(upload_storage.open(key), mimetype=content_type(key), etag=key,
+                                 conditional=True)
+    except FileNotFoundError:
+        return jsonify({"error": "파일을 찾을 수 없습니다."}), 404
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+@app.route('/api/stats')
+@ops_token_required(OPS_TOKEN)
+def stats():
+    """운영용 캐시/성능 카운터"""
+    return jsonify({
+        "analysis_cache": analysis_cache.stats(),
+        "analysis": get_analysis_stats(),
+        "model_routing": model_router.stats(),
+        "analysis_jobs": analysis_jobs.stats(),
+        "safety_prescreen": get_prescreen_stats(),
+        "kakao_search": kakao_client.stats(),
+        "db_pool": pool_stats.stats(),
+        "image_pipeline": get_pipeline_stats(),
+        "startup": startup_report(),
+        "password_hashing": password_hasher.stats(),
+        "login_limiter": login_limiter.stats(),
+        "user_context": user_context.stats(),
+        "conversations": conversation_stats.stats(),
+        "chat_budget_exhausted": dict(budget_stats),
+        "dashboard": dict(dashboard_stats),
+        "upload_storage": upload_storage.stats()
+    })
+
+@app.route('/metrics')
+@ops_token_required(METRICS_TOKEN)
+def metrics():
+    """Prometheus 수집용 지표 (텍스트 형식, 워커 프로세스별)"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.cli.command('backfill-rollups')
+@click.option('--user-id', type=int, default=None, help='특정 사용자만 다시 계산')
+def backfill_rollups_command(user_id):
+    """기존 FoodLog/HealthLog로 일별 집계 테이블을 다시 만듭니다."""
+    db = SessionLocal()
+    try:
+        result = backfill_rollups(db, user_id)
+    finally:
+        db.close()
+    click.echo(f"집계 완료: 사용자 {result['users']}명, 식사 {result['meals']}건, 혈당 {result['readings']}건")
+
+@app.cli.command('storage-gc')
+@click.option('--grace', type=int, default=None, help='최근 N초 안에 저장된 파일은 남김 (기본 STORAGE_GC_GRACE)')
+@click.option('--dry-run', is_flag=True, help='지우지 않고 대상만 집계')
+def storage_gc_command(grace, dry_run):
+    """어떤 식단 기록도 가리키지 않는 업로드 파일을 정리합니다."""
+    db = SessionLocal()
+    try:
+        kwargs = {"dry_run": dry_run} if grace is None else {"grace": grace, "dry_run": dry_run}
+        result = upload_storage.gc(db, **kwargs)
+    finally:
+        db.close()
+    action = "삭제 대상" if dry_run else "삭제"
+    click.echo(f"정리 완료: 파일 {result['scanned']}개 확인, 참조 {result['referenced']}개, "
+               f"{action} {result['deleted']}개 ({result['freed_bytes']:,}B)")
+
+@app.cli.command('jobs-gc')
+@click.option('--ttl', type=int, default=None, help='만든 지 N초가 지난 작업 삭제 (기본 ANALYSIS_JOB_TTL)')
+def jobs_gc_command(ttl):
+    """오래된 분석 작업을 삭제하고 중단된 작업을 실패로 표시합니다."""
+    result = sweep_jobs() if ttl is None else sweep_jobs(ttl=ttl)
+    click.echo(f"정리 완료: 중단된 작업 {result['failed']}건 실패 처리, 만료 {result['expired']}건 삭제")
+
+print_startup_report("app")
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8000, debug=True)
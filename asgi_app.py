@@ -0,0 +1,231 @@
+# asgi_app.py
+# 비동기(ASGI) 실행 모드 - LLM을 오래 기다리는 라우트(분석/채팅)만 async로 처리하고 나머지는 Flask 앱을 그대로 마운트
+# 한 프로세스가 LLM 응답을 기다리는 요청 수백 개를 스레드 없이 동시에 들고 있을 수 있음
+#
+# 실행:
+#   uvicorn asgi_app:app --host 0.0.0.0 --port $PORT --workers $WEB_CONCURRENCY
+# - 라우트/세션 쿠키/서비스 로직(services.py, ai_service.py, conversation.py)은 Flask 앱과 공유
+# - 워커를 여러 개 띄우면 프로세스마다 따로 import되므로 SECRET_KEY를 꼭 지정 (세션 쿠키 서명 키 공유)
+# - DB는 기존 동기 SQLAlchemy를 스레드 풀에서 실행 (services.run_db)
+import os
+import tempfile
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.wsgi import WSGIMiddleware
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import FormDataParser
+from werkzeug.http import parse_options_header
+
+from app import app as flask_app, save_upload, new_chat_message, sse_event
+from services import arun_food_analysis, get_chat_context, run_db, AnalysisFailed
+from conversation import start_turn, finish_turn, ConversationNotFound
+from ai_service import achat_with_nutritionist, astream_chat_with_nutritionist
+from job_queue import AnalysisJobQueue, JobQueueFull
+
+# 이벤트 루프에서 도는 분석 작업은 스레드를 잡지 않으므로 대기 상한을 스레드 큐보다 크게 둠
+ASYNC_JOB_MAX_PENDING = int(os.getenv("ANALYSIS_JOB_MAX_ASYNC_PENDING", 256))
+# 업로드 본문은 이 크기까지만 메모리에 두고 넘으면 임시 파일로 (Flask/werkzeug의 기본 기준과 같음)
+UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv("UPLOAD_SPOOL_MAX_MEMORY", 500 * 1024))
+
+app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
+
+
+async def run_analysis_job_async(payload: dict) -> dict:
+    result, _ = await arun_food_analysis(payload["user_id"], payload["text"], payload["upload"])
+    return result
+
+
+# 상태/결과는 같은 analysis_jobs 테이블에 저장 → 폴링(GET /api/analyze/jobs/<id>)은 Flask 라우트가 그대로 처리
+async_analysis_jobs = AnalysisJobQueue(runner=None, arunner=run_analysis_job_async,
+                                       max_workers=1, max_pending=ASYNC_JOB_MAX_PENDING)
+
+
+def current_user_id(request: Request):
+    """Flask 세션 쿠키를 같은 키로 검증해서 user_id를 꺼냄 (로그인은 Flask 라우트가 그대로 처리)"""
+    cookie = request.cookies.get(flask_app.config["SESSION_COOKIE_NAME"])
+    if not cookie:
+        return None
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        data = serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return None
+    return data.get("user_id")
+
+
+def login_redirect():
+    return RedirectResponse("/login", status_code=302)
+
+
+async def read_json(request: Request) -> dict:
+    try:
+        return await request.json() or {}
+    except ValueError:
+        return {}
+
+
+async def spool_body(request: Request):
+    """
+    요청 본문을 청크 단위로 임시 파일(작으면 메모리)에 받음 → (파일, 길이) - 본문 전체를 bytes로 들고 있지 않음
+    Content-Length가 없거나(chunked) 거짓이어도 읽으면서 MAX_CONTENT_LENGTH를 넘으면 RequestEntityTooLarge
+    """
+    limit = flask_app.config["MAX_CONTENT_LENGTH"]
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MEMORY)
+    length = 0
+    try:
+        async for chunk in request.stream():
+            length += len(chunk)
+            if length > limit:
+                raise RequestEntityTooLarge()
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool, length
+
+
+def parse_form(body, length: int, content_type: str):
+    """multipart/urlencoded 본문 스트림 → (form, files) - Flask와 같은 werkzeug 파서 (files 값은 FileStorage)"""
+    mimetype, options = parse_options_header(content_type or "")
+    parser = FormDataParser(max_content_length=flask_app.config["MAX_CONTENT_LENGTH"])
+    _, form, files = parser.parse(body, mimetype, length, options)
+    return form, files
+
+
+def _chat_turn(db, user_id: int, conversation_id, message: str):
+    """채팅 컨텍스트 조회 + 사용자 메시지 저장 (스레드 풀에서 한 세션으로)"""
+    profile, logs = get_chat_context(db, user_id)
+    return profile, logs, start_turn(db, user_id, conversation_id, message)
+
+
+async def read_analysis_form(request: Request):
+    """(text, upload) - 파싱/이미지 저장/전처리는 CPU·디스크 작업이라 스레드 풀에서 (Flask와 같은 save_upload 사용)"""
+    body, length = await spool_body(request)
+    try:
+        form, files = await run_in_threadpool(parse_form, body, length, request.headers.get("content-type"))
+        file = files.get("file")
+        upload = await run_in_threadpool(save_upload, file) if file and file.filename else None
+    finally:
+        body.close()
+    return form.get("text"), upload
+
+
+def too_large(request: Request) -> bool:
+    # 헤더로 알 수 있으면 본문을 읽기 전에 거절 (헤더가 없으면 spool_body가 읽으면서 검사)
+    return int(request.headers.get("content-length") or 0) > flask_app.config["MAX_CONTENT_LENGTH"]
+
+
+def payload_too_large():
+    return JSONResponse({"error": "파일이 너무 큽니다."}, status_code=413)
+
+
+@app.post("/api/analyze")
+async def analyze(request: Request):
+    user_id = current_user_id(request)
+    if user_id is None:
+        return login_redirect()
+
+    if too_large(request):
+        return payload_too_large()
+    try:
+        text, upload = await read_analysis_form(request)
+    except RequestEntityTooLarge:
+        return payload_too_large()
+
+    try:
+        result, cache_status = await arun_food_analysis(user_id, text, upload)
+    except AnalysisFailed as e:
+        return JSONResponse({"error": f"분석에 실패했습니다: {e}"}, status_code=502)
+    headers = {"X-Analysis-Cache": cache_status}
+    if upload:
+        headers["X-Image-Bytes-Saved"] = str(upload["saved_bytes"])
+    return JSONResponse(result, headers=headers)
+
+
+@app.post("/api/analyze/jobs")
+async def submit_analysis_job(request: Request):
+    """분석 작업을 이벤트 루프 태스크로 넣고 job_id를 즉시 반환 (Flask 라우트와 같은 응답 형식)"""
+    user_id = current_user_id(request)
+    if user_id is None:
+        return login_redirect()
+
+    if too_large(request):
+        return payload_too_large()
+    try:
+        # 자리부터 잡고 본문 읽기/업로드 저장 (대기열이 가득 차면 바로 503)
+        with async_analysis_jobs.reserve() as slot:
+            text, upload = await read_analysis_form(request)
+            job_id = await slot.asubmit(user_id, {"user_id": user_id, "text": text, "upload": upload})
+    except RequestEntityTooLarge:
+        return payload_too_large()
+    except JobQueueFull as e:
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "5"})
+    return JSONResponse({"job_id": job_id, "status": "queued"}, status_code=202,
+                        headers={"Location": f"/api/analyze/jobs/{job_id}"})
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    user_id = current_user_id(request)
+    if user_id is None:
+        return login_redirect()
+
+    data = await read_json(request)
+    message = new_chat_message(data)
+    if not message:
+        return JSONResponse({"error": "메시지를 입력해주세요."}, status_code=400)
+
+    try:
+        profile, logs, turn = await run_db(_chat_turn, user_id, data.get("conversation_id"), message)
+    except ConversationNotFound:
+        return JSONResponse({"error": "대화를 찾을 수 없습니다."}, status_code=404)
+
+    try:
+        reply, usage, trace = await achat_with_nutritionist(profile, logs, turn["history"], turn["summary"])
+        await run_db(finish_turn, turn["conversation_id"], reply, usage["prompt_tokens"] or None)
+        usage["context_tokens"] = turn["context_tokens"]
+        return JSONResponse({"reply": reply, "conversation_id": turn["conversation_id"],
+                             "usage": usage, "trace": trace})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: Request):
+    user_id = current_user_id(request)
+    if user_id is None:
+        return login_redirect()
+
+    data = await read_json(request)
+    message = new_chat_message(data)
+    if not message:
+        return JSONResponse({"error": "메시지를 입력해주세요."}, status_code=400)
+
+    try:
+        profile, logs, turn = await run_db(_chat_turn, user_id, data.get("conversation_id"), message)
+    except ConversationNotFound:
+        return JSONResponse({"error": "대화를 찾을 수 없습니다."}, status_code=404)
+
+    async def generate():
+        yield sse_event("conversation", {"conversation_id": turn["conversation_id"]})
+        try:
+            async for event, payload in astream_chat_with_nutritionist(profile, logs, turn["history"],
+                                                                       turn["summary"]):
+                if event == "done":
+                    await run_db(finish_turn, turn["conversation_id"], payload["reply"],
+                                 payload["usage"]["prompt_tokens"] or None)
+                    payload["usage"]["context_tokens"] = turn["context_tokens"]
+                    payload["conversation_id"] = turn["conversation_id"]
+                yield sse_event(event, payload)
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+
+    return StreamingResponse(generate(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# 위에서 정의하지 않은 나머지 경로(로그인/프로필/기록/혈당/대시보드/정적 파일/지표)는 Flask 앱이 처리
+app.mount("/", WSGIMiddleware(flask_app))
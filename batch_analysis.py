@@ -0,0 +1,156 @@
+# batch_analysis.py
+# 다른 앱에서 가져온 식단 기록 일괄 분석 (중복 제거 → 캐시 → 묶음 LLM 요청 → 한 번에 저장)
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import insert
+
+from database import FoodLog, get_kst_now, bump_data_version
+from ai_service import analyze_food, analyze_food_batch
+from analysis_cache import analysis_cache, make_cache_key, hash_image
+from analysis_schema import is_analysis_error
+from services import get_analysis_profile
+from rollups import record_meals
+from user_context import user_context
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 100))
+BATCH_TEXT_PACK_SIZE = int(os.getenv("BATCH_TEXT_PACK_SIZE", 8))    # LLM 요청 하나에 묶을 텍스트 수
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))          # 동시에 보낼 LLM 요청 수
+
+
+def _is_valid(result) -> bool:
+    return not is_analysis_error(result)
+
+
+def run_batch_analysis(db, user_id: int, items: list, analyzer=None, batch_analyzer=None):
+    """
+    items: [{"text": str|None, "upload": dict|None, "eaten_at": datetime|None}, ...]
+    analyzer / batch_analyzer: analyze_food / analyze_food_batch 대체용 (테스트에서 가짜 LLM 주입)
+    반환값: {"items": [항목별 상태], "summary": {...}}
+    """
+    analyzer = analyzer or analyze_food
+    batch_analyzer = batch_analyzer or analyze_food_batch
+    started = time.perf_counter()
+
+    profile = get_analysis_profile(db, user_id)
+
+    # 1. 같은 입력끼리 묶기 (배치 안 중복 제거)
+    keys = []
+    groups = {}  # cache_key -> 첫 번째 항목 index
+    for i, item in enumerate(items):
+        upload = item.get("upload") or {}
+        key = make_cache_key(item.get("text"), hash_image(upload.get("img_bytes")), profile)
+        keys.append(key)
+        groups.setdefault(key, i)
+
+    # 2. 캐시 조회
+    results = {}  # cache_key -> 분석 결과
+    statuses = {}  # cache_key -> "cached" / "analyzed" / "error"
+    pending = []
+    for key, first in groups.items():
+        cached = analysis_cache.get(key)
+        if cached is not None:
+            results[key] = cached
+            statuses[key] = "cached"
+        else:
+            pending.append(first)
+
+    # 3. 텍스트 항목은 여러 개를 LLM 요청 하나로 묶고, 이미지 항목은 각각 요청
+    #    (LLM을 기다리는 동안 커넥션을 잡고 있지 않도록 읽기 트랜잭션을 먼저 끝냄)
+    db.rollback()
+    text_items, image_items = [], []
+    for i in pending:
+        has_image = bool((items[i].get("upload") or {}).get("img_bytes"))
+        (image_items if has_image else text_items).append(i)
+    packs = [text_items[n:n + BATCH_TEXT_PACK_SIZE] for n in range(0, len(text_items), BATCH_TEXT_PACK_SIZE)]
+
+    def analyze_one(i):
+        upload = items[i].get("upload") or {}
+        return analyzer(items[i].get("text"), upload.get("img_bytes"), profile,
+                        image_mime=upload.get("image_mime", "image/jpeg"))
+
+    def analyze_pack(pack):
+        if len(pack) == 1:
+            return [analyze_one(pack[0])]
+        packed = batch_analyzer([items[i].get("text") for i in pack], profile)
+        # 묶음 응답에서 빠진 항목은 개별 요청으로 다시 시도
+        return [r if _is_valid(r) else analyze_one(i) for i, r in zip(pack, packed)]
+
+    llm_requests = len(packs) + len(image_items)
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as executor:
+        pack_futures = [(pack, executor.submit(analyze_pack, pack)) for pack in packs]
+        image_futures = [([i], executor.submit(lambda i=i: [analyze_one(i)])) for i in image_items]
+        for indices, future in pack_futures + image_futures:
+            try:
+                pack_results = future.result()
+            except Exception as e:
+                print(f"❌ [Batch] 분석 실패: {e}")
+                pack_results = [None] * len(indices)
+            for i, result in zip(indices, pack_results):
+                key = keys[i]
+                if _is_valid(result):
+                    results[key] = result
+                    statuses[key] = "analyzed"
+                    analysis_cache.set(key, result)
+                else:
+                    statuses[key] = "error"
+
+    # 4. 성공한 항목만 FoodLog로 한 번에 저장 (단일 트랜잭션, executemany)
+    rows = []
+    report = []
+    for i, item in enumerate(items):
+        key = keys[i]
+        status = statuses[key]
+        if status != "error" and groups[key] != i:
+            status = "duplicate"
+        entry = {"index": i, "status": status}
+        if status == "error":
+            entry["error"] = "분석 실패"
+            report.append(entry)
+            continue
+
+        result = results[key]
+        upload = item.get("upload") or {}
+        rows.append({
+            "created_at": item.get("eaten_at") or get_kst_now(),
+            "input_type": "image" if upload.get("img_bytes") else "text",
+            "food_description": result.get("food_name", item.get("text") or "Unknown"),
+            "blood_sugar_impact": result.get("blood_sugar_impact"),
+            "carbs_ratio": result.get("carbs_ratio"),
+            "protein_ratio": result.get("protein_ratio"),
+            "fat_ratio": result.get("fat_ratio"),
+            "summary": result.get("summary"),
+            "action_guide": result.get("action_guide"),
+            "detailed_action_guide": result.get("detailed_action_guide"),
+            "alternatives": result.get("alternatives"),
+            "image_path": upload.get("image_filename"),
+            "thumbnail_path": upload.get("thumbnail_filename"),
+            "owner_id": user_id,
+        })
+        entry["result"] = result
+        report.append(entry)
+
+    if rows:
+        db.execute(insert(FoodLog), rows)
+        record_meals(db, user_id, rows)
+        bump_data_version(db, user_id)
+    db.commit()
+    if rows:
+        user_context.add_meals(user_id, rows)
+
+    elapsed = time.perf_counter() - started
+    counts = {}
+    for entry in report:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    return {
+        "items": report,
+        "summary": {
+            "total": len(items),
+            "saved": len(rows),
+            "statuses": counts,
+            "llm_requests": llm_requests,
+            "elapsed_seconds": round(elapsed, 3),
+            "items_per_second": round(len(items) / elapsed, 2) if elapsed > 0 else None,
+        }
+    }
@@ -0,0 +1,325 @@
+# benchmarks/loadtest.py
+# 오프라인 부하 테스트: 가짜 OpenAI/카카오 서버(stub_servers.py) + 시드 DB(seed.py)로 gunicorn 앱을 띄우고
+# 로그인/분석/기록 조회/채팅/혈당 요청을 섞어 보내서 엔드포인트별 p50/p95/p99 지연 시간과 처리량을 워커 수별로 비교
+#
+# 사용법 (저장소 루트에서):
+#   python benchmarks/loadtest.py --workers 1,2,4 --duration 30 --vusers 16
+#   python benchmarks/loadtest.py --openai-latency-ms 1500 --mix "chat=3,history=5" --json result.json
+#   python benchmarks/loadtest.py --servers sync,asgi --workers 1 --vusers 200 --mix "analyze=1,chat=1"
+#     → 같은 워커 수에서 동기(gunicorn) vs 비동기(uvicorn asgi_app) 동시 처리량 비교
+# 외부 DB로 돌리려면 --database-url (기본값은 임시 sqlite 파일)
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import start_stub_server
+from seed import BENCH_PASSWORD, USERNAME_PREFIX
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MIX = "login=1,analyze=2,history=5,chat=1,sugar_log=3,sugar_series=3,dashboard=4"
+FOODS = ["현미밥과 된장찌개", "닭가슴살 샐러드", "김치찌개와 흰쌀밥", "연어 포케", "짜장면 곱빼기", "순두부찌개"]
+CHAT_MESSAGES = ["강남역 근처에서 저녁 뭐 먹을까?", "오늘 점심 식단 어땠는지 평가해줘", "야식으로 먹어도 되는 거 추천해줘"]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _parse_mix(text):
+    mix = {}
+    for item in filter(None, text.split(",")):
+        name, weight = item.split("=")
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"알 수 없는 작업: {name} (가능: {', '.join(OPERATIONS)})")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+# --- 가상 사용자 작업 (각각 (HTTP 상태, 성공 여부) 반환) ---
+
+def op_login(vu):
+    session = requests.Session()
+    r = session.post(f"{vu.base}/login", data={"username": vu.username, "password": BENCH_PASSWORD},
+                     allow_redirects=False, timeout=vu.timeout)
+    ok = r.status_code == 302
+    if ok:
+        vu.session = session
+        vu.conversation_id = None
+    return r.status_code, ok
+
+
+def op_analyze(vu):
+    # 분석 캐시에 걸리지 않도록 매번 다른 문장
+    text = f"{random.choice(FOODS)} {random.randint(1, 3)}인분 ({random.randint(0, 1_000_000)})"
+    r = vu.session.post(f"{vu.base}/api/analyze", data={"text": text}, timeout=vu.timeout)
+    return r.status_code, r.ok
+
+
+def op_analyze_job(vu):
+    # 화면과 같은 경로: 작업 제출 후 끝날 때까지 폴링 (지연 시간 = 제출~결과)
+    text = f"{random.choice(FOODS)} {random.randint(1, 3)}인분 ({random.randint(0, 1_000_000)})"
+    r = vu.session.post(f"{vu.base}/api/analyze/jobs", data={"text": text}, timeout=vu.timeout)
+    if r.status_code != 202:
+        return r.status_code, False
+    url = f"{vu.base}/api/analyze/jobs/{r.json()['job_id']}"
+    deadline = time.monotonic() + vu.timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.2)
+        job = vu.session.get(url, timeout=vu.timeout).json()
+        if job["status"] in ("done", "error"):
+            return 200, job["status"] == "done"
+    return 408, False
+
+
+def op_history(vu):
+    r = vu.session.get(f"{vu.base}/api/history", timeout=vu.timeout)
+    return r.status_code, r.ok
+
+
+def op_chat(vu):
+    payload = {"message": random.choice(CHAT_MESSAGES), "conversation_id": vu.conversation_id}
+    r = vu.session.post(f"{vu.base}/api/chat", json=payload, timeout=vu.timeout)
+    if r.ok:
+        vu.conversation_id = r.json().get("conversation_id")
+    return r.status_code, r.ok
+
+
+def op_sugar_log(vu):
+    r = vu.session.post(f"{vu.base}/api/health/sugar", json={"sugar_level": random.randint(80, 200), "note": "bench"},
+                        timeout=vu.timeout)
+    # 가상 사용자 여럿이 같은 계정을 쓰면 같은 초에 겹칠 수 있음 (같은 시각 측정값은 한 건만 저장 → 409도 정상)
+    return r.status_code, r.ok or r.status_code == 409
+
+
+def op_sugar_series(vu):
+    r = vu.session.get(f"{vu.base}/api/health/sugar/series", timeout=vu.timeout)
+    return r.status_code, r.ok
+
+
+def op_dashboard(vu):
+    # 브라우저처럼 마지막 ETag로 조건부 요청 (304도 성공)
+    headers = {"If-None-Match": vu.dashboard_etag} if vu.dashboard_etag else {}
+    r = vu.session.get(f"{vu.base}/api/dashboard", headers=headers, timeout=vu.timeout)
+    if r.status_code == 200:
+        vu.dashboard_etag = r.headers.get("ETag")
+    return r.status_code, r.status_code in (200, 304)
+
+
+OPERATIONS = {
+    "login": op_login,
+    "analyze": op_analyze,
+    "analyze_job": op_analyze_job,
+    "history": op_history,
+    "chat": op_chat,
+    "sugar_log": op_sugar_log,
+    "sugar_series": op_sugar_series,
+    "dashboard": op_dashboard,
+}
+
+
+class VirtualUser:
+    def __init__(self, base, username, timeout):
+        self.base = base
+        self.username = username
+        self.timeout = timeout
+        self.session = None
+        self.conversation_id = None
+        self.dashboard_etag = None
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}  # 작업 이름 -> [(지연 시간, 성공 여부)]
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(name, []).append((seconds, ok))
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder, elapsed):
+    report = {}
+    for name, samples in sorted(recorder.samples.items()):
+        latencies = sorted(s for s, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        report[name] = {
+            "requests": len(samples),
+            "errors": errors,
+            "rps": round(len(samples) / elapsed, 2),
+            **{f"p{p}_ms": round(_percentile(latencies, p) * 1000, 1) for p in (50, 95, 99)},
+        }
+    total = sum(len(s) for s in recorder.samples.values())
+    report["_total"] = {"requests": total, "errors": sum(r["errors"] for r in report.values()),
+                        "rps": round(total / elapsed, 2)}
+    return report
+
+
+def run_workload(base, vusers, duration, mix, seed_users, timeout):
+    """가상 사용자 vusers명이 duration초 동안 mix 비율로 요청 (각자 먼저 로그인)"""
+    recorder = Recorder()
+    names, weights = list(mix), list(mix.values())
+    deadline = time.monotonic() + duration
+
+    def worker(i):
+        vu = VirtualUser(base, f"{USERNAME_PREFIX}{i % seed_users}", timeout)
+        name = "login"
+        while time.monotonic() < deadline:
+            if vu.session is None:
+                name = "login"
+            started = time.perf_counter()
+            try:
+                _, ok = OPERATIONS[name](vu)
+            except requests.RequestException:
+                ok = False
+            recorder.add(name, time.perf_counter() - started, ok)
+            if name == "login" and not ok:
+                # 해시 대기열이 가득 차면(503) 바로 다시 두드리지 않고 잠깐 쉬었다가 재시도
+                time.sleep(random.uniform(0.2, 1.0))
+            name = random.choices(names, weights)[0]
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(vusers)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(recorder, time.monotonic() - started)
+
+
+SERVER_COMMANDS = {
+    "sync": lambda workers, port: ["-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+    "asgi": lambda workers, port: ["-m", "uvicorn", "asgi_app:app", "--host", "127.0.0.1", "--port", str(port),
+                                   "--workers", str(workers), "--no-access-log"],
+}
+
+
+def start_app(env, server, workers, threads, port, log_path):
+    env = dict(env, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads), PORT=str(port))
+    # 파이프로 받으면 아무도 읽지 않는 동안 버퍼가 차서 서버가 멈출 수 있으므로 파일로 남김
+    with open(log_path, "ab") as log:
+        proc = subprocess.Popen([sys.executable] + SERVER_COMMANDS[server](workers, port),
+                                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=log)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            with open(log_path, encoding="utf-8", errors="replace") as log:
+                raise SystemExit(f"❌ 앱 실행 실패 ({log_path}):\n{log.read()[-2000:]}")
+        try:
+            if requests.get(f"{base}/login", timeout=1).ok:
+                return proc, base
+        except requests.RequestException:
+            time.sleep(0.3)
+    proc.terminate()
+    raise SystemExit("❌ 앱이 60초 안에 뜨지 않았습니다.")
+
+
+def stop_app(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def print_report(label, report):
+    print(f"\n📊 {label}")
+    print(f"{'endpoint':<14}{'req':>7}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in report.items():
+        if name == "_total":
+            continue
+        print(f"{name:<14}{row['requests']:>7}{row['errors']:>6}{row['rps']:>9}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+    total = report["_total"]
+    print(f"{'total':<14}{total['requests']:>7}{total['errors']:>6}{total['rps']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--servers", default="sync", help="비교할 서버 모드 (sync=gunicorn, asgi=uvicorn asgi_app)")
+    parser.add_argument("--workers", default="1,2,4", help="비교할 워커 수 (쉼표 구분)")
+    parser.add_argument("--threads", type=int, default=1, help="워커당 스레드 수 (GUNICORN_THREADS)")
+    parser.add_argument("--duration", type=float, default=30, help="워커 수별 측정 시간(초)")
+    parser.add_argument("--vusers", type=int, default=16, help="동시 가상 사용자 수")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="작업 비율 (이름=가중치,...)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--openai-latency-ms", type=int, default=800)
+    parser.add_argument("--kakao-latency-ms", type=int, default=80)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--small-failure-rate", type=float, default=0.0,
+                        help="스텁의 작은 모델이 엉성하게 답하는 비율 (모델 라우팅 에스컬레이션 확인)")
+    parser.add_argument("--seed-users", type=int, default=200)
+    parser.add_argument("--seed-days", type=int, default=30)
+    parser.add_argument("--cgm-interval", type=int, default=15)
+    parser.add_argument("--database-url", default=None, help="기본값: 임시 sqlite 파일")
+    parser.add_argument("--json", dest="json_path", default=None, help="결과를 JSON 파일로 저장")
+    args = parser.parse_args()
+    mix = _parse_mix(args.mix)
+    servers = [s.strip() for s in args.servers.split(",")]
+    for server in servers:
+        if server not in SERVER_COMMANDS:
+            raise SystemExit(f"알 수 없는 서버 모드: {server} (가능: {', '.join(SERVER_COMMANDS)})")
+
+    stub, stub_port = start_stub_server(0, args.openai_latency_ms, args.kakao_latency_ms, args.jitter,
+                                        args.small_failure_rate)
+    stub_base = f"http://127.0.0.1:{stub_port}"
+    workdir = tempfile.mkdtemp(prefix="diet-bench-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    env = dict(os.environ,
+               DATABASE_URL=database_url,
+               OPENAI_API_KEY="stub",
+               OPENAI_BASE_URL=f"{stub_base}/v1",   # OpenAI SDK
+               OPENAI_API_BASE=f"{stub_base}/v1",   # LangChain ChatOpenAI
+               KAKAO_API_KEY="stub",
+               KAKAO_API_BASE=stub_base,
+               SECRET_KEY="bench-secret")   # 워커 프로세스끼리 세션 쿠키 서명 키 공유 (uvicorn은 preload가 없음)
+    env.pop("REDIS_URL", None)
+    print(f"🧪 스텁 서버: {stub_base} (OpenAI {args.openai_latency_ms}ms, 카카오 {args.kakao_latency_ms}ms)")
+    print(f"🗄️ DB: {database_url}")
+
+    subprocess.run([sys.executable, os.path.join(ROOT, "benchmarks", "seed.py"), "--users", str(args.seed_users),
+                    "--days", str(args.seed_days), "--cgm-interval", str(args.cgm_interval)],
+                   cwd=ROOT, env=env, check=True)
+
+    results = {}
+    for server in servers:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            proc, base = start_app(env, server, workers, args.threads, _free_port(),
+                                   os.path.join(workdir, f"{server}.log"))
+            try:
+                report = run_workload(base, args.vusers, args.duration, mix, args.seed_users, args.timeout)
+            finally:
+                stop_app(proc)
+            label = f"{server} 워커 {workers}개"
+            results[label] = report
+            print_report(label, report)
+
+    stub.shutdown()
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 결과 저장: {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/meal_response_bench.py
+# 식사 후 혈당 반응 계산: NumPy 일괄 계산(meal_response.compute_responses) vs ORM 객체를 도는 단순 루프
+#
+# 사용법 (저장소 루트에서):
+#   python benchmarks/meal_response_bench.py --days 90 --interval 5 --meals-per-day 3
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from meal_response import compute_responses, RESPONSE_WINDOW_MINUTES, BASELINE_LOOKBACK_MINUTES, MIN_WINDOW_READINGS
+
+
+def make_data(days: int, interval_minutes: int, meals_per_day: int, seed: int = 42):
+    """CGM처럼 일정 간격 혈당 + 식사마다 2시간 동안 오르내리는 반응을 가진 가짜 데이터 (ORM 객체 모양)"""
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1)
+    meal_hours = np.linspace(8, 19, meals_per_day)
+    meals = []
+    for d in range(days):
+        for h in meal_hours:
+            at = start + timedelta(days=d, hours=float(h), minutes=int(rng.integers(0, 30)))
+            meals.append(SimpleNamespace(id=len(meals) + 1, created_at=at,
+                                         blood_sugar_impact=["낮음", "보통", "높음", "매우 높음"][len(meals) % 4]))
+
+    readings = []
+    meal_minutes = np.array([(m.created_at - start).total_seconds() / 60 for m in meals])
+    for i in range(days * 24 * 60 // interval_minutes):
+        minute = i * interval_minutes
+        since = minute - meal_minutes
+        rise = np.where((since > 0) & (since < 120), 60 * np.sin(np.pi * since / 120), 0).sum()
+        readings.append(SimpleNamespace(created_at=start + timedelta(minutes=minute),
+                                        sugar_level=int(95 + rise + rng.normal(0, 3))))
+    return meals, readings
+
+
+def naive_responses(meals, readings):
+    """식사마다 전체 측정값을 훑는 단순 구현 (비교 기준)"""
+    results = []
+    for meal in meals:
+        window_end = meal.created_at + timedelta(minutes=RESPONSE_WINDOW_MINUTES)
+        lookback = meal.created_at - timedelta(minutes=BASELINE_LOOKBACK_MINUTES)
+        baseline = None
+        window = []
+        for r in readings:
+            if lookback <= r.created_at <= meal.created_at:
+                baseline = r.sugar_level
+            elif meal.created_at < r.created_at <= window_end:
+                window.append(r)
+        if baseline is None or len(window) < MIN_WINDOW_READINGS:
+            results.append(None)
+            continue
+
+        peak = max(r.sugar_level for r in window)
+        points = [(meal.created_at, baseline)] + [(r.created_at, r.sugar_level) for r in window]
+        iauc = 0.0
+        for (t0, v0), (t1, v1) in zip(points, points[1:]):
+            iauc += (t1 - t0).total_seconds() / 60 * (max(v0 - baseline, 0) + max(v1 - baseline, 0)) / 2
+        results.append({"peak": peak, "delta": peak - baseline, "iauc": iauc})
+    return results
+
+
+def to_epoch(datetimes):
+    return np.array(datetimes, dtype="datetime64[s]").astype(np.int64)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--interval", type=int, default=5, help="측정 간격(분)")
+    parser.add_argument("--meals-per-day", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    meals, readings = make_data(args.days, args.interval, args.meals_per_day)
+    print(f"식사 {len(meals)}건, 혈당 측정값 {len(readings)}건")
+
+    started = time.perf_counter()
+    expected = naive_responses(meals, readings)
+    naive_seconds = time.perf_counter() - started
+
+    # NumPy 쪽은 ORM 객체 → 열 배열 변환 비용까지 포함해서 측정
+    timings, compute_timings = [], []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        meal_t = to_epoch([m.created_at for m in meals])
+        glucose_t = to_epoch([r.created_at for r in readings])
+        glucose_v = np.array([r.sugar_level for r in readings], dtype=np.float64)
+        loaded = time.perf_counter()
+        result = compute_responses(meal_t, glucose_t, glucose_v)
+        timings.append(time.perf_counter() - started)
+        compute_timings.append(time.perf_counter() - loaded)
+    vector_seconds = min(timings)
+
+    for i, exp in enumerate(expected):
+        if exp is None:
+            assert np.isnan(result["delta"][i]), i
+            continue
+        for key in ("peak", "delta", "iauc"):
+            assert abs(result[key][i] - exp[key]) < 1e-6, (i, key, result[key][i], exp[key])
+
+    print(f"단순 루프:   {naive_seconds * 1000:10.1f} ms")
+    print(f"NumPy 일괄:  {vector_seconds * 1000:10.1f} ms  (x{naive_seconds / vector_seconds:.0f}, "
+          f"배열 변환 제외 계산만 {min(compute_timings) * 1000:.1f} ms)")
+    print("결과 일치 ✅")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/seed.py
+# 부하 테스트용 DB 채우기: 사용자 N명 + 사용자별 식단 기록(FoodLog)과 CGM 혈당(HealthLog)
+# 모든 사용자 비밀번호는 같은 해시를 공유 (bcrypt를 사용자 수만큼 돌리지 않도록)
+#
+# 사용법 (저장소 루트에서, 대상 DB는 DATABASE_URL):
+#   DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/seed.py --users 200 --days 30
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+
+from database import SessionLocal, init_db, get_kst_now, User, FoodLog, HealthLog
+from security import pwd_context
+import rollups
+
+BENCH_PASSWORD = "benchpass"
+USERNAME_PREFIX = "bench_user_"
+CHUNK_SIZE = 1000
+
+FOODS = [
+    ("현미밥, 된장찌개, 고등어구이", "낮음", 50, 30, 20),
+    ("흰쌀밥과 제육볶음", "높음", 60, 25, 15),
+    ("닭가슴살 샐러드", "낮음", 15, 55, 30),
+    ("짜장면", "매우 높음", 70, 15, 15),
+    ("김치볶음밥과 계란후라이", "높음", 62, 18, 20),
+    ("두부조림과 잡곡밥", "보통", 45, 35, 20),
+    ("순대국밥", "높음", 55, 25, 20),
+    ("연어 포케", "보통", 40, 35, 25),
+]
+PROFILES = [
+    {"gender": "남성", "age": 52, "height": 172, "weight": 78, "diabetes_type": "2형 당뇨",
+     "activity_level": "보통", "health_goal": "혈당 안정"},
+    {"gender": "여성", "age": 45, "height": 160, "weight": 62, "diabetes_type": "당뇨 전단계",
+     "activity_level": "적음", "health_goal": "체중 감량"},
+    {"gender": "남성", "age": 34, "height": 178, "weight": 70, "diabetes_type": "없음",
+     "activity_level": "많음", "health_goal": "근육 증가"},
+]
+
+
+def _insert_chunks(db, table, rows):
+    for i in range(0, len(rows), CHUNK_SIZE):
+        db.execute(insert(table), rows[i:i + CHUNK_SIZE])
+
+
+def seed(db, users: int, days: int, meals_per_day: int, cgm_interval: int, seed_value: int = 42):
+    """사용자 + 식단/혈당 기록 생성. 이미 있는 bench 사용자는 건너뜀. 반환값: 생성 건수"""
+    rng = random.Random(seed_value)
+    hashed = pwd_context.hash(BENCH_PASSWORD)
+
+    existing = {name for (name,) in db.query(User.username).filter(User.username.like(f"{USERNAME_PREFIX}%"))}
+    new_users = [dict(PROFILES[i % len(PROFILES)], username=f"{USERNAME_PREFIX}{i}", hashed_password=hashed)
+                 for i in range(users) if f"{USERNAME_PREFIX}{i}" not in existing]
+    _insert_chunks(db, User.__table__, new_users)
+    db.commit()
+
+    user_ids = [uid for (uid,) in db.query(User.id).filter(User.username.in_([u["username"] for u in new_users]))]
+    now = get_kst_now().replace(second=0, microsecond=0)
+    start = now - timedelta(days=days)
+    counts = {"users": len(user_ids), "meals": 0, "readings": 0}
+
+    for uid in user_ids:
+        meals, readings = [], []
+        for d in range(days):
+            day = start + timedelta(days=d)
+            for hour in (8, 12.5, 19)[:meals_per_day]:
+                desc, impact, carbs, protein, fat = rng.choice(FOODS)
+                meals.append({
+                    "owner_id": uid, "input_type": "text", "food_description": desc,
+                    "created_at": day + timedelta(hours=hour, minutes=rng.randint(0, 40)),
+                    "blood_sugar_impact": impact, "carbs_ratio": carbs, "protein_ratio": protein,
+                    "fat_ratio": fat, "summary": f"{desc} 분석 결과", "action_guide": "식후 15분 걷기",
+                    "detailed_action_guide": "식사 후 가볍게 걸으면 혈당 상승을 줄일 수 있습니다.",
+                    "alternatives": "채소 반찬 추가",
+                })
+        if cgm_interval:
+            minute = 0
+            while minute < days * 24 * 60:
+                readings.append({"owner_id": uid, "created_at": start + timedelta(minutes=minute),
+                                 "sugar_level": rng.randint(80, 180), "note": "CGM"})
+                minute += cgm_interval
+        _insert_chunks(db, FoodLog.__table__, meals)
+        _insert_chunks(db, HealthLog.__table__, readings)
+        db.commit()
+        counts["meals"] += len(meals)
+        counts["readings"] += len(readings)
+
+    # 일별 집계 테이블도 채워 둠 (실제 운영 DB와 같은 상태)
+    rollups.backfill(db)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--meals-per-day", type=int, default=3)
+    parser.add_argument("--cgm-interval", type=int, default=15, help="혈당 측정 간격(분), 0이면 혈당 기록 없음")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        counts = seed(db, args.users, args.days, args.meals_per_day, args.cgm_interval)
+        print(f"🌱 시드 완료: 사용자 {counts['users']}명, 식단 {counts['meals']}건, "
+              f"혈당 {counts['readings']}건 ({time.perf_counter() - started:.1f}s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
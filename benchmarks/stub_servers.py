@@ -0,0 +1,202 @@
+# benchmarks/stub_servers.py
+# 부하 테스트용 가짜 OpenAI(chat completions) / 카카오 로컬 검색 서버 (API 비용 없이 지연 시간만 흉내냄)
+#
+# 단독 실행:
+#   python benchmarks/stub_servers.py --port 8900 --openai-latency-ms 800 --kakao-latency-ms 80
+#   python benchmarks/stub_servers.py --small-failure-rate 0.3   # 작은 모델(model_router) 에스컬레이션 확인용
+# 앱 쪽 환경 변수:
+#   OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_BASE=http://127.0.0.1:8900/v1 OPENAI_API_KEY=stub
+#   KAKAO_API_BASE=http://127.0.0.1:8900 KAKAO_API_KEY=stub
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+ANALYSIS_RESULT = {
+    "food_name": "현미밥과 제육볶음",
+    "blood_sugar_impact": "보통",
+    "carbs_ratio": 50,
+    "protein_ratio": 30,
+    "fat_ratio": 20,
+    "summary": "단백질이 충분하지만 양념의 당류에 주의하세요.",
+    "action_guide": "식후 15분 걷기",
+    "detailed_action_guide": "식사 후 가볍게 15분 정도 걸으면 혈당 상승을 줄일 수 있습니다.",
+    "alternatives": "두부 제육, 쌈채소 추가",
+}
+CHAT_REPLY = ("점심에 탄수화물이 많았으니 저녁은 단백질 위주의 생선구이 정식을 추천해요. "
+              "밥은 반 공기만 드시고 채소 반찬을 충분히 곁들이세요.")
+
+
+class StubConfig:
+    openai_latency = 0.8      # 초
+    kakao_latency = 0.08
+    jitter = 0.2              # 지연 시간의 ±20%
+    stream_chunks = 20        # 스트리밍 응답을 나눌 조각 수
+    small_models = ("gpt-4o-mini",)  # 작은 등급 모델 (MODEL_TIER_SMALL)
+    small_latency_factor = 0.4       # 작은 모델은 지연 시간을 이 비율로
+    small_failure_rate = 0.0         # 작은 모델이 엉성하게 답하는 비율 (잘린 JSON / 빈 답변 / 애매한 판정)
+
+
+def _is_small(body):
+    return body.get("model") in StubConfig.small_models
+
+
+def _sloppy(message, body):
+    """작은 모델의 품질이 떨어지는 답을 흉내냄 → 앱이 큰 모델로 에스컬레이션하는지 확인"""
+    content = message.get("content")
+    if message.get("tool_calls") or content is None:
+        return message
+    if content.startswith("{"):
+        return dict(message, content=content[:len(content) // 3])
+    if content == "SAFE":
+        return dict(message, content="잘 모르겠습니다.")
+    return dict(message, content="")
+
+
+def _sleep(base):
+    time.sleep(max(0.0, base * (1 + random.uniform(-StubConfig.jitter, StubConfig.jitter))))
+
+
+def _usage(messages, completion_text):
+    prompt = sum(len(str(m.get("content", ""))) for m in messages) // 2
+    completion = len(completion_text) // 2
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+def _completion_message(body):
+    """요청 내용을 보고 앱이 기대하는 형태의 답을 고름 (분석 JSON / 일괄 분석 / 도구 호출 / 일반 답변)"""
+    messages = body.get("messages", [])
+    system = str(messages[0].get("content", "")) if messages else ""
+    if "[일괄 분석]" in system:
+        count = len([line for line in str(messages[-1].get("content", "")).splitlines() if line.strip()])
+        results = [dict(ANALYSIS_RESULT, index=i) for i in range(count)]
+        return {"role": "assistant", "content": json.dumps({"results": results}, ensure_ascii=False)}
+    if "JSON" in system and not body.get("tools"):
+        return {"role": "assistant", "content": json.dumps(ANALYSIS_RESULT, ensure_ascii=False)}
+    # 도구가 있고 아직 도구 결과가 없으면 식당 검색을 한 번 요청
+    if body.get("tools") and body.get("tool_choice") != "none" and messages[-1].get("role") == "user" \
+            and "역" in str(messages[-1].get("content", "")):
+        return {"role": "assistant", "content": None, "tool_calls": [{
+            "id": f"call_{random.randint(0, 1 << 30)}", "type": "function",
+            "function": {"name": "search_restaurants",
+                         "arguments": json.dumps({"location": "강남역", "menu_keyword": "생선구이"}, ensure_ascii=False)},
+        }]}
+    if "SAFE" in str(messages[-1].get("content", "")):
+        return {"role": "assistant", "content": "SAFE"}
+    return {"role": "assistant", "content": CHAT_REPLY}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/v2/local/search/keyword.json":
+            _sleep(StubConfig.kakao_latency)
+            query = parse_qs(url.query).get("query", [""])[0]
+            size = int(parse_qs(url.query).get("size", ["3"])[0])
+            docs = [{"place_name": f"{query} {i + 1}호점", "place_url": f"http://place.map.kakao.com/{i}",
+                     "category_name": "음식점 > 한식"} for i in range(size)]
+            return self._send_json(200, {"documents": docs, "meta": {"total_count": size}})
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            small = _is_small(body)
+            _sleep(StubConfig.openai_latency * (StubConfig.small_latency_factor if small else 1))
+            message = _completion_message(body)
+            if small and random.random() < StubConfig.small_failure_rate:
+                message = _sloppy(message, body)
+            if body.get("stream"):
+                return self._stream(body, message)
+            return self._send_json(200, {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "gpt-4o"),
+                "choices": [{"index": 0, "message": message,
+                             "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+                "usage": _usage(body.get("messages", []), message.get("content") or ""),
+            })
+        self._send_json(404, {"error": "not found"})
+
+    def _stream(self, body, message):
+        """stream=true 요청: SSE 조각으로 나눠 전송 (stream_options.include_usage면 마지막에 usage)"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta, finish=None, usage=None):
+            payload = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": body.get("model", "gpt-4o"),
+                       "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            if usage:
+                payload["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        if message.get("tool_calls"):
+            call = message["tool_calls"][0]
+            chunk({"role": "assistant", "tool_calls": [dict(call, index=0)]})
+            chunk({}, finish="tool_calls")
+        else:
+            text = message["content"]
+            step = max(1, len(text) // StubConfig.stream_chunks)
+            chunk({"role": "assistant", "content": ""})
+            for i in range(0, len(text), step) if text else ():
+                chunk({"content": text[i:i + step]})
+            chunk({}, finish="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunk(None, usage=_usage(body.get("messages", []), message.get("content") or ""))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_stub_server(port=0, openai_latency_ms=800, kakao_latency_ms=80, jitter=0.2, small_failure_rate=0.0):
+    """백그라운드 스레드로 서버 시작 → (server, 실제 포트)"""
+    StubConfig.openai_latency = openai_latency_ms / 1000
+    StubConfig.kakao_latency = kakao_latency_ms / 1000
+    StubConfig.jitter = jitter
+    StubConfig.small_failure_rate = small_failure_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--openai-latency-ms", type=int, default=800)
+    parser.add_argument("--kakao-latency-ms", type=int, default=80)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--small-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, port = start_stub_server(args.port, args.openai_latency_ms, args.kakao_latency_ms, args.jitter,
+                                     args.small_failure_rate)
+    print(f"🧪 스텁 서버 실행 중: http://127.0.0.1:{port} (OpenAI {args.openai_latency_ms}ms, 카카오 {args.kakao_latency_ms}ms)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
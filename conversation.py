@@ -0,0 +1,169 @@
+# conversation.py
+# 서버 쪽 대화 기록 (클라이언트는 새 메시지만 보냄)
+# - 최근 메시지는 그대로, 그보다 오래된 메시지는 누적 요약 하나로 압축 → 대화가 길어져도 프롬프트 크기가 일정
+import os
+import uuid
+import threading
+
+from database import Conversation, ConversationMessage, get_kst_now
+
+CHAT_RECENT_MESSAGES = int(os.getenv("CHAT_RECENT_MESSAGES", 6))              # 그대로 보내는 최근 메시지 수 (user+assistant)
+CHAT_SUMMARY_BATCH = int(os.getenv("CHAT_SUMMARY_BATCH", 4))                  # 이만큼 밀려나면 한 번에 요약 (요약 LLM 호출 횟수 절약)
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", 1500))  # 요약+최근 메시지 토큰 상한
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", 300))
+
+
+class ConversationNotFound(Exception):
+    pass
+
+
+_encoding = None
+_encoding_failed = False
+
+
+def count_tokens(text: str) -> int:
+    """
+    토큰 수 (tiktoken 인코딩을 쓸 수 없으면 추정치)
+    추정: 한글 1글자 ≈ 1토큰, 그 외 4글자 ≈ 1토큰
+    """
+    global _encoding, _encoding_failed
+    if not text:
+        return 0
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            _encoding_failed = True
+            print(f"⚠️ [Conversation] tiktoken 사용 불가, 토큰 수를 추정합니다: {e}")
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    hangul = sum(1 for ch in text if "가" <= ch <= "힣")
+    return hangul + (len(text) - hangul + 3) // 4
+
+
+def _message_tokens(message: dict) -> int:
+    return count_tokens(message["content"]) + 4  # 역할/구분자 몫
+
+
+class ConversationStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.summaries = 0
+        self.summary_failures = 0
+        self.prompt_tokens_total = 0
+        self.prompt_tokens_max = 0
+
+    def record_turn(self, prompt_tokens):
+        with self._lock:
+            self.turns += 1
+            if prompt_tokens:
+                self.prompt_tokens_total += prompt_tokens
+                self.prompt_tokens_max = max(self.prompt_tokens_max, prompt_tokens)
+
+    def record_summary(self, ok: bool):
+        with self._lock:
+            if ok:
+                self.summaries += 1
+            else:
+                self.summary_failures += 1
+
+    def stats(self):
+        return {
+            "turns": self.turns,
+            "summaries": self.summaries,
+            "summary_failures": self.summary_failures,
+            "avg_prompt_tokens": round(self.prompt_tokens_total / self.turns, 1) if self.turns else 0.0,
+            "max_prompt_tokens": self.prompt_tokens_max,
+        }
+
+
+conversation_stats = ConversationStats()
+
+
+def _fallback_summary(summary: str, messages: list) -> str:
+    """요약 LLM 호출이 실패했을 때: 이전 요약 + 밀려난 메시지 앞부분, 토큰 상한까지만"""
+    lines = [summary] if summary else []
+    lines += [f"- {m['role']}: {m['content'][:80]}" for m in messages]
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > CHAT_SUMMARY_MAX_TOKENS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def _fold_into_summary(summary: str, messages: list, summarizer) -> str:
+    try:
+        new_summary = summarizer(summary, messages)
+        conversation_stats.record_summary(True)
+        return new_summary
+    except Exception as e:
+        print(f"⚠️ [Conversation] 대화 요약 실패: {e}")
+        conversation_stats.record_summary(False)
+        return _fallback_summary(summary, messages)
+
+
+def start_turn(db, owner_id: int, conversation_id: str, message: str, summarizer=None):
+    """
+    새 사용자 메시지를 저장하고 LLM에 보낼 대화 맥락을 만듦
+    summarizer: (이전 요약, 밀려난 메시지 목록) -> 새 요약 (기본: ai_service.summarize_conversation)
+    반환값: {"conversation_id", "summary", "history": [{"role", "content"}, ...], "context_tokens"}
+    """
+    if summarizer is None:
+        from ai_service import summarize_conversation
+        summarizer = summarize_conversation
+
+    if conversation_id:
+        conv = db.query(Conversation).filter(Conversation.id == conversation_id,
+                                             Conversation.owner_id == owner_id).first()
+        if conv is None:
+            raise ConversationNotFound(conversation_id)
+    else:
+        conv = Conversation(id=uuid.uuid4().hex, owner_id=owner_id, summarized_until=0)
+        db.add(conv)
+
+    db.add(ConversationMessage(conversation_id=conv.id, role="user", content=message))
+    db.commit()  # 요약 LLM 호출 동안 쓰기 트랜잭션을 잡고 있지 않도록 먼저 저장
+
+    rows = db.query(ConversationMessage)\
+             .filter(ConversationMessage.conversation_id == conv.id,
+                     ConversationMessage.id > (conv.summarized_until or 0))\
+             .order_by(ConversationMessage.id.asc()).all()
+    pending = [{"id": r.id, "role": r.role, "content": r.content} for r in rows]
+
+    # 최근 메시지가 개수/토큰 상한을 넘으면 오래된 것부터 요약으로 옮김
+    # (개수 초과는 CHAT_SUMMARY_BATCH만큼 모였을 때 한 번에 처리)
+    summary_tokens = count_tokens(conv.summary)
+    fold = 0
+    if len(pending) >= CHAT_RECENT_MESSAGES + CHAT_SUMMARY_BATCH:
+        fold = len(pending) - CHAT_RECENT_MESSAGES
+    while fold < len(pending) - 1 and \
+            summary_tokens + sum(_message_tokens(m) for m in pending[fold:]) > CHAT_HISTORY_TOKEN_BUDGET:
+        fold += 1
+
+    if fold:
+        previous_summary = conv.summary
+        # 요약 LLM을 기다리는 동안 읽기 트랜잭션(커넥션)을 잡고 있지 않음 - conv는 다음 접근 때 다시 읽힘
+        db.rollback()
+        conv.summary = _fold_into_summary(previous_summary, pending[:fold], summarizer)
+        conv.summarized_until = pending[fold - 1]["id"]
+        pending = pending[fold:]
+    conv.updated_at = get_kst_now()
+    db.commit()
+
+    history = [{"role": m["role"], "content": m["content"]} for m in pending]
+    return {
+        "conversation_id": conv.id,
+        "summary": conv.summary,
+        "history": history,
+        "context_tokens": count_tokens(conv.summary) + sum(_message_tokens(m) for m in history),
+    }
+
+
+def finish_turn(db, conversation_id: str, reply: str, prompt_tokens: int = None):
+    """챗봇 답변 저장 + 턴별 입력 토큰 수 기록"""
+    db.add(ConversationMessage(conversation_id=conversation_id, role="assistant",
+                               content=reply, prompt_tokens=prompt_tokens))
+    db.query(Conversation).filter(Conversation.id == conversation_id)\
+      .update({Conversation.updated_at: get_kst_now()}, synchronize_session=False)
+    db.commit()
+    conversation_stats.record_turn(prompt_tokens)
@@ -0,0 +1,78 @@
+# dashboard.py
+# 기록 탭 첫 화면에 필요한 데이터(식단 기록, 혈당 기록, 프로필 요약, 차트용 혈당 시리즈)를 한 번에 모음
+# 사용자별 data_version(쓰기마다 증가)으로 ETag를 만들어, 바뀐 게 없으면 버전 한 번만 읽고 304 응답
+import os
+from datetime import timedelta
+
+from database import User, FoodLog, HealthLog, get_kst_now
+from pagination import keyset_page
+from glucose import get_series
+from user_context import PROFILE_FIELDS
+
+DASHBOARD_HISTORY_LIMIT = int(os.getenv("DASHBOARD_HISTORY_LIMIT", 10))
+DASHBOARD_SUGAR_LIMIT = int(os.getenv("DASHBOARD_SUGAR_LIMIT", 20))
+DASHBOARD_SERIES_DAYS = int(os.getenv("DASHBOARD_SERIES_DAYS", 7))
+
+dashboard_stats = {"full": 0, "not_modified": 0}  # 워커별 응답 수 (/api/stats)
+
+
+def serialize_food_log(log):
+    return {
+        "created_at": log.created_at.strftime("%m-%d %H:%M"),
+        "food_description": log.food_description,
+        "blood_sugar_impact": log.blood_sugar_impact,
+        "carbs_ratio": log.carbs_ratio,
+        "protein_ratio": log.protein_ratio,
+        "fat_ratio": log.fat_ratio,
+        "summary": log.summary,
+        "detailed_action_guide": log.detailed_action_guide,
+        "image_path": log.image_path,
+        "thumbnail_path": log.thumbnail_path
+    }
+
+
+def serialize_health_log(log):
+    return {
+        "created_at": log.created_at.strftime("%m-%d %H:%M"),
+        "sugar_level": log.sugar_level,
+        "note": log.note
+    }
+
+
+def get_data_version(db, owner_id: int) -> int:
+    """ETag 비교용 버전 (사용자 행의 컬럼 하나만 읽음)"""
+    return db.query(User.data_version).filter(User.id == owner_id).scalar() or 0
+
+
+def make_etag(owner_id: int, version: int, today=None) -> str:
+    # 혈당 차트 구간이 날짜 단위로 움직이므로 날짜도 포함 (자정이 지나면 데이터가 같아도 새 응답)
+    today = today or get_kst_now().date()
+    return f"dash-{owner_id}-{version}-{today:%Y%m%d}"
+
+
+def build_dashboard(db, owner_id: int, version: int):
+    """
+    대시보드 응답 (version은 조회 전에 읽은 값 - 조회 중 쓰기가 끼어들면 다음 요청에서 다시 받음)
+    - history: 첫 페이지 + next_cursor (이후 페이지는 /api/history?cursor=)
+    - sugar_series: 오늘 포함 최근 DASHBOARD_SERIES_DAYS일 (자정 기준으로 잘라 하루 동안 같은 구간)
+    """
+    logs, next_cursor = keyset_page(db.query(FoodLog).filter(FoodLog.owner_id == owner_id),
+                                    FoodLog, None, DASHBOARD_HISTORY_LIMIT)
+    sugar_logs, _ = keyset_page(db.query(HealthLog).filter(HealthLog.owner_id == owner_id),
+                                HealthLog, None, DASHBOARD_SUGAR_LIMIT)
+
+    today = get_kst_now().replace(hour=0, minute=0, second=0, microsecond=0)
+    series = get_series(db, owner_id, today - timedelta(days=DASHBOARD_SERIES_DAYS - 1), today + timedelta(days=1))
+
+    # 프로필은 워커별 user_context 캐시가 아니라 User 행에서 직접 읽음 (ETag 버전과 같은 DB 기준 - 다른 워커의 수정 즉시 반영)
+    row = db.query(*(getattr(User, field) for field in PROFILE_FIELDS)).filter(User.id == owner_id).one()
+    profile = row._asdict()
+    profile["complete"] = bool(profile.get("gender") and profile.get("age"))
+
+    return {
+        "version": version,
+        "profile": profile,
+        "history": {"items": [serialize_food_log(log) for log in logs], "next_cursor": next_cursor},
+        "sugar_logs": [serialize_health_log(log) for log in sugar_logs],
+        "sugar_series": series,
+    }
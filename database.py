@@ -1,8 +1,10 @@
 # database.py
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import create_engine, event, inspect, text, func, Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, scoped_session, relationship
 from datetime import datetime
+import threading
+import time
 import pytz
 
 KST = pytz.timezone('Asia/Seoul')
@@ -24,13 +26,95 @@ if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
 elif SQLALCHEMY_DATABASE_URL.startswith("postgresql://"):
     SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgresql://", "postgresql+psycopg2://", 1)
 
+# 커넥션 풀 설정 (환경 변수로 조정 가능)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))        # 풀이 가득 찼을 때 기다리는 최대 시간(초)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))      # 오래된 커넥션 재생성 (서버 측 idle timeout 대비)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
 # PostgreSQL의 경우 connect_args가 필요 없음
 if "postgresql" in SQLALCHEMY_DATABASE_URL:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING
+    )
 else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragma(dbapi_connection, connection_record):
+        # WAL: 읽기와 쓰기가 서로를 막지 않음 (여러 gunicorn 워커 + 백그라운드 스레드)
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 요청 범위 세션 (스레드별 1개, 요청이 끝나면 app.py의 teardown에서 remove)
+# 커넥션은 첫 쿼리 때 받고 commit/rollback 때 풀로 돌려줌 → LLM 호출 전에는 트랜잭션을 끝내서 커넥션을 잡고 있지 않음
+db_session = scoped_session(SessionLocal)
+
+
+class PoolStats:
+    """커넥션 풀에서 커넥션을 받기까지 기다린 시간 통계"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_checkout(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def stats(self):
+        pool = engine.pool
+        data = {
+            "pool_class": type(pool).__name__,
+            "checkouts": self.checkouts,
+            "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+        # QueuePool일 때만 현재 사용량을 알 수 있음
+        if hasattr(pool, "checkedout"):
+            data.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            })
+        return data
+
+
+pool_stats = PoolStats()
+
+
+# 세션 트랜잭션이 시작된 뒤(첫 쿼리) 커넥션을 받기까지의 시간 = 풀 대기 시간 (모든 SessionLocal 세션 공통)
+@event.listens_for(SessionLocal, "after_transaction_create")
+def _checkout_started(session, transaction):
+    if transaction.parent is None:
+        session.info["checkout_started"] = time.perf_counter()
+
+
+@event.listens_for(SessionLocal, "after_begin")
+def _checkout_finished(session, transaction, connection):
+    started = session.info.pop("checkout_started", None)
+    if started is not None:
+        pool_stats.record_checkout(time.perf_counter() - started)
+
 Base = declarative_base()
 
 class User(Base):
@@ -56,6 +140,9 @@ class User(Base):
 
     # [목표]
     health_goal = Column(String, nullable=True)     # 목표 (감량/안정/유지/근육)
+
+    # [대시보드 캐시] 식단/혈당/프로필이 바뀔 때마다 1씩 증가 → /api/dashboard ETag
+    data_version = Column(Integer, nullable=True, default=0)
     
     # 관계 설정
     logs = relationship("FoodLog", back_populates="owner")
@@ -76,9 +163,13 @@ class FoodLog(Base):
     fat_ratio = Column(Float)             # [NEW] 지방 비율
     alternatives = Column(Text)
     image_path = Column(String, nullable=True) # [NEW] 이미지 경로
+    thumbnail_path = Column(String, nullable=True) # 기록 목록용 썸네일
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="logs")
 
+    # 사용자별 최신순 조회 + 키셋 페이지네이션용 (owner_id = ? ORDER BY created_at DESC, id DESC)
+    __table_args__ = (Index("ix_food_logs_owner_created", "owner_id", "created_at", "id"),)
+
 class HealthLog(Base):
     __tablename__ = "health_logs"
     id = Column(Integer, primary_key=True, index=True)
@@ -88,5 +179,116 @@ class HealthLog(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="health_logs")
 
+    __table_args__ = (Index("ix_health_logs_owner_created", "owner_id", "created_at", "id"),
+                      # CGM 일괄 업로드 중복 방지 (같은 사용자, 같은 측정 시각은 한 건만)
+                      Index("uq_health_logs_owner_time", "owner_id", "created_at", unique=True))
+
+class DailyNutritionRollup(Base):
+    """사용자별 하루(KST) 식단/혈당 집계 - FoodLog/HealthLog 저장 시 함께 갱신"""
+    __tablename__ = "daily_nutrition_rollups"
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    day = Column(Date)
+    # 식단
+    meal_count = Column(Integer, default=0)
+    ratio_count = Column(Integer, default=0)   # 단탄지 비율이 모두 있는 식사 수 (평균 계산용)
+    carbs_sum = Column(Float, default=0)
+    protein_sum = Column(Float, default=0)
+    fat_sum = Column(Float, default=0)
+    # 혈당 영향 분포
+    impact_low = Column(Integer, default=0)
+    impact_normal = Column(Integer, default=0)
+    impact_high = Column(Integer, default=0)
+    impact_very_high = Column(Integer, default=0)
+    impact_unknown = Column(Integer, default=0)
+    # 혈당 측정
+    glucose_count = Column(Integer, default=0)
+    glucose_sum = Column(Float, default=0)
+    glucose_min = Column(Integer, nullable=True)
+    glucose_max = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, default=get_kst_now)
+
+    __table_args__ = (UniqueConstraint("owner_id", "day", name="uq_rollup_owner_day"),)
+
+class AnalysisCacheEntry(Base):
+    """식단 분석 결과 캐시 (모든 워커가 공유하는 DB 계층)"""
+    __tablename__ = "analysis_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, index=True)  # sha256(텍스트 + 이미지 해시 + 프로필)
+    result_json = Column(Text)
+    created_at = Column(DateTime, default=get_kst_now)
+    last_used_at = Column(DateTime, default=get_kst_now, index=True)  # LRU 제거 기준
+    expires_at = Column(DateTime)
+    hit_count = Column(Integer, default=0)
+
+class AnalysisJob(Base):
+    """비동기 식단 분석 작업 (제출 후 폴링으로 결과 조회)"""
+    __tablename__ = "analysis_jobs"
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    created_at = Column(DateTime, default=get_kst_now)
+    finished_at = Column(DateTime, nullable=True)
+    status = Column(String, default="queued")  # queued / running / done / error
+    result_json = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+
+class Conversation(Base):
+    """챗봇 대화 (오래된 메시지는 요약으로 압축하고 최근 메시지만 그대로 보냄)"""
+    __tablename__ = "conversations"
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    created_at = Column(DateTime, default=get_kst_now)
+    updated_at = Column(DateTime, default=get_kst_now)
+    summary = Column(Text, nullable=True)                 # 요약에 반영된 이전 대화
+    summarized_until = Column(Integer, default=0)         # 요약에 반영된 마지막 메시지 id
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+
+class ConversationMessage(Base):
+    __tablename__ = "conversation_messages"
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=get_kst_now)
+    role = Column(String(20))                             # user / assistant
+    content = Column(Text)
+    prompt_tokens = Column(Integer, nullable=True)        # assistant 메시지: 이번 턴에 LLM에 보낸 입력 토큰 수
+    conversation_id = Column(String(32), ForeignKey("conversations.id"))
+
+    __table_args__ = (Index("ix_conversation_messages_conv_id", "conversation_id", "id"),)
+
+def bump_data_version(db, owner_id: int):
+    """사용자 데이터(식단/혈당/프로필)가 바뀌었음을 기록 - 쓰기와 같은 트랜잭션에서 commit 전에 호출"""
+    db.query(User).filter(User.id == owner_id)\
+      .update({User.data_version: func.coalesce(User.data_version, 0) + 1}, synchronize_session=False)
+
+def migrate_db():
+    """
+    기존 DB에 새로 추가된 컬럼/인덱스를 반영
+    (create_all은 이미 존재하는 테이블에는 컬럼이나 인덱스를 추가하지 않음)
+    - 새 컬럼은 nullable로만 추가해야 함
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            print(f"[migrate] {table.name}.{column.name} 컬럼 추가")
+
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            try:
+                index.create(bind=engine, checkfirst=True)
+                print(f"[migrate] {index.name} 인덱스 생성")
+            except Exception as e:
+                # 여러 워커가 동시에 시작하면 다른 워커가 먼저 만들었을 수 있음
+                print(f"[migrate] {index.name} 인덱스 생성 건너뜀: {e}")
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    migrate_db()
\ No newline at end of file
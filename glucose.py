@@ -0,0 +1,207 @@
+# glucose.py
+# 연속혈당측정기(CGM) 데이터 일괄 저장 + 차트용 구간 집계(min/max/avg)
+import os
+import io
+import csv
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, cast, BigInteger
+from sqlalchemy.exc import IntegrityError
+
+from database import HealthLog, KST, get_kst_now, bump_data_version
+from rollups import record_glucose
+
+GLUCOSE_MAX_READINGS = int(os.getenv("GLUCOSE_MAX_READINGS", 5000))   # 요청 하나에 받을 최대 측정값 수
+GLUCOSE_MIN_LEVEL = 20    # mg/dL - 측정기 범위를 벗어난 값은 거부
+GLUCOSE_MAX_LEVEL = 600
+GLUCOSE_INSERT_CHUNK = 1000
+MAX_REPORTED_ERRORS = 50
+
+# 차트 한 장에 그릴 점 수를 넘지 않도록 고르는 구간 길이(초)
+BUCKET_SIZES = (60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400)
+SERIES_MAX_POINTS = 300
+
+
+class TooManyReadings(Exception):
+    pass
+
+
+class InvalidPayload(Exception):
+    pass
+
+
+def parse_timestamp(value) -> datetime:
+    """ISO8601 문자열 또는 epoch 초 → KST naive datetime (시간대가 없으면 KST로 간주)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, KST).replace(tzinfo=None)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("timestamp가 없습니다")
+    text = value.strip()
+    if text.replace(".", "", 1).isdigit():
+        return datetime.fromtimestamp(float(text), KST).replace(tzinfo=None)
+    parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(KST).replace(tzinfo=None)
+    return parsed
+
+
+def reading_time(value: datetime) -> datetime:
+    """측정 시각 저장 정밀도(초) - 단건/일괄 저장이 같은 값을 써야 같은 시각 중복 판정이 맞음"""
+    return value.replace(microsecond=0)
+
+
+def _validate(record: dict, now: datetime):
+    """측정값 한 건 검증 → (created_at, sugar_level, note)"""
+    if not isinstance(record, dict):
+        raise ValueError("객체 형식이 아닙니다")
+    created_at = parse_timestamp(record.get("timestamp", record.get("created_at")))
+    if created_at > now + timedelta(minutes=5):
+        raise ValueError("미래 시각입니다")
+    try:
+        level = float(record.get("sugar_level"))
+    except (TypeError, ValueError):
+        raise ValueError("sugar_level이 숫자가 아닙니다")
+    if not GLUCOSE_MIN_LEVEL <= level <= GLUCOSE_MAX_LEVEL:
+        raise ValueError(f"sugar_level 범위({GLUCOSE_MIN_LEVEL}~{GLUCOSE_MAX_LEVEL}) 밖입니다")
+    note = record.get("note") or None
+    return reading_time(created_at), int(round(level)), note
+
+
+def iter_records(stream, content_type: str):
+    """
+    요청 본문 → 측정값 dict를 하나씩 (스트림을 한 줄씩 읽으므로 큰 CSV/NDJSON도 메모리에 다 올리지 않음)
+    - application/json:        [{...}, ...] 또는 {"readings": [...]}
+    - application/x-ndjson:    한 줄에 JSON 객체 하나
+    - text/csv:                헤더 timestamp,sugar_level[,note]
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/ndjson"):
+        try:
+            for line in io.TextIOWrapper(stream, encoding="utf-8"):
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield None
+        except UnicodeDecodeError:
+            raise InvalidPayload("UTF-8로 인코딩된 본문이 필요합니다.")
+    elif content_type == "text/csv":
+        try:
+            reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig"))
+            if not reader.fieldnames or "sugar_level" not in reader.fieldnames:
+                raise InvalidPayload("CSV 헤더에 timestamp, sugar_level이 필요합니다.")
+            yield from reader
+        except UnicodeDecodeError:
+            raise InvalidPayload("CSV는 UTF-8로 인코딩되어야 합니다.")
+        except csv.Error as e:
+            raise InvalidPayload(f"CSV 형식이 올바르지 않습니다: {e}")
+    elif content_type == "application/json":
+        try:
+            data = json.load(stream)
+        except ValueError:
+            raise InvalidPayload("JSON 형식이 올바르지 않습니다.")
+        if isinstance(data, dict):
+            data = data.get("readings")
+        if not isinstance(data, list):
+            raise InvalidPayload("readings 배열이 필요합니다.")
+        yield from data
+    else:
+        raise InvalidPayload("지원하는 형식: application/json, application/x-ndjson, text/csv")
+
+
+def _existing_timestamps(db, owner_id: int, timestamps: list) -> set:
+    rows = db.query(HealthLog.created_at).filter(HealthLog.owner_id == owner_id,
+                                                 HealthLog.created_at >= min(timestamps),
+                                                 HealthLog.created_at <= max(timestamps))
+    return {row.created_at for row in rows}
+
+
+def ingest_readings(db, owner_id: int, records):
+    """
+    검증 → (owner_id, 시각) 기준 중복 제거 → executemany로 한 트랜잭션에 저장 → 일별 집계 갱신
+    반환값: {"received", "inserted", "duplicates", "invalid", "errors": [{"index", "error"}]}
+    """
+    now = get_kst_now()
+    readings = {}  # created_at -> (sugar_level, note) - 요청 안의 중복은 처음 값 사용
+    received = duplicates = invalid = 0
+    errors = []
+    for index, record in enumerate(records):
+        received += 1
+        if received > GLUCOSE_MAX_READINGS:
+            raise TooManyReadings(f"한 번에 최대 {GLUCOSE_MAX_READINGS}건까지 저장할 수 있습니다.")
+        try:
+            created_at, level, note = _validate(record, now)
+        except ValueError as e:
+            invalid += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"index": index, "error": str(e)})
+            continue
+        if created_at in readings:
+            duplicates += 1
+            continue
+        readings[created_at] = (level, note)
+
+    inserted = 0
+    if readings:
+        # 다른 요청이 같은 시각을 먼저 저장하면 유니크 인덱스에 걸림 → 다시 걸러서 한 번 더 시도
+        for attempt in range(2):
+            existing = _existing_timestamps(db, owner_id, list(readings))
+            rows = [{"created_at": ts, "sugar_level": level, "note": note, "owner_id": owner_id}
+                    for ts, (level, note) in sorted(readings.items()) if ts not in existing]
+            try:
+                for start in range(0, len(rows), GLUCOSE_INSERT_CHUNK):
+                    db.execute(insert(HealthLog), rows[start:start + GLUCOSE_INSERT_CHUNK])
+                record_glucose(db, owner_id, [(r["created_at"], r["sugar_level"]) for r in rows])
+                if rows:
+                    bump_data_version(db, owner_id)
+                db.commit()
+                break
+            except IntegrityError:
+                db.rollback()
+                if attempt:
+                    raise
+        duplicates += len(readings) - len(rows)
+        inserted = len(rows)
+
+    return {"received": received, "inserted": inserted, "duplicates": duplicates,
+            "invalid": invalid, "errors": errors}
+
+
+def choose_bucket(start: datetime, end: datetime, max_points: int = SERIES_MAX_POINTS) -> int:
+    span = max((end - start).total_seconds(), 1)
+    for size in BUCKET_SIZES:
+        if span / size <= max_points:
+            return size
+    return BUCKET_SIZES[-1]
+
+
+def _epoch_seconds(db, column):
+    # DB마다 epoch 변환 함수가 다름 (저장값은 KST naive라 그대로 초로 바꿔 구간을 나눔)
+    if db.get_bind().dialect.name == "sqlite":
+        return cast(func.strftime("%s", column), BigInteger)
+    return cast(func.extract("epoch", column), BigInteger)
+
+
+def get_series(db, owner_id: int, start: datetime, end: datetime, bucket: int = None):
+    """기간 내 측정값을 bucket초 단위로 묶은 min/max/avg (DB에서 집계해 원본 점은 가져오지 않음)"""
+    bucket = bucket or choose_bucket(start, end)
+    epoch = _epoch_seconds(db, HealthLog.created_at)
+    bucket_start = (epoch // bucket) * bucket  # 정수 나눗셈 → 구간 시작 epoch
+    rows = db.query(bucket_start.label("bucket"),
+                    func.min(HealthLog.sugar_level).label("min"),
+                    func.max(HealthLog.sugar_level).label("max"),
+                    func.avg(HealthLog.sugar_level).label("avg"),
+                    func.count(HealthLog.id).label("count"))\
+             .filter(HealthLog.owner_id == owner_id,
+                     HealthLog.created_at >= start, HealthLog.created_at < end,
+                     HealthLog.sugar_level.isnot(None))\
+             .group_by(bucket_start).order_by(bucket_start).all()
+
+    points = []
+    for row in rows:
+        # epoch는 naive 시각을 UTC로 본 값이므로 되돌릴 때도 UTC 기준으로 계산
+        t = datetime(1970, 1, 1) + timedelta(seconds=int(row.bucket))
+        points.append({"t": t.isoformat(), "label": t.strftime("%m-%d %H:%M"),
+                       "min": row.min, "max": row.max, "avg": round(float(row.avg), 1), "count": row.count})
+    return {"start": start.isoformat(), "end": end.isoformat(), "bucket_seconds": bucket, "points": points}
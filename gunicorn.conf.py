@@ -0,0 +1,15 @@
+# gunicorn.conf.py
+# app을 마스터에서 한 번만 import(preload) → 스키마/데모 계정 작업은 한 번만,
+# 워커는 fork 후 post_fork에서 워커별 초기화만 수행
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+preload_app = True
+
+
+def post_fork(server, worker):
+    from app import init_worker
+    init_worker()
@@ -0,0 +1,97 @@
+# image_pipeline.py
+# 업로드 이미지를 OpenAI로 보내기 전에 줄이고 다시 인코딩 (요청 크기/비전 토큰 절약)
+import io
+import os
+import threading
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", 1024))        # 긴 변 최대 픽셀
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()       # JPEG 또는 WEBP
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 82))
+THUMBNAIL_EDGE = int(os.getenv("THUMBNAIL_EDGE", 256))
+
+# OpenAI 비전 입력으로 그대로 보낼 수 있는 형식
+SUPPORTED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+
+_lock = threading.Lock()
+pipeline_stats = {"processed": 0, "failed": 0, "original_bytes": 0, "output_bytes": 0}
+
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    if fmt == "WEBP":
+        img.save(buf, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def _read_original(fp) -> bytes:
+    fp.seek(0)
+    return fp.read()
+
+
+def preprocess_image(source) -> dict:
+    """
+    EXIF 회전 보정 → 긴 변을 IMAGE_MAX_EDGE 이하로 축소 → JPEG/WebP로 재인코딩
+    source: 이미지 bytes 또는 seek 가능한 파일 객체 (업로드 스트림 - 원본 전체를 메모리에 올리지 않고 바로 디코딩)
+    반환값: {"bytes", "mime", "original_bytes", "saved_bytes", "thumbnail"}
+    디코딩에 실패하면 원본을 그대로 돌려줌 (분석은 계속 진행)
+    """
+    fp = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    fp.seek(0, io.SEEK_END)
+    original_size = fp.tell()
+    fp.seek(0)
+    try:
+        img = Image.open(fp)
+        source_format = img.format
+        full_size = img.size
+        if source_format == "JPEG":
+            # JPEG는 디코딩 단계에서 1/2~1/8로 줄여 읽음 → 원본 해상도 픽셀 버퍼를 만들지 않음
+            img.draft("RGB", (IMAGE_MAX_EDGE, IMAGE_MAX_EDGE))
+        img.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        print(f"⚠️ [Image] 이미지 디코딩 실패, 원본 전송: {e}")
+        with _lock:
+            pipeline_stats["failed"] += 1
+        return {"bytes": _read_original(fp), "mime": "image/jpeg", "original_bytes": original_size,
+                "saved_bytes": 0, "thumbnail": None}
+
+    # 휴대폰 사진은 EXIF Orientation 태그로만 회전 정보를 갖고 있는 경우가 많음
+    orientation = img.getexif().get(0x0112, 1)
+    changed = img.size != full_size or orientation != 1  # draft로 줄여 읽었어도 원본은 못 씀
+    if orientation != 1:
+        img = ImageOps.exif_transpose(img)
+    if max(img.size) > IMAGE_MAX_EDGE:
+        img.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.LANCZOS)
+        changed = True
+
+    output = _encode(img, IMAGE_FORMAT, IMAGE_QUALITY)
+    mime = "image/webp" if IMAGE_FORMAT == "WEBP" else "image/jpeg"
+    # 이미 작은 사진이면 재인코딩이 오히려 커질 수 있음 → 원본 유지 (출력보다 작을 때만 원본을 읽음)
+    if not changed and source_format in SUPPORTED_FORMATS and len(output) >= original_size:
+        output = _read_original(fp)
+        mime = Image.MIME[source_format]
+
+    thumb = img.copy()
+    thumb.thumbnail((THUMBNAIL_EDGE, THUMBNAIL_EDGE), Image.LANCZOS)
+    thumbnail = _encode(thumb, "JPEG", 75)
+
+    saved = original_size - len(output)
+    with _lock:
+        pipeline_stats["processed"] += 1
+        pipeline_stats["original_bytes"] += original_size
+        pipeline_stats["output_bytes"] += len(output)
+    print(f"🖼️ [Image] {original_size:,}B → {len(output):,}B ({mime}, {saved:,}B 절약)")
+    return {"bytes": output, "mime": mime, "original_bytes": original_size,
+            "saved_bytes": saved, "thumbnail": thumbnail}
+
+
+def get_pipeline_stats():
+    with _lock:
+        stats = dict(pipeline_stats)
+    stats["saved_bytes"] = stats["original_bytes"] - stats["output_bytes"]
+    return stats
@@ -0,0 +1,272 @@
+# job_queue.py
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+from datetime import timedelta
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from database import SessionLocal, AnalysisJob, get_kst_now
+
+# 워커 풀 설정 (환경 변수로 조정 가능)
+JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", 4))          # 동시에 실행할 분석 작업 수
+JOB_MAX_PENDING = int(os.getenv("ANALYSIS_JOB_MAX_PENDING", 16))  # 대기+실행 중 작업 상한 (백프레셔)
+JOB_TTL = int(os.getenv("ANALYSIS_JOB_TTL", 86400))                 # 작업 행 보관 시간(초) - 지나면 삭제
+JOB_STALE_AFTER = int(os.getenv("ANALYSIS_JOB_STALE_AFTER", 900))   # 이 시간(초)이 지나도 queued/running이면 중단된 작업으로 봄
+JOB_SWEEP_INTERVAL = int(os.getenv("ANALYSIS_JOB_SWEEP_INTERVAL", 600))  # 작업 제출 시 정리를 돌리는 최소 간격(초)
+
+
+class JobQueueFull(Exception):
+    """대기 중인 작업이 너무 많아 새 작업을 받을 수 없음"""
+    pass
+
+
+def sweep_jobs(session_factory=SessionLocal, ttl: int = JOB_TTL, stale_after: int = JOB_STALE_AFTER) -> dict:
+    """
+    analysis_jobs 정리
+    - 재시작/크래시로 끝나지 못한 queued/running 작업(stale_after보다 오래됨)은 error로 표시 → 폴링이 영원히 queued를 보지 않음
+    - 만든 지 ttl이 지난 작업은 삭제
+    (다른 워커가 실행 중인 작업은 stale_after 안쪽이라 건드리지 않음)
+    """
+    now = get_kst_now()
+    db = session_factory()
+    try:
+        failed = db.query(AnalysisJob)\
+                   .filter(AnalysisJob.status.in_(("queued", "running")),
+                           AnalysisJob.created_at < now - timedelta(seconds=stale_after))\
+                   .update({AnalysisJob.status: "error", AnalysisJob.error: "작업이 중단되었습니다. 다시 요청해 주세요.",
+                            AnalysisJob.finished_at: now}, synchronize_session=False)
+        expired = db.query(AnalysisJob)\
+                    .filter(AnalysisJob.created_at < now - timedelta(seconds=ttl))\
+                    .delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    return {"failed": failed, "expired": expired}
+
+
+class JobReservation:
+    """reserve()로 잡아 둔 대기열 자리 - submit/asubmit으로 작업 하나를 넣음"""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.used = False
+
+    def submit(self, owner_id: int, payload: dict) -> str:
+        self.used = True  # 이후 실패(_create 예외 등)는 큐 쪽에서 자리를 돌려줌
+        return self.queue._submit_reserved(owner_id, payload)
+
+    async def asubmit(self, owner_id: int, payload: dict) -> str:
+        self.used = True
+        return await self.queue._asubmit_reserved(owner_id, payload)
+
+
+class AnalysisJobQueue:
+    """
+    식단 분석 작업 큐
+    - 업로드 요청은 job_id만 받고 바로 반환 (gunicorn 워커를 붙잡지 않음)
+    - 실제 분석은 워커별 스레드 풀에서 실행
+    - 작업 상태/결과는 analysis_jobs 테이블에 저장 → 어느 워커로 폴링해도 조회 가능
+    runner: payload(dict)를 받아 (결과 dict)를 반환하는 함수. 테스트에서는 가짜 함수를 넣으면 됨
+    arunner: runner의 코루틴 버전 (asgi_app.py) - asubmit으로 넣은 작업은 스레드 대신 이벤트 루프 태스크로 실행
+    """
+
+    def __init__(self, runner, max_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING,
+                 session_factory=SessionLocal, arunner=None):
+        self.runner = runner
+        self.arunner = arunner
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.session_factory = session_factory
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._lock = threading.Lock()
+        self._tasks = set()  # 실행 중인 비동기 작업 (참조를 들고 있어야 GC되지 않음)
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+        self._last_sweep = time.monotonic()  # 시작 시 정리는 bootstrap에서 한 번
+
+    def _reserve(self):
+        with self._lock:
+            if self.queued + self.running >= self.max_pending:
+                self.rejected += 1
+                raise JobQueueFull(f"대기 중인 분석 작업이 너무 많습니다. ({self.max_pending}개)")
+            self.queued += 1
+
+    def _create(self, owner_id: int) -> str:
+        job_id = uuid.uuid4().hex
+        db = self.session_factory()
+        try:
+            db.add(AnalysisJob(id=job_id, owner_id=owner_id, status="queued"))
+            db.commit()
+        except Exception:
+            self._release()
+            raise
+        finally:
+            db.close()
+        return job_id
+
+    def _release(self):
+        with self._lock:
+            self.queued -= 1
+
+    @contextmanager
+    def reserve(self):
+        """
+        작업 자리를 먼저 잡음 - 대기열이 가득 차면 업로드 저장/이미지 변환 같은 비싼 준비 작업 전에 JobQueueFull
+        with analysis_jobs.reserve() as slot:
+            payload = ...  # 업로드 저장 등
+            job_id = slot.submit(owner_id, payload)
+        블록 안에서 submit하지 않고 끝나면(예외 포함) 자리를 돌려줌
+        """
+        self._reserve()
+        slot = JobReservation(self)
+        try:
+            yield slot
+        finally:
+            if not slot.used:
+                self._release()
+
+    def submit(self, owner_id: int, payload: dict) -> str:
+        with self.reserve() as slot:
+            return slot.submit(owner_id, payload)
+
+    async def asubmit(self, owner_id: int, payload: dict) -> str:
+        """submit의 비동기 버전 - 작업은 이벤트 루프에서 arunner로 실행 (상태 저장/조회 방식은 동일)"""
+        with self.reserve() as slot:
+            return await slot.asubmit(owner_id, payload)
+
+    def _maybe_sweep(self):
+        """JOB_SWEEP_INTERVAL마다 한 번, 오래된 작업 정리를 풀에 넣음 (제출 요청은 기다리지 않음)"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < JOB_SWEEP_INTERVAL:
+                return
+            self._last_sweep = now
+        self._executor.submit(self._sweep)
+
+    def _sweep(self):
+        try:
+            result = sweep_jobs(self.session_factory)
+            if result["failed"] or result["expired"]:
+                print(f"🧹 [JobQueue] 중단된 작업 {result['failed']}건 실패 처리, 만료 {result['expired']}건 삭제")
+        except Exception as e:
+            print(f"⚠️ [JobQueue] 작업 정리 실패: {e}")
+
+    def _submit_reserved(self, owner_id: int, payload: dict) -> str:
+        self._maybe_sweep()
+        job_id = self._create(owner_id)
+        self._executor.submit(self._run, job_id, payload, time.monotonic())
+        return job_id
+
+    async def _asubmit_reserved(self, owner_id: int, payload: dict) -> str:
+        from anyio import to_thread
+
+        self._maybe_sweep()
+        job_id = await to_thread.run_sync(self._create, owner_id)
+        task = asyncio.create_task(self._arun(job_id, payload, time.monotonic()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    def _started(self, submitted_at: float) -> float:
+        started_at = time.monotonic()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.total_wait += started_at - submitted_at
+        return started_at
+
+    def _finished(self, started_at: float, ok: bool):
+        with self._lock:
+            self.running -= 1
+            self.total_run += time.monotonic() - started_at
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def _run(self, job_id: str, payload: dict, submitted_at: float):
+        started_at = self._started(submitted_at)
+        ok = False
+        try:
+            self._update(job_id, status="running")
+            try:
+                result = self.runner(payload)
+                fields = {"status": "done", "result_json": json.dumps(result, ensure_ascii=False)}
+                ok = True
+            except Exception as e:
+                print(f"❌ [JobQueue] 분석 작업 실패 {job_id}: {e}")
+                fields = {"status": "error", "error": str(e)}
+            self._update(job_id, finished_at=get_kst_now(), **fields)
+        except Exception as e:
+            # 상태 저장 실패(DB 혼잡 등) - 스레드 풀은 예외를 삼키므로 여기서 남김
+            print(f"❌ [JobQueue] 작업 상태 저장 실패 {job_id}: {e}")
+        finally:
+            # 상태 저장이 실패해도 running을 돌려줘야 대기열이 막히지 않음
+            self._finished(started_at, ok)
+
+    async def _arun(self, job_id: str, payload: dict, submitted_at: float):
+        from anyio import to_thread
+
+        started_at = self._started(submitted_at)
+        ok = False
+        try:
+            await to_thread.run_sync(lambda: self._update(job_id, status="running"))
+            try:
+                result = await self.arunner(payload)
+                fields = {"status": "done", "result_json": json.dumps(result, ensure_ascii=False)}
+                ok = True
+            except Exception as e:
+                print(f"❌ [JobQueue] 분석 작업 실패 {job_id}: {e}")
+                fields = {"status": "error", "error": str(e)}
+            await to_thread.run_sync(lambda: self._update(job_id, finished_at=get_kst_now(), **fields))
+        finally:
+            self._finished(started_at, ok)
+
+    def _update(self, job_id: str, **fields):
+        db = self.session_factory()
+        try:
+            db.query(AnalysisJob).filter(AnalysisJob.id == job_id).update(fields)
+            db.commit()
+        finally:
+            db.close()
+
+    def get(self, job_id: str, owner_id: int):
+        """작업 상태 조회 (다른 사용자의 작업은 None)"""
+        db = self.session_factory()
+        try:
+            job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id,
+                                               AnalysisJob.owner_id == owner_id).first()
+            if job is None:
+                return None
+            data = {"job_id": job.id, "status": job.status}
+            if job.status == "done":
+                data["result"] = json.loads(job.result_json)
+            elif job.status == "error":
+                data["error"] = job.error
+            return data
+        finally:
+            db.close()
+
+    def stats(self):
+        finished = self.completed + self.failed
+        started = finished + self.running
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "queue_depth": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(self.total_wait / started, 3) if started else 0.0,
+            "avg_run_seconds": round(self.total_run / finished, 3) if finished else 0.0,
+        }
@@ -0,0 +1,179 @@
+# kakao_client.py
+import os
+import time
+import asyncio
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+from cache import TTLCache, MISSING
+from metrics import kakao_latency, kakao_requests, kakao_retries
+
+load_dotenv()
+
+# 로컬 스텁 서버로 테스트할 수 있도록 주소를 환경 변수로 바꿀 수 있음
+KAKAO_API_BASE = os.getenv("KAKAO_API_BASE", "https://dapi.kakao.com")
+KAKAO_CONNECT_TIMEOUT = float(os.getenv("KAKAO_CONNECT_TIMEOUT", 3))
+KAKAO_READ_TIMEOUT = float(os.getenv("KAKAO_READ_TIMEOUT", 5))
+KAKAO_RETRIES = int(os.getenv("KAKAO_RETRIES", 2))
+KAKAO_POOL_SIZE = int(os.getenv("KAKAO_POOL_SIZE", 16))
+KAKAO_BACKOFF = 0.3
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+SEARCH_CACHE_TTL = int(os.getenv("KAKAO_CACHE_TTL", 3600))              # 검색 결과 캐시 1시간
+SEARCH_NOT_FOUND_TTL = int(os.getenv("KAKAO_NOT_FOUND_TTL", 600))       # 결과 없음(NOT_FOUND)은 10분
+SEARCH_CACHE_SIZE = int(os.getenv("KAKAO_CACHE_SIZE", 2048))
+
+
+class KakaoAPIError(Exception):
+    def __init__(self, status_code, message=""):
+        super().__init__(message or f"API 호출 에러: {status_code}")
+        self.status_code = status_code
+
+
+class KakaoLocalClient:
+    """
+    카카오 로컬 검색 API 클라이언트
+    - keep-alive 커넥션 풀 + 타임아웃 + 재시도
+    - (지역, 키워드) 결과 캐시, 결과 없음도 짧게 캐시 (negative caching)
+    """
+
+    def __init__(self, api_key=None, base_url=KAKAO_API_BASE, cache_ttl=SEARCH_CACHE_TTL,
+                 not_found_ttl=SEARCH_NOT_FOUND_TTL, cache_size=SEARCH_CACHE_SIZE):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (KAKAO_CONNECT_TIMEOUT, KAKAO_READ_TIMEOUT)
+        self.not_found_ttl = not_found_ttl
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+        retry = Retry(total=KAKAO_RETRIES, backoff_factor=KAKAO_BACKOFF,
+                      status_forcelist=RETRY_STATUSES, allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=KAKAO_POOL_SIZE, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._async_client = None
+
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.upstream_seconds = 0.0
+        self.upstream_max_seconds = 0.0
+
+    @staticmethod
+    def _cache_key(location: str, keyword: str):
+        return (" ".join((location or "").split()).lower(), " ".join((keyword or "").split()).lower())
+
+    def _cached(self, key):
+        cached = self.cache.get(key)
+        if cached is not MISSING:
+            kakao_requests.inc(outcome="cache_hit")
+        return cached
+
+    def _request_args(self, location: str, keyword: str, size: int):
+        return {
+            "url": f"{self.base_url}/v2/local/search/keyword.json",
+            "headers": {"Authorization": f"KakaoAK {self.api_key}"},
+            "params": {"query": f"{location} {keyword}".strip(), "size": size},
+        }
+
+    def _handle_response(self, key, status_code: int, body_fn, seconds: float, retries: int = 0):
+        """응답 상태/지연 시간/재시도 기록 후 documents 반환 (동기/비동기 공통)"""
+        self._record(seconds, error=status_code != 200)
+        kakao_latency.observe(seconds, status=status_code)
+        if retries:
+            kakao_retries.inc(retries)
+
+        if status_code != 200:
+            kakao_requests.inc(outcome="error")
+            raise KakaoAPIError(status_code)
+
+        docs = body_fn().get("documents", [])
+        kakao_requests.inc(outcome="ok" if docs else "not_found")
+        self.cache.set(key, docs, ttl=None if docs else self.not_found_ttl)
+        return docs
+
+    def _handle_error(self, e: Exception, seconds: float):
+        self._record(seconds, error=True)
+        kakao_latency.observe(seconds, status=type(e).__name__)
+        kakao_requests.inc(outcome="error")
+
+    def search_keyword(self, location: str, keyword: str, size: int = 3) -> list:
+        """검색 결과(documents) 리스트를 반환. 결과가 없으면 빈 리스트"""
+        key = self._cache_key(location, keyword) + (size,)
+        cached = self._cached(key)
+        if cached is not MISSING:
+            return cached
+
+        args = self._request_args(location, keyword, size)
+        started = time.perf_counter()
+        try:
+            response = self.session.get(args["url"], headers=args["headers"], params=args["params"],
+                                        timeout=self.timeout)
+        except requests.RequestException as e:
+            self._handle_error(e, time.perf_counter() - started)
+            raise
+        retries = getattr(getattr(response.raw, "retries", None), "history", None)
+        return self._handle_response(key, response.status_code, response.json,
+                                     time.perf_counter() - started, len(retries or ()))
+
+    def _get_async_client(self):
+        # httpx.AsyncClient는 처음 사용한 이벤트 루프에 묶이므로 ASGI 프로세스에서 처음 쓸 때 만듦
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(KAKAO_READ_TIMEOUT, connect=KAKAO_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=KAKAO_POOL_SIZE, max_keepalive_connections=KAKAO_POOL_SIZE),
+            )
+        return self._async_client
+
+    async def asearch_keyword(self, location: str, keyword: str, size: int = 3) -> list:
+        """search_keyword의 비동기 버전 (asgi_app.py 경로) - 캐시/지표/재시도 정책은 동일"""
+        key = self._cache_key(location, keyword) + (size,)
+        cached = self._cached(key)
+        if cached is not MISSING:
+            return cached
+
+        args = self._request_args(location, keyword, size)
+        client = self._get_async_client()
+        started = time.perf_counter()
+        retries = 0
+        while True:
+            try:
+                response = await client.get(args["url"], headers=args["headers"], params=args["params"])
+            except httpx.HTTPError as e:
+                if retries < KAKAO_RETRIES:
+                    retries += 1
+                    await asyncio.sleep(KAKAO_BACKOFF * (2 ** (retries - 1)))
+                    continue
+                self._handle_error(e, time.perf_counter() - started)
+                raise
+            if response.status_code in RETRY_STATUSES and retries < KAKAO_RETRIES:
+                retries += 1
+                await asyncio.sleep(KAKAO_BACKOFF * (2 ** (retries - 1)))
+                continue
+            return self._handle_response(key, response.status_code, response.json,
+                                         time.perf_counter() - started, retries)
+
+    def _record(self, seconds: float, error: bool = False):
+        with self._lock:
+            self.upstream_calls += 1
+            self.upstream_seconds += seconds
+            self.upstream_max_seconds = max(self.upstream_max_seconds, seconds)
+            if error:
+                self.upstream_errors += 1
+
+    def stats(self):
+        calls = self.upstream_calls
+        return {
+            "cache": self.cache.stats(),
+            "upstream_calls": calls,
+            "upstream_errors": self.upstream_errors,
+            "upstream_avg_ms": round(self.upstream_seconds / calls * 1000, 1) if calls else 0.0,
+            "upstream_max_ms": round(self.upstream_max_seconds * 1000, 1),
+        }
+
+
+kakao_client = KakaoLocalClient(api_key=os.getenv("KAKAO_API_KEY"))
@@ -0,0 +1,151 @@
+# meal_response.py
+# 식사 후 실제 혈당 반응 분석 (식사 후 0~3시간 구간의 최고점/상승폭/증분 AUC)
+# 사용자 혈당을 열(column) 배열로 한 번 읽고 모든 식사 구간을 NumPy로 한 번에 계산
+import os
+from datetime import timedelta
+
+import numpy as np
+
+from database import FoodLog, HealthLog
+
+RESPONSE_WINDOW_MINUTES = int(os.getenv("MEAL_RESPONSE_WINDOW_MINUTES", 180))   # 식사 후 분석 구간
+BASELINE_LOOKBACK_MINUTES = int(os.getenv("MEAL_BASELINE_LOOKBACK_MINUTES", 30))  # 식전 기준값을 찾는 범위
+MIN_WINDOW_READINGS = 2  # 구간 안 측정값이 이보다 적으면 반응을 계산하지 않음
+
+
+def _to_epoch(datetimes) -> np.ndarray:
+    return np.array(datetimes, dtype="datetime64[s]").astype(np.int64)
+
+
+def load_series(db, owner_id: int, start, end):
+    """
+    기간 내 식사와 (구간 계산에 필요한 앞뒤 여유를 포함한) 혈당 측정값을 열 배열로 읽음
+    반환값: (meals: {"id", "t", "desc", "impact"}, glucose: {"t", "v"}) - t는 epoch 초
+    """
+    meal_rows = db.query(FoodLog.id, FoodLog.created_at, FoodLog.food_description, FoodLog.blood_sugar_impact)\
+                  .filter(FoodLog.owner_id == owner_id, FoodLog.created_at >= start, FoodLog.created_at < end)\
+                  .order_by(FoodLog.created_at.asc()).all()
+    glucose_rows = db.query(HealthLog.created_at, HealthLog.sugar_level)\
+                     .filter(HealthLog.owner_id == owner_id,
+                             HealthLog.created_at >= start - timedelta(minutes=BASELINE_LOOKBACK_MINUTES),
+                             HealthLog.created_at <= end + timedelta(minutes=RESPONSE_WINDOW_MINUTES),
+                             HealthLog.sugar_level.isnot(None))\
+                     .order_by(HealthLog.created_at.asc()).all()
+
+    meals = {
+        "id": np.array([r.id for r in meal_rows], dtype=np.int64),
+        "t": _to_epoch([r.created_at for r in meal_rows]),
+        "desc": [r.food_description for r in meal_rows],
+        "impact": [r.blood_sugar_impact for r in meal_rows],
+    }
+    glucose = {
+        "t": _to_epoch([r.created_at for r in glucose_rows]),
+        "v": np.array([r.sugar_level for r in glucose_rows], dtype=np.float64),
+    }
+    return meals, glucose
+
+
+def compute_responses(meal_t: np.ndarray, glucose_t: np.ndarray, glucose_v: np.ndarray,
+                      window_minutes: int = RESPONSE_WINDOW_MINUTES,
+                      lookback_minutes: int = BASELINE_LOOKBACK_MINUTES):
+    """
+    식사 시각 배열과 (시간순 정렬된) 혈당 배열로 식사별 반응 계산
+    - baseline: 식사 시각 이전 lookback 안의 마지막 측정값
+    - peak / delta(peak - baseline) / time_to_peak(분)
+    - iauc: baseline 위쪽 면적 (mg/dL·분, 식사 시각의 baseline 점부터 사다리꼴 적분, 음수 구간은 0으로 자름)
+    계산할 수 없는 식사는 NaN
+    """
+    n = len(meal_t)
+    result = {key: np.full(n, np.nan) for key in ("baseline", "peak", "delta", "time_to_peak", "iauc")}
+    result["readings"] = np.zeros(n, dtype=np.int64)
+    if n == 0 or len(glucose_t) == 0:
+        return result
+
+    # 1. 식사마다 기준값 위치와 구간(식사 시각, 식사 시각 + window] 범위를 이진 탐색으로 한 번에 구함
+    base_idx = np.searchsorted(glucose_t, meal_t, side="right") - 1
+    end_idx = np.searchsorted(glucose_t, meal_t + window_minutes * 60, side="right")
+    start_idx = base_idx + 1
+    has_base = (base_idx >= 0) & (glucose_t[np.maximum(base_idx, 0)] >= meal_t - lookback_minutes * 60)
+    counts = np.where(has_base, end_idx - start_idx, 0)
+    valid = counts >= MIN_WINDOW_READINGS
+    counts = np.where(valid, counts, 0)
+    result["readings"] = counts
+    if not valid.any():
+        return result
+
+    meal_ids = np.nonzero(valid)[0]
+    baseline = glucose_v[base_idx[meal_ids]]
+    seg_counts = counts[meal_ids]
+
+    # 2. 구간들을 이어 붙인 평탄한 배열 (각 구간 앞에 식사 시각의 baseline 점을 추가)
+    seg_len = seg_counts + 1
+    seg_offsets = np.cumsum(seg_len) - seg_len
+    seg = np.repeat(np.arange(len(meal_ids)), seg_len)
+    local = np.arange(seg_len.sum()) - seg_offsets[seg]
+    is_anchor = local == 0
+    src = start_idx[meal_ids][seg] + local - 1
+    times = np.where(is_anchor, meal_t[meal_ids][seg], glucose_t[np.where(is_anchor, 0, src)])
+    values = np.where(is_anchor, baseline[seg], glucose_v[np.where(is_anchor, 0, src)])
+
+    # 3. 최고점 / 최고점 도달 시간 (구간별 reduceat)
+    window_values = np.where(is_anchor, -np.inf, values)
+    peak = np.maximum.reduceat(window_values, seg_offsets)
+    peak_times = np.where(window_values == peak[seg], times, np.iinfo(np.int64).max)
+    first_peak_t = np.minimum.reduceat(peak_times, seg_offsets)
+
+    # 4. baseline 위 증분 면적 (같은 구간 안 연속한 두 점 사이 사다리꼴)
+    above = np.clip(values - baseline[seg], 0, None)
+    same_seg = seg[1:] == seg[:-1]
+    areas = (times[1:] - times[:-1]) / 60.0 * (above[1:] + above[:-1]) / 2.0
+    iauc = np.bincount(seg[1:][same_seg], weights=areas[same_seg], minlength=len(meal_ids))
+
+    result["baseline"][meal_ids] = baseline
+    result["peak"][meal_ids] = peak
+    result["delta"][meal_ids] = peak - baseline
+    result["time_to_peak"][meal_ids] = (first_peak_t - meal_t[meal_ids]) / 60.0
+    result["iauc"][meal_ids] = iauc
+    return result
+
+
+def summarize_by_category(categories: list, responses: dict):
+    """blood_sugar_impact별 평균 (반응을 계산한 식사만)"""
+    labels = sorted({c or "알 수 없음" for c in categories})
+    codes = np.array([labels.index(c or "알 수 없음") for c in categories], dtype=np.int64)
+    ok = ~np.isnan(responses["delta"])
+    counts = np.bincount(codes[ok], minlength=len(labels))
+
+    summary = {}
+    for key in ("peak", "delta", "iauc", "time_to_peak"):
+        sums = np.bincount(codes[ok], weights=responses[key][ok], minlength=len(labels))
+        for i, label in enumerate(labels):
+            entry = summary.setdefault(label, {"meals": int(counts[i])})
+            entry[f"avg_{key}"] = round(float(sums[i] / counts[i]), 1) if counts[i] else None
+    return summary
+
+
+def _round(value):
+    return None if np.isnan(value) else round(float(value), 1)
+
+
+def get_meal_responses(db, owner_id: int, start, end):
+    """기간(start~end) 식사별 혈당 반응 + 혈당 영향 등급별 평균"""
+    meals, glucose = load_series(db, owner_id, start, end)
+    responses = compute_responses(meals["t"], glucose["t"], glucose["v"])
+
+    items = []
+    for i in range(len(meals["id"])):
+        items.append({
+            "id": int(meals["id"][i]),
+            "created_at": np.datetime64(int(meals["t"][i]), "s").item().isoformat(),
+            "food": meals["desc"][i],
+            "blood_sugar_impact": meals["impact"][i],
+            "readings": int(responses["readings"][i]),
+            **{key: _round(responses[key][i]) for key in ("baseline", "peak", "delta", "time_to_peak", "iauc")},
+        })
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "window_minutes": RESPONSE_WINDOW_MINUTES,
+        "meals": items,
+        "by_impact": summarize_by_category(meals["impact"], responses),
+    }
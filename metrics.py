@@ -0,0 +1,243 @@
+# metrics.py
+# LLM/외부 API 호출 계측 (지연 시간 히스토그램, 토큰, 비용, 재시도, 에러) → /metrics (Prometheus 텍스트 형식)
+# 워커 프로세스마다 따로 집계됨 (Prometheus가 워커별로 긁거나 합산해서 봐야 함)
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# OpenAI HTTP 타임아웃 (초) - SDK 기본값(읽기 600초)이면 멈춘 호출 하나가 워커를 몇 분씩 잡음
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", 60))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60)
+ITERATION_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 12)
+
+# 모델별 100만 토큰당 가격 (USD, 입력/출력) - 요금이 바뀌면 MODEL_PRICES="모델:입력:출력,..."로 덮어씀
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+for _item in filter(None, os.getenv("MODEL_PRICES", "").split(",")):
+    _model, _prompt, _completion = _item.split(":")
+    MODEL_PRICES[_model.strip()] = (float(_prompt), float(_completion))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=None) -> str:
+    pairs = list(zip(labelnames, values)) + (extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [버킷별 개수..., 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def collect(self):
+        with self._lock:
+            values = {key: list(entry) for key, entry in self._values.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, entry in sorted(values.items()):
+            for bound, count in zip(self.buckets, entry):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {entry[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {round(entry[-2], 6)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {entry[-1]}")
+        return lines
+
+
+_registry = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+# --- LLM (OpenAI / LangChain) ---
+llm_latency = _register(Histogram("llm_request_duration_seconds", "LLM 호출 지연 시간", ("node", "model")))
+llm_prompt_tokens = _register(Counter("llm_prompt_tokens_total", "LLM 입력 토큰 수", ("node", "model")))
+llm_completion_tokens = _register(Counter("llm_completion_tokens_total", "LLM 출력 토큰 수", ("node", "model")))
+llm_cost = _register(Counter("llm_cost_usd_total", "LLM 추정 비용(USD)", ("node", "model")))
+llm_retries = _register(Counter("llm_retries_total", "LLM HTTP 재시도 횟수", ("node", "model")))
+llm_errors = _register(Counter("llm_errors_total", "LLM 호출 실패 횟수", ("node", "model", "error")))
+
+# --- 모델 등급 라우팅 (model_router.py) ---
+llm_tier_latency = _register(Histogram("llm_tier_request_duration_seconds", "모델 등급별 LLM 호출 지연 시간", ("tier",)))
+llm_tier_cost = _register(Counter("llm_tier_cost_usd_total", "모델 등급별 LLM 추정 비용(USD)", ("tier",)))
+model_routes = _register(Counter("model_route_total", "모델 등급 라우팅 결정", ("kind", "tier", "reason")))
+model_escalations = _register(Counter("model_escalations_total", "작은 모델 결과를 버리고 큰 모델로 다시 실행한 횟수",
+                                      ("kind", "reason")))
+
+# --- 식단 분석 응답 검증 ---
+analysis_outcomes = _register(Counter("analysis_parse_total", "식단 분석 응답 검증 결과 (ok/repaired/failed/error)",
+                                      ("outcome",)))
+analysis_wasted_tokens = _register(Counter("analysis_wasted_tokens_total",
+                                           "검증에 실패해 버려진 분석 응답의 토큰 수", ("model",)))
+
+# --- 카카오 검색 ---
+kakao_latency = _register(Histogram("kakao_request_duration_seconds", "카카오 검색 API 지연 시간", ("status",)))
+kakao_requests = _register(Counter("kakao_requests_total", "카카오 검색 요청 수 (캐시 포함)", ("outcome",)))
+kakao_retries = _register(Counter("kakao_retries_total", "카카오 검색 HTTP 재시도 횟수"))
+
+# --- 챗봇 그래프 ---
+graph_node_latency = _register(Histogram("chat_graph_node_duration_seconds", "LangGraph 노드 실행 시간", ("node",)))
+graph_node_visits = _register(Histogram("chat_graph_node_visits", "채팅 요청 하나에서 노드가 실행된 횟수",
+                                        ("node",), buckets=ITERATION_BUCKETS))
+tool_latency = _register(Histogram("chat_tool_duration_seconds", "챗봇 도구 실행 시간", ("tool", "outcome")))
+chat_budget_exhausted = _register(Counter("chat_budget_exhausted_total",
+                                          "채팅 실행 예산(도구 라운드/안전 재생성/제한 시간) 초과 횟수", ("limit",)))
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+# --- HTTP 재시도 집계 ---
+# OpenAI SDK는 재시도를 내부에서 처리하므로 httpx 요청 훅으로 실제 HTTP 시도 횟수를 셈
+_http_attempts = contextvars.ContextVar("llm_http_attempts", default=None)
+
+
+def _count_http_attempt(request):
+    attempts = _http_attempts.get()
+    if attempts is not None:
+        attempts[0] += 1
+
+
+def _http_timeout():
+    import httpx
+    return httpx.Timeout(LLM_HTTP_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+def make_http_client():
+    """OpenAI/ChatOpenAI에 넘길 httpx 클라이언트 (SDK 기본 커넥션 설정 + LLM_HTTP_TIMEOUT + HTTP 시도 횟수 집계)"""
+    from openai import DefaultHttpxClient
+    return DefaultHttpxClient(timeout=_http_timeout(), event_hooks={"request": [_count_http_attempt]})
+
+
+async def _acount_http_attempt(request):
+    _count_http_attempt(request)
+
+
+def make_async_http_client():
+    """AsyncOpenAI/ChatOpenAI(ainvoke)용 httpx 비동기 클라이언트 (asgi_app.py 경로)"""
+    from openai import DefaultAsyncHttpxClient
+    return DefaultAsyncHttpxClient(timeout=_http_timeout(), event_hooks={"request": [_acount_http_attempt]})
+
+
+class LLMCall:
+    def __init__(self, node, model, tier=None):
+        self.node = node
+        self.model = model
+        self.tier = tier
+        self.cost = 0.0
+
+    def record_usage(self, prompt_tokens, completion_tokens):
+        prompt_tokens = prompt_tokens or 0
+        completion_tokens = completion_tokens or 0
+        llm_prompt_tokens.inc(prompt_tokens, node=self.node, model=self.model)
+        llm_completion_tokens.inc(completion_tokens, node=self.node, model=self.model)
+        prices = MODEL_PRICES.get(self.model)
+        if prices:
+            cost = (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+            self.cost += cost
+            llm_cost.inc(cost, node=self.node, model=self.model)
+            if self.tier:
+                llm_tier_cost.inc(cost, tier=self.tier)
+
+    def record_message(self, message):
+        """LangChain AIMessage의 usage_metadata로 토큰 기록"""
+        usage = getattr(message, "usage_metadata", None) or {}
+        self.record_usage(usage.get("input_tokens"), usage.get("output_tokens"))
+
+
+@contextmanager
+def llm_call(node: str, model: str, tier: str = None):
+    """
+    LLM 호출 한 번을 감싸서 지연 시간/에러/재시도 기록 (tier를 주면 모델 등급별 지연 시간/비용도 기록)
+        with llm_call("chatbot", "gpt-4o") as call:
+            response = llm.invoke(...)
+            call.record_message(response)
+    """
+    call = LLMCall(node, model, tier)
+    attempts = [0]
+    token = _http_attempts.set(attempts)
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        llm_errors.inc(node=node, model=model, error=type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        llm_latency.observe(elapsed, node=node, model=model)
+        if tier:
+            llm_tier_latency.observe(elapsed, tier=tier)
+        if attempts[0] > 1:
+            llm_retries.inc(attempts[0] - 1, node=node, model=model)
+        _http_attempts.reset(token)
+
+
+@contextmanager
+def timed_node(node: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        graph_node_latency.observe(time.perf_counter() - started, node=node)
+
+
+def record_chat_trace(trace: list):
+    """채팅 요청 하나의 노드 실행 순서 → 노드별 실행 횟수 히스토그램. 반환값: {"nodes": [...], "iterations": {...}}"""
+    iterations = {"chatbot": 0, "tools": 0, "safety_check": 0, "fallback": 0}
+    for step in trace:
+        iterations[step["node"]] = iterations.get(step["node"], 0) + 1
+    for node, count in iterations.items():
+        graph_node_visits.observe(count, node=node)
+    return {"nodes": trace, "iterations": iterations}
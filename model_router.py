@@ -0,0 +1,133 @@
+# model_router.py
+# 요청 복잡도에 따라 모델 등급(tier)을 고르는 라우팅 정책 (식단 분석 / 챗봇 / 안전 검사)
+# - 정책은 입력(텍스트/이미지, 길이, 도구가 필요할지)만 보고 결정 → 가짜 모델(스텁 서버)로 오프라인 검증 가능
+# - 작은 모델 결과가 미덥지 않으면 큰 모델로 다시 실행 (escalate)
+# - 등급별 지연 시간/비용, 등급별 라우팅 수, 에스컬레이션 비율 기록
+import os
+import re
+import time
+import threading
+from contextlib import contextmanager
+
+from metrics import llm_call, model_routes, model_escalations
+
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "true").lower() in ("1", "true", "yes")  # false면 항상 큰 모델
+MODEL_TIERS = {
+    "small": os.getenv("MODEL_TIER_SMALL", "gpt-4o-mini"),
+    "large": os.getenv("MODEL_TIER_LARGE", "gpt-4o"),
+}
+ROUTE_ANALYSIS_MAX_CHARS = int(os.getenv("ROUTE_ANALYSIS_MAX_CHARS", 30))  # 이 길이 이하 텍스트 식단만 작은 모델
+ROUTE_CHAT_MAX_CHARS = int(os.getenv("ROUTE_CHAT_MAX_CHARS", 20))          # 이 길이 이하 채팅(인사 등)만 작은 모델
+RATIO_SUM_TOLERANCE = 15                                                   # 단탄지 비율 합이 100±15를 벗어나면 재분석
+
+# 식당 검색(도구)이 필요할 것 같은 표현 - 장소/검색 의도가 보이면 도구 호출을 잘하는 큰 모델로
+TOOL_HINTS = ("근처", "주변", "식당", "맛집", "가게", "어디서", "동네", "배달", "찾아")
+_STATION = re.compile(r"[가-힣A-Za-z0-9]+역(?![가-힣])")  # "강남역", "홍대입구역 근처"
+
+
+class ModelRouter:
+    """
+    route_*: (요청 종류별) {"tier", "model", "reason"} 결정
+    escalate: 작은 모델 결과를 버리고 큰 모델로 다시 실행할 때 호출
+    call: llm_call을 감싸서 등급별 지연 시간/비용 집계
+    """
+
+    def __init__(self, tiers=None, enabled=MODEL_ROUTING):
+        self.tiers = dict(tiers or MODEL_TIERS)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.routes = {}       # (종류, 등급) -> 횟수
+        self.escalations = {}  # 종류 -> 횟수
+        self.tier_calls = {tier: {"calls": 0, "seconds": 0.0, "cost_usd": 0.0} for tier in self.tiers}
+
+    def _route(self, kind: str, tier: str, reason: str) -> dict:
+        if not self.enabled:
+            tier, reason = "large", "routing_disabled"
+        with self._lock:
+            self.routes[(kind, tier)] = self.routes.get((kind, tier), 0) + 1
+        model_routes.inc(kind=kind, tier=tier, reason=reason)
+        return {"kind": kind, "tier": tier, "model": self.tiers[tier], "reason": reason}
+
+    def route_analysis(self, text: str, has_image: bool) -> dict:
+        """사진은 비전 품질이 중요하므로 큰 모델, 짧은 텍스트 식단("삶은 계란 2개")만 작은 모델"""
+        if has_image:
+            return self._route("analysis", "large", "image")
+        if len((text or "").strip()) <= ROUTE_ANALYSIS_MAX_CHARS:
+            return self._route("analysis", "small", "short_text")
+        return self._route("analysis", "large", "long_text")
+
+    def route_batch_analysis(self) -> dict:
+        """여러 식단을 한 요청에 묶는 일괄 분석은 출력이 길고 항목별 형식을 지켜야 하므로 큰 모델"""
+        return self._route("analysis", "large", "batch")
+
+    def route_chat(self, message: str) -> dict:
+        """식당 검색이 필요해 보이면 큰 모델, 짧은 인사/맞장구는 작은 모델"""
+        message = (message or "").strip()
+        if _STATION.search(message) or any(hint in message for hint in TOOL_HINTS):
+            return self._route("chat", "large", "tools_likely")
+        if len(message) <= ROUTE_CHAT_MAX_CHARS:
+            return self._route("chat", "small", "short")
+        return self._route("chat", "large", "long")
+
+    def route_safety(self) -> dict:
+        """안전 검사는 SAFE/DANGER 분류라 작은 모델로 시작 (판정이 애매하면 escalate)"""
+        return self._route("safety", "small", "classification")
+
+    def escalate(self, route: dict, reason: str) -> dict:
+        """작은 모델 결과가 미덥지 않음 → 큰 모델 경로 반환"""
+        kind = route["kind"]
+        with self._lock:
+            self.escalations[kind] = self.escalations.get(kind, 0) + 1
+        model_escalations.inc(kind=kind, reason=reason)
+        print(f"⬆️ [Router] {kind}: {route['model']} → {self.tiers['large']} ({reason})")
+        return {"kind": kind, "tier": "large", "model": self.tiers["large"], "reason": f"escalated:{reason}"}
+
+    @contextmanager
+    def call(self, node: str, route: dict):
+        """
+        LLM 호출 한 번 (llm_call과 같은 사용법) + 등급별 지연 시간/비용 집계
+            with model_router.call("chatbot", route) as call:
+                response = llm.invoke(...)
+                call.record_message(response)
+        """
+        started = time.perf_counter()
+        with llm_call(node, route["model"], tier=route["tier"]) as call:
+            try:
+                yield call
+            finally:
+                with self._lock:
+                    stats = self.tier_calls.setdefault(route["tier"], {"calls": 0, "seconds": 0.0, "cost_usd": 0.0})
+                    stats["calls"] += 1
+                    stats["seconds"] += time.perf_counter() - started
+                    stats["cost_usd"] += call.cost
+
+    def stats(self):
+        with self._lock:
+            routes = dict(self.routes)
+            escalations = dict(self.escalations)
+            tier_calls = {tier: dict(s) for tier, s in self.tier_calls.items()}
+        kinds = {}
+        for (kind, tier), count in routes.items():
+            kinds.setdefault(kind, {"small": 0, "large": 0, "escalations": 0})[tier] = count
+        for kind, entry in kinds.items():
+            entry["escalations"] = escalations.get(kind, 0)
+            # 작은 모델로 보낸 요청 중 큰 모델로 다시 실행한 비율
+            entry["escalation_rate"] = round(entry["escalations"] / entry["small"], 3) if entry["small"] else 0.0
+        tiers = {}
+        for tier, s in tier_calls.items():
+            tiers[tier] = {
+                "model": self.tiers.get(tier),
+                "calls": s["calls"],
+                "avg_ms": round(s["seconds"] / s["calls"] * 1000, 1) if s["calls"] else 0.0,
+                "cost_usd": round(s["cost_usd"], 6),
+            }
+        return {"enabled": self.enabled, "kinds": kinds, "tiers": tiers}
+
+
+def analysis_looks_confident(result: dict) -> bool:
+    """작은 모델 분석 결과의 신뢰도 점검 - 단탄지 비율 합이 100에서 크게 벗어나면 다시 분석"""
+    total = sum(result.get(k) or 0 for k in ("carbs_ratio", "protein_ratio", "fat_ratio"))
+    return abs(total - 100) <= RATIO_SUM_TOLERANCE
+
+
+model_router = ModelRouter()
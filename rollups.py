@@ -0,0 +1,173 @@
+# rollups.py
+# 사용자별 하루 단위 식단/혈당 집계 (대시보드 주간/월간 조회가 원본 기록을 훑지 않도록)
+from datetime import date
+from types import SimpleNamespace
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from database import DailyNutritionRollup, FoodLog, HealthLog, get_kst_now
+
+R = DailyNutritionRollup
+
+IMPACT_COLUMNS = {
+    "낮음": "impact_low",
+    "보통": "impact_normal",
+    "높음": "impact_high",
+    "매우 높음": "impact_very_high",
+}
+
+
+def _value(record, name):
+    return record.get(name) if isinstance(record, dict) else getattr(record, name)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _ensure_row(db, owner_id: int, day: date):
+    """(owner_id, day) 집계 행이 없으면 만들기 (다른 워커와 동시에 만들면 한쪽은 무시)"""
+    exists = db.query(R.id).filter(R.owner_id == owner_id, R.day == day).first()
+    if exists:
+        return
+    try:
+        with db.begin_nested():
+            db.add(R(owner_id=owner_id, day=day))
+    except IntegrityError:
+        pass
+
+
+def _min_max(db):
+    # 두 값 중 작은/큰 값 (SQLite는 다중 인자 min/max, PostgreSQL은 LEAST/GREATEST)
+    if db.get_bind().dialect.name == "sqlite":
+        return func.min, func.max
+    return func.least, func.greatest
+
+
+def record_meals(db, owner_id: int, meals: list):
+    """
+    식사 기록(FoodLog 객체 또는 같은 키의 dict)을 날짜별로 모아 집계에 더함
+    호출한 쪽의 트랜잭션 안에서 실행됨 (commit은 호출한 쪽에서)
+    """
+    per_day = {}
+    for meal in meals:
+        day = (_value(meal, "created_at") or get_kst_now()).date()
+        delta = per_day.setdefault(day, {"meal_count": 0, "ratio_count": 0, "carbs_sum": 0.0,
+                                         "protein_sum": 0.0, "fat_sum": 0.0, "impact_low": 0,
+                                         "impact_normal": 0, "impact_high": 0,
+                                         "impact_very_high": 0, "impact_unknown": 0})
+        delta["meal_count"] += 1
+        ratios = [_to_float(_value(meal, k)) for k in ("carbs_ratio", "protein_ratio", "fat_ratio")]
+        if None not in ratios:
+            delta["ratio_count"] += 1
+            delta["carbs_sum"] += ratios[0]
+            delta["protein_sum"] += ratios[1]
+            delta["fat_sum"] += ratios[2]
+        delta[IMPACT_COLUMNS.get(_value(meal, "blood_sugar_impact"), "impact_unknown")] += 1
+
+    for day, delta in per_day.items():
+        _ensure_row(db, owner_id, day)
+        # col = col + n 형태의 UPDATE → 여러 워커가 동시에 갱신해도 값이 사라지지 않음
+        values = {getattr(R, k): getattr(R, k) + v for k, v in delta.items() if v}
+        values[R.updated_at] = get_kst_now()
+        db.query(R).filter(R.owner_id == owner_id, R.day == day).update(values, synchronize_session=False)
+
+
+def record_glucose(db, owner_id: int, readings: list):
+    """혈당 측정값 [(created_at, sugar_level), ...]을 날짜별로 집계에 더함"""
+    per_day = {}
+    for created_at, level in readings:
+        if level is None:
+            continue
+        day = (created_at or get_kst_now()).date()
+        count, total, low, high = per_day.get(day, (0, 0.0, level, level))
+        per_day[day] = (count + 1, total + level, min(low, level), max(high, level))
+
+    least, greatest = _min_max(db)
+    for day, (count, total, low, high) in per_day.items():
+        _ensure_row(db, owner_id, day)
+        db.query(R).filter(R.owner_id == owner_id, R.day == day).update({
+            R.glucose_count: R.glucose_count + count,
+            R.glucose_sum: R.glucose_sum + total,
+            R.glucose_min: least(func.coalesce(R.glucose_min, low), low),
+            R.glucose_max: greatest(func.coalesce(R.glucose_max, high), high),
+            R.updated_at: get_kst_now(),
+        }, synchronize_session=False)
+
+
+def _serialize(row):
+    ratio_count = row.ratio_count or 0
+    glucose_count = row.glucose_count or 0
+    return {
+        "day": row.day.isoformat(),
+        "meal_count": row.meal_count or 0,
+        "avg_carbs_ratio": round(row.carbs_sum / ratio_count, 1) if ratio_count else None,
+        "avg_protein_ratio": round(row.protein_sum / ratio_count, 1) if ratio_count else None,
+        "avg_fat_ratio": round(row.fat_sum / ratio_count, 1) if ratio_count else None,
+        "impact": {label: getattr(row, col) or 0 for label, col in IMPACT_COLUMNS.items()},
+        "glucose_count": glucose_count,
+        "glucose_avg": round(row.glucose_sum / glucose_count, 1) if glucose_count else None,
+        "glucose_min": row.glucose_min,
+        "glucose_max": row.glucose_max,
+    }
+
+
+def get_rollups(db, owner_id: int, start: date, end: date):
+    """기간(start~end, 양 끝 포함) 집계 - 날짜별 값과 기간 전체 합계"""
+    rows = db.query(R).filter(R.owner_id == owner_id, R.day >= start, R.day <= end)\
+             .order_by(R.day.asc()).all()
+
+    sum_columns = ("meal_count", "ratio_count", "carbs_sum", "protein_sum", "fat_sum",
+                   "glucose_count", "glucose_sum", "impact_unknown", *IMPACT_COLUMNS.values())
+    total = SimpleNamespace(day=start, glucose_min=None, glucose_max=None, **{col: 0 for col in sum_columns})
+    for row in rows:
+        for col in sum_columns:
+            setattr(total, col, getattr(total, col) + (getattr(row, col) or 0))
+        if row.glucose_min is not None:
+            total.glucose_min = row.glucose_min if total.glucose_min is None else min(total.glucose_min, row.glucose_min)
+        if row.glucose_max is not None:
+            total.glucose_max = row.glucose_max if total.glucose_max is None else max(total.glucose_max, row.glucose_max)
+
+    summary = _serialize(total)
+    summary.pop("day")
+    summary["start"] = start.isoformat()
+    summary["end"] = end.isoformat()
+    return {"days": [_serialize(row) for row in rows], "total": summary}
+
+
+def backfill(db, owner_id: int = None):
+    """
+    기존 FoodLog/HealthLog로 집계 테이블을 다시 만듦 (기존 DB에 처음 적용할 때)
+    owner_id를 주면 해당 사용자만 다시 계산
+    """
+    rollups = db.query(R)
+    if owner_id is not None:
+        rollups = rollups.filter(R.owner_id == owner_id)
+    rollups.delete(synchronize_session=False)
+
+    meals = db.query(FoodLog.owner_id, FoodLog.created_at, FoodLog.carbs_ratio, FoodLog.protein_ratio,
+                     FoodLog.fat_ratio, FoodLog.blood_sugar_impact)
+    readings = db.query(HealthLog.owner_id, HealthLog.created_at, HealthLog.sugar_level)
+    if owner_id is not None:
+        meals = meals.filter(FoodLog.owner_id == owner_id)
+        readings = readings.filter(HealthLog.owner_id == owner_id)
+
+    per_owner_meals = {}
+    for row in meals.yield_per(1000):
+        per_owner_meals.setdefault(row.owner_id, []).append(row._asdict())
+    per_owner_readings = {}
+    for row in readings.yield_per(1000):
+        per_owner_readings.setdefault(row.owner_id, []).append((row.created_at, row.sugar_level))
+
+    for oid, owner_meals in per_owner_meals.items():
+        record_meals(db, oid, owner_meals)
+    for oid, owner_readings in per_owner_readings.items():
+        record_glucose(db, oid, owner_readings)
+    db.commit()
+    return {"users": len(set(per_owner_meals) | set(per_owner_readings)),
+            "meals": sum(len(v) for v in per_owner_meals.values()),
+            "readings": sum(len(v) for v in per_owner_readings.values())}
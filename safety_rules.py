@@ -0,0 +1,109 @@
+# safety_rules.py
+# 당뇨 환자 안전 검사의 1차 필터 (LLM 호출 전에 규칙으로 판정)
+import re
+import threading
+
+SAFE = "SAFE"
+DANGER = "DANGER"
+AMBIGUOUS = "AMBIGUOUS"
+
+# 야식으로 추천하면 위험한 '식사 메뉴' (시스템 프롬프트의 야식 경고 목록 기준)
+HEAVY_MEAL_TERMS = [
+    "비빔밥", "국밥", "정식", "덮밥", "짜장면", "짬뽕", "라면", "냉면", "칼국수", "우동",
+    "떡볶이", "피자", "치킨", "햄버거", "김밥", "파스타", "족발", "돈까스", "볶음밥", "쌀국수",
+]
+
+# 시스템 프롬프트가 점심/저녁 메뉴로 직접 권하는 표현 → 낮에는 LLM 검사 없이 SAFE (위 목록 단어를 포함하는 것만)
+ENDORSED_MEAL_TERMS = [
+    "비빔밥(현미)", "현미 비빔밥", "현미비빔밥", "생선구이 정식", "한식 정식", "회덮밥",
+]
+
+# 시간대와 관계없이 혈당을 급격히 올리는 고당분 음식
+HIGH_SUGAR_TERMS = [
+    "케이크", "도넛", "마카롱", "탕후루", "아이스크림", "빙수", "와플", "초콜릿",
+    "과자", "콜라", "사이다", "탄산음료", "과일주스", "설탕", "꿀떡", "시럽",
+]
+
+# 위 음식을 '피하라'고 말하는 문맥 → 규칙만으로는 판단하기 애매함
+CAUTION_TERMS = [
+    "피하", "피해", "자제", "금지", "삼가", "대신", "안 돼", "안돼", "치명적",
+    "추천하지", "드시지 마", "드시면 안", "줄이", "멀리",
+]
+
+NIGHT_INTENT_TERMS = ["야식", "심야", "자기 전", "늦은 밤", "밤늦게"]
+
+NIGHT_START_HOUR = 21
+NIGHT_END_HOUR = 5
+
+_CATEGORY = {}
+for _term in HEAVY_MEAL_TERMS:
+    _CATEGORY[_term] = "meal"
+for _term in HIGH_SUGAR_TERMS:
+    _CATEGORY[_term] = "sugar"
+for _term in CAUTION_TERMS:
+    _CATEGORY[_term] = "caution"
+
+# 모든 단어를 하나의 정규식으로 컴파일 (긴 단어 우선) → 답변을 한 번만 훑어서 전부 찾음
+_LEXICON_PATTERN = re.compile("|".join(re.escape(t) for t in sorted(_CATEGORY, key=len, reverse=True)))
+_ENDORSED_PATTERN = re.compile("|".join(re.escape(t) for t in sorted(ENDORSED_MEAL_TERMS, key=len, reverse=True)))
+_NIGHT_INTENT_PATTERN = re.compile("|".join(re.escape(t) for t in NIGHT_INTENT_TERMS))
+_HOUR_PATTERN = re.compile(r"(\d{1,2})\s*시")
+
+_lock = threading.Lock()
+prescreen_stats = {SAFE: 0, DANGER: 0, AMBIGUOUS: 0, "llm_calls_avoided": 0}
+
+
+def is_night(current_time: str, user_text: str = "") -> bool:
+    """현재 시간("22시 10분")이 야식 시간대이거나 사용자가 야식을 언급했는지"""
+    if user_text and _NIGHT_INTENT_PATTERN.search(user_text):
+        return True
+    match = _HOUR_PATTERN.search(current_time or "")
+    if not match:
+        return False
+    hour = int(match.group(1))
+    return hour >= NIGHT_START_HOUR or hour < NIGHT_END_HOUR
+
+
+def classify_answer(answer: str, current_time: str, user_text: str = ""):
+    """
+    AI 답변을 규칙으로 분류
+    반환값: (SAFE | DANGER | AMBIGUOUS, 이유)
+    - SAFE: 낮 시간에 위험 단어가 없거나, 시스템 프롬프트가 권하는 메뉴(ENDORSED_MEAL_TERMS)만 추천
+    - DANGER: 야식 시간에 경고 문맥 없이 식사 메뉴를 추천
+    - AMBIGUOUS: 규칙으로 판단하기 어려움 → LLM 검사로 넘김
+      (낮 시간의 짜장면/라면 등 '강력 추천' 여부, 야식 시간에 목록에 없는 음식(삼겹살, 탕수육 등)을 추천했는지 포함)
+    """
+    answer = answer or ""
+    endorsed_spans = [m.span() for m in _ENDORSED_PATTERN.finditer(answer)]
+    found = {"meal": set(), "sugar": set(), "caution": set()}
+    unendorsed_meals = set()
+    for match in _LEXICON_PATTERN.finditer(answer):
+        term = match.group(0)
+        found[_CATEGORY[term]].add(term)
+        if _CATEGORY[term] == "meal" and not any(s <= match.start() and match.end() <= e for s, e in endorsed_spans):
+            unendorsed_meals.add(term)
+
+    night = is_night(current_time, user_text)
+
+    if not night and not found["meal"] and not found["sugar"]:
+        verdict, reason = SAFE, "낮 시간대 위험 음식 언급 없음"
+    elif not night and not found["sugar"] and not unendorsed_meals:
+        verdict, reason = SAFE, "낮 시간대 권장 메뉴 추천"
+    elif night and found["meal"] and not found["caution"]:
+        verdict, reason = DANGER, f"야식 시간에 {', '.join(sorted(found['meal']))} 추천"
+    else:
+        verdict, reason = AMBIGUOUS, "규칙만으로 판단 불가"
+
+    with _lock:
+        prescreen_stats[verdict] += 1
+        if verdict != AMBIGUOUS:
+            prescreen_stats["llm_calls_avoided"] += 1
+    return verdict, reason
+
+
+def get_prescreen_stats():
+    with _lock:
+        stats = dict(prescreen_stats)
+    total = stats[SAFE] + stats[DANGER] + stats[AMBIGUOUS]
+    stats["avoided_rate"] = round(stats["llm_calls_avoided"] / total, 4) if total else 0.0
+    return stats
@@ -0,0 +1,153 @@
+# security.py
+# 비밀번호 해싱 (공유 CryptContext + 동시 실행 제한) 및 로그인 실패 제한
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from passlib.context import CryptContext
+
+from cache import TTLCache, MISSING
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))            # 해시 비용 (바꾸면 다음 로그인 때 자동 재해시)
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))      # 동시에 계산할 해시 수
+HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 8))
+HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+
+LOGIN_FAILURE_WINDOW = int(os.getenv("LOGIN_FAILURE_WINDOW", 300))       # 실패 횟수를 세는 기간(초)
+LOGIN_MAX_FAILURES_PER_USER = int(os.getenv("LOGIN_MAX_FAILURES_PER_USER", 5))
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", 20))
+
+# min/max를 기본값과 같게 두면 비용이 다른 기존 해시는 needs_update로 판정됨 → 로그인 때 재해시
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+class HashingBusy(Exception):
+    """대기 중인 해시 계산이 너무 많거나 HASH_TIMEOUT 안에 끝나지 않음 (다른 요청을 굶기지 않도록 거절)"""
+    pass
+
+
+class PasswordHasher:
+    """
+    bcrypt 계산을 작은 전용 스레드 풀에서 실행
+    - 동시에 HASH_WORKERS개까지만 계산 → 로그인 폭주가 모든 워커 스레드를 CPU로 묶지 않음
+    - 대기열이 HASH_MAX_PENDING을 넘으면 즉시, HASH_TIMEOUT 안에 끝나지 않으면 그때 HashingBusy
+    """
+
+    def __init__(self, context=pwd_context, max_workers=HASH_WORKERS, max_pending=HASH_MAX_PENDING):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.rehashed = 0
+        self.total_seconds = 0.0
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingBusy("비밀번호 확인 요청이 너무 많습니다.")
+
+        started = time.perf_counter()
+        future = self._executor.submit(fn, *args)
+        # 타임아웃으로 먼저 반환하더라도 실제 계산이 끝날 때 슬롯을 돌려줌
+        future.add_done_callback(lambda f: self._slots.release())
+        try:
+            result = future.result(timeout=HASH_TIMEOUT)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise HashingBusy("비밀번호 확인이 지연되고 있습니다.") from None
+        with self._lock:
+            self.completed += 1
+            self.total_seconds += time.perf_counter() - started
+        return result
+
+    def after_fork(self):
+        """
+        fork된 워커에서 스레드 풀을 새로 만듦
+        (preload 중 마스터가 데모 계정 해시를 계산하면, 자식은 스레드 없는 풀을 물려받아 모든 로그인이 HASH_TIMEOUT까지 멈춤)
+        """
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+
+    def hash(self, password: str) -> str:
+        return self._run(self.context.hash, password)
+
+    def verify_and_update(self, password: str, hashed: str):
+        """반환값: (일치 여부, 새 해시 또는 None) - 비용이 바뀌었으면 새 해시를 돌려줌"""
+        ok, new_hash = self._run(self.context.verify_and_update, password, hashed)
+        if ok and new_hash:
+            with self._lock:
+                self.rehashed += 1
+        return ok, new_hash
+
+    def stats(self):
+        return {
+            "rounds": BCRYPT_ROUNDS,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "rehashed": self.rehashed,
+            "avg_ms": round(self.total_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+        }
+
+
+class LoginRateLimiter:
+    """
+    IP/아이디별 로그인 실패 횟수 제한 (해시 계산 전에 검사)
+    워커 프로세스마다 따로 세므로 실제 허용 횟수는 워커 수만큼 늘어날 수 있음
+    """
+
+    def __init__(self, window=LOGIN_FAILURE_WINDOW, max_per_user=LOGIN_MAX_FAILURES_PER_USER,
+                 max_per_ip=LOGIN_MAX_FAILURES_PER_IP):
+        self.window = window
+        self.limits = {"user": max_per_user, "ip": max_per_ip}
+        self._failures = TTLCache(maxsize=10000, ttl=window)  # (종류, 값) -> [실패 시각, ...]
+        self._lock = threading.Lock()
+        self.blocked = 0
+
+    def _recent(self, key, now):
+        times = self._failures.get(key)
+        if times is MISSING:
+            return []
+        return [t for t in times if now - t < self.window]
+
+    def is_blocked(self, ip: str, username: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            for kind, value in (("ip", ip), ("user", username)):
+                if value and len(self._recent((kind, value), now)) >= self.limits[kind]:
+                    self.blocked += 1
+                    return True
+        return False
+
+    def record_failure(self, ip: str, username: str):
+        now = time.monotonic()
+        with self._lock:
+            for kind, value in (("ip", ip), ("user", username)):
+                if value:
+                    key = (kind, value)
+                    self._failures.set(key, self._recent(key, now) + [now])
+
+    def reset(self, username: str):
+        self._failures.delete(("user", username))
+
+    def stats(self):
+        return {"tracked_keys": len(self._failures), "blocked": self.blocked}
+
+
+password_hasher = PasswordHasher()
+login_limiter = LoginRateLimiter()
@@ -0,0 +1,140 @@
+# services.py
+# 라우트(Flask 뷰, asgi_app.py 비동기 라우트, 백그라운드 작업)에서 공통으로 쓰는 비즈니스 로직
+from database import SessionLocal, FoodLog, bump_data_version
+from ai_service import analyze_food, analyze_food_async
+from analysis_cache import analysis_cache, make_cache_key, hash_image
+from analysis_schema import is_analysis_error
+from rollups import record_meals
+from user_context import user_context
+
+
+class AnalysisFailed(Exception):
+    """LLM 분석 실패 - 결과를 캐시하거나 FoodLog로 저장하지 않음"""
+    pass
+
+
+def get_analysis_profile(db, user_id: int) -> dict:
+    """분석 프롬프트에 들어가는 사용자 정보 (사용자 컨텍스트 캐시에서)"""
+    profile = user_context.get_profile(db, user_id)
+    return {
+        "diabetes_type": profile["diabetes_type"],
+        "health_goal": profile["health_goal"],
+        "age": profile["age"],
+        "gender": profile["gender"]
+    }
+
+
+async def run_db(fn, *args):
+    """
+    fn(db, *args)를 스레드 풀에서 새 세션으로 실행 (비동기 라우트용 - 이벤트 루프를 막지 않음)
+    비동기 DB 드라이버 없이 기존 동기 SQLAlchemy 코드를 그대로 공유
+    """
+    from anyio import to_thread
+
+    def run():
+        db = SessionLocal()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+    return await to_thread.run_sync(run)
+
+
+def _cached_analysis(db, user_id: int, text: str, img_bytes: bytes):
+    """(분석용 프로필, 캐시 키, 캐시된 결과 또는 None)"""
+    profile = get_analysis_profile(db, user_id)
+    # 같은 음식/사진 + 같은 프로필이면 캐시된 분석 결과를 재사용
+    cache_key = make_cache_key(text, hash_image(img_bytes), profile)
+    return profile, cache_key, analysis_cache.get(cache_key)
+
+
+def _save_analysis(db, user_id: int, text: str, upload: dict, result: dict):
+    img_bytes = upload.get("img_bytes")
+    log = FoodLog(
+        input_type="image" if img_bytes else "text",
+        food_description=result.get("food_name", text or "Unknown"),
+        blood_sugar_impact=result.get("blood_sugar_impact"),
+        carbs_ratio=result.get("carbs_ratio"),
+        protein_ratio=result.get("protein_ratio"),
+        fat_ratio=result.get("fat_ratio"),
+        summary=result.get("summary"),
+        action_guide=result.get("action_guide"),
+        detailed_action_guide=result.get("detailed_action_guide"),
+        alternatives=result.get("alternatives"),
+        image_path=upload.get("image_filename"),
+        thumbnail_path=upload.get("thumbnail_filename"),
+        owner_id=user_id
+    )
+    db.add(log)
+    db.flush()
+    record_meals(db, user_id, [log])
+    bump_data_version(db, user_id)
+    db.commit()
+    user_context.add_meals(user_id, [log])
+
+
+def _cache_and_save(db, user_id: int, text: str, upload: dict, result: dict, cache_key: str = None):
+    """새로 분석한 결과(cache_key가 있을 때)를 캐시에 쓰고 FoodLog 저장 - 둘 다 DB 쓰기라 비동기 경로에서는 한 번에 스레드 풀로"""
+    if cache_key is not None:
+        analysis_cache.set(cache_key, result)
+    _save_analysis(db, user_id, text, upload, result)
+
+
+def run_food_analysis(db, user_id: int, text: str = None, upload: dict = None, analyzer=None):
+    """
+    식단 분석 + FoodLog 저장
+    upload: app.save_upload()가 만든 업로드 정보 (img_bytes, image_mime, image_filename, thumbnail_filename)
+    analyzer: analyze_food와 같은 시그니처의 함수 (테스트에서는 가짜 LLM 함수를 넣을 수 있음)
+    반환값: (분석 결과 dict, 캐시 상태 "HIT"/"MISS")
+    분석에 실패하면 AnalysisFailed (아무것도 저장하지 않음)
+    """
+    analyzer = analyzer or analyze_food
+    upload = upload or {}
+    img_bytes = upload.get("img_bytes")
+    profile, cache_key, result = _cached_analysis(db, user_id, text, img_bytes)
+    cache_status = "HIT"
+    if result is None:
+        cache_status = "MISS"
+        # LLM을 기다리는 동안 커넥션을 잡고 있지 않도록 읽기 트랜잭션을 끝내 풀에 반환 (저장할 때 다시 받음)
+        db.rollback()
+        result = analyzer(text, img_bytes, profile, image_mime=upload.get("image_mime", "image/jpeg"))
+        if is_analysis_error(result):
+            raise AnalysisFailed(result.get("error") or "분석 실패")
+        analysis_cache.set(cache_key, result)
+
+    _save_analysis(db, user_id, text, upload, result)
+    return result, cache_status
+
+
+async def arun_food_analysis(user_id: int, text: str = None, upload: dict = None, analyzer=None):
+    """
+    run_food_analysis의 비동기 버전 - LLM 응답은 await로 기다리고 DB 작업만 스레드 풀에서 실행
+    (LLM을 기다리는 동안에는 DB 커넥션도 스레드도 잡고 있지 않음)
+    """
+    analyzer = analyzer or analyze_food_async
+    upload = upload or {}
+    img_bytes = upload.get("img_bytes")
+    profile, cache_key, result = await run_db(_cached_analysis, user_id, text, img_bytes)
+    cache_status = "HIT"
+    if result is None:
+        cache_status = "MISS"
+        result = await analyzer(text, img_bytes, profile, image_mime=upload.get("image_mime", "image/jpeg"))
+        if is_analysis_error(result):
+            raise AnalysisFailed(result.get("error") or "분석 실패")
+
+    # 캐시 저장도 동기 SQLAlchemy 쓰기 → 이벤트 루프가 아니라 스레드 풀에서
+    await run_db(_cache_and_save, user_id, text, upload, result, cache_key if cache_status == "MISS" else None)
+    return result, cache_status
+
+
+def get_chat_context(db, user_id: int):
+    """챗봇에 넘길 (프로필, 최근 식사 기록) - 사용자 컨텍스트 캐시에서 읽음"""
+    user = user_context.get_profile(db, user_id)
+    
+    profile = {
+        "diabetes_type": user["diabetes_type"] or "정보 없음",
+        "health_goal": user["health_goal"] or "일반 건강 관리"
+    }
+    
+    logs = user_context.get_recent_meals(db, user_id)
+    return profile, logs
@@ -0,0 +1,40 @@
+# startup.py
+# 워커 부팅 시간 측정 (import/초기화 단계별 소요 시간)
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_timings = {}  # 구성요소 이름 -> 소요 시간(초), 기록된 순서 유지
+_process_started = time.perf_counter()
+
+
+def record(component: str, seconds: float):
+    with _lock:
+        _timings[component] = _timings.get(component, 0.0) + seconds
+
+
+@contextmanager
+def timed(component: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(component, time.perf_counter() - started)
+
+
+def startup_report():
+    with _lock:
+        timings = dict(_timings)
+    return {
+        "pid": os.getpid(),
+        "components_ms": {name: round(seconds * 1000, 1) for name, seconds in timings.items()},
+        "total_ms": round(sum(seconds for name, seconds in timings.items()) * 1000, 1),
+    }
+
+
+def print_startup_report(label: str = "startup"):
+    report = startup_report()
+    parts = ", ".join(f"{name}={ms}ms" for name, ms in report["components_ms"].items())
+    print(f"⏱️ [{label}] pid={report['pid']} total={report['total_ms']}ms ({parts})")
@@ -9,13 +9,11 @@ function showTab(tabId) {
     const buttons = document.querySelectorAll('.tab-btn');
     if (tabId === 'analyze') {
         buttons[0].classList.add('active');
-        checkProfile();
+        loadDashboard();
     }
     if (tabId === 'history') {
         buttons[1].classList.add('active');
-        fetchHistory().then(() => {
-            fetchSugarLogs().then(() => initChart());
-        });
+        loadDashboard();
     }
     if (tabId === 'chat') buttons[2].classList.add('active');
 }
@@ -46,17 +44,24 @@ document.getElementById('analyze-form').onsubmit = async (e) => {
     const formData = new FormData(e.target);
 
     try {
-        const res = await fetch('/api/analyze', {
+        // 분석 작업을 제출하고 job_id로 결과를 폴링
+        const res = await fetch('/api/analyze/jobs', {
             method: 'POST',
             body: formData
         });
 
         const data = await res.json();
 
-        if (res.ok) {
-            displayResult(data);
-        } else {
+        if (!res.ok) {
             alert('분석에 실패했습니다: ' + (data.error || '알 수 없는 오류'));
+            return;
+        }
+
+        const job = await pollAnalysisJob(data.job_id);
+        if (job.status === 'done') {
+            displayResult(job.result);
+        } else {
+            alert('분석에 실패했습니다: ' + (job.error || '알 수 없는 오류'));
         }
     } catch (err) {
         alert('서버 연결 중 오류가 발생했습니다.');
@@ -66,6 +71,17 @@ document.getElementById('analyze-form').onsubmit = async (e) => {
     }
 };
 
+async function pollAnalysisJob(jobId, intervalMs = 1000, timeoutMs = 120000) {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+        const res = await fetch(`/api/analyze/jobs/${jobId}`);
+        const job = await res.json();
+        if (!res.ok || job.status === 'done' || job.status === 'error') return job;
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+    return { status: 'error', error: '분석 시간이 초과되었습니다.' };
+}
+
 function displayResult(r) {
     const resultDiv = document.getElementById('analysis-result');
     const impactClass = r.blood_sugar_impact.replace(' ', '_');
@@ -107,26 +123,80 @@ function displayResult(r) {
     resultDiv.classList.remove('hidden');
 }
 
-// History Fetching
-async function fetchHistory() {
+// Dashboard: 기록/혈당/프로필을 한 번에 받음
+// (서버가 ETag를 주므로 바뀐 게 없으면 브라우저가 304 응답을 받아 캐시된 본문을 그대로 돌려줌)
+async function loadDashboard() {
+    try {
+        const res = await fetch('/api/dashboard');
+        if (!res.ok) return;
+        const data = await res.json();
+
+        updateProfileReminder(data.profile);
+        renderHistory(data.history.items, data.history.next_cursor, false);
+        window.sugarData = data.sugar_series.points || [];
+        if (document.getElementById('history').classList.contains('active')) initChart();
+    } catch (err) {
+        document.getElementById('history-list').innerHTML = '<p style="text-align: center; color: var(--error); padding: 2rem;">기록을 불러오지 못했습니다.</p>';
+    }
+}
+
+// History Fetching (첫 페이지는 대시보드에서, 이후 페이지는 커서로)
+let historyNextCursor = null;
+
+async function fetchHistory(append = false) {
     const listDiv = document.getElementById('history-list');
 
     try {
-        const res = await fetch('/api/history');
+        const url = append && historyNextCursor
+            ? `/api/history?cursor=${encodeURIComponent(historyNextCursor)}`
+            : '/api/history';
+        const res = await fetch(url);
         const data = await res.json();
-        window.historyData = data; // Store for chart
+        renderHistory(data, res.headers.get('X-Next-Cursor'), append);
+        if (append && document.getElementById('history').classList.contains('active')) initChart();
+    } catch (err) {
+        listDiv.innerHTML = '<p style="text-align: center; color: var(--error); padding: 2rem;">기록을 불러오지 못했습니다.</p>';
+    }
+}
 
-        if (data.length === 0) {
-            listDiv.innerHTML = '<p style="text-align: center; color: var(--text-muted); padding: 2rem;">저장된 식단 기록이 없습니다.</p>';
-            return;
-        }
+function renderHistory(data, nextCursor, append) {
+    const listDiv = document.getElementById('history-list');
+    historyNextCursor = nextCursor;
 
-        listDiv.innerHTML = data.map((log, index) => `
+    const offset = append ? window.historyData.length : 0;
+    window.historyData = append ? window.historyData.concat(data) : data; // Store for chart
+
+    if (window.historyData.length === 0) {
+        listDiv.innerHTML = '<p style="text-align: center; color: var(--text-muted); padding: 2rem;">저장된 식단 기록이 없습니다.</p>';
+        return;
+    }
+
+    const itemsHtml = data.map((log, i) => renderHistoryItem(log, offset + i)).join('');
+    const moreBtn = document.getElementById('history-more');
+    if (moreBtn) moreBtn.remove();
+
+    if (append) {
+        listDiv.insertAdjacentHTML('beforeend', itemsHtml);
+    } else {
+        listDiv.innerHTML = itemsHtml;
+    }
+    if (historyNextCursor) {
+        listDiv.insertAdjacentHTML('beforeend', `
+            <button id="history-more" class="btn-more" onclick="fetchHistory(true)">
+                이전 기록 더 보기
+            </button>
+        `);
+    }
+    lucide.createIcons();
+}
+
+function renderHistoryItem(log, index) {
+    return `
             <div class="history-item" onclick="toggleHistoryDetail(${index})">
                 <div style="display: flex; gap: 1rem;">
                     ${log.image_path ? `
                         <div style="width: 60px; height: 60px; border-radius: 0.5rem; overflow: hidden; flex-shrink: 0;">
-                            <img src="/static/uploads/${log.image_path}" style="width: 100%; height: 100%; object-fit: cover;">
+                            <img src="/media/${log.thumbnail_path || log.image_path}" style="width: 100%; height: 100%; object-fit: cover;">
                         </div>
                     ` : `
                         <div style="width: 60px; height: 60px; border-radius: 0.5rem; background: var(--bg-dark); display: flex; align-items: center; justify-content: center; flex-shrink: 0;">
@@ -156,19 +226,7 @@ async function fetchHistory() {
                     </div>
                 </div>
             </div>
-        `).join('');
-        lucide.createIcons();
-    } catch (err) {
-        listDiv.innerHTML = '<p style="text-align: center; color: var(--error); padding: 2rem;">기록을 불러오지 못했습니다.</p>';
-    }
-}
-
-async function fetchSugarLogs() {
-    try {
-        const res = await fetch('/api/health/sugar');
-        const data = await res.json();
-        window.sugarData = data;
-    } catch (err) { }
+        `;
 }
 
 async function logSugar() {
@@ -190,7 +248,7 @@ async function logSugar() {
             levelInput.value = '';
             noteInput.value = '';
             alert('기록되었습니다.');
-            fetchSugarLogs().then(() => initChart());
+            loadDashboard();
         }
     } catch (err) {
         alert('저장에 실패했습니다.');
@@ -243,9 +301,9 @@ function initChart() {
             dataPoints = [0];
             labelName = '혈당 수치 (기록 없음)';
         } else {
-            const data = [...window.sugarData].reverse();
-            labels = data.map(l => l.created_at.split(' ')[0]);
-            dataPoints = data.map(l => l.sugar_level);
+            const data = window.sugarData;
+            labels = data.map(p => p.label);
+            dataPoints = data.map(p => p.avg);
             labelName = '혈당 수치 (mg/dL)';
         }
         borderColor = '#ef4444';
@@ -289,7 +347,8 @@ function initChart() {
 }
 
 // Chat Functionality
-let chatHistory = [];
+// 대화 기록은 서버에 저장됨 → 새 메시지와 대화 id만 보냄
+let conversationId = null;
 
 async function sendMessage() {
     const input = document.getElementById('chat-input');
@@ -299,27 +358,69 @@ async function sendMessage() {
     appendMessage('user', msg);
     input.value = '';
 
-    chatHistory.push({ role: 'user', content: msg });
-
     // Add pending message
     const pendingId = 'pending-' + Date.now();
     appendMessage('assistant', '<div class="spinner" style="width: 14px; height: 14px; margin: 0;"></div>', pendingId);
 
     try {
-        const res = await fetch('/api/chat', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ messages: chatHistory })
-        });
-
-        const data = await res.json();
-        document.getElementById(pendingId).innerHTML = data.reply;
-        chatHistory.push({ role: 'assistant', content: data.reply });
+        await streamChat(msg, pendingId);
     } catch (err) {
         document.getElementById(pendingId).innerHTML = '<span style="color: var(--error);">죄송합니다. 오류가 발생했습니다.</span>';
     }
 }
 
+// SSE 스트리밍으로 답변을 받아 토큰 단위로 말풍선에 표시
+async function streamChat(message, bubbleId) {
+    const res = await fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ conversation_id: conversationId, message: message })
+    });
+    if (!res.ok || !res.body) throw new Error('stream failed');
+
+    const bubble = document.getElementById(bubbleId);
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+    let reply = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const raw of events) {
+            const event = (raw.match(/^event: (.*)$/m) || [])[1];
+            const dataLine = (raw.match(/^data: (.*)$/m) || [])[1];
+            if (!event || !dataLine) continue;
+            const data = JSON.parse(dataLine);
+
+            if (event === 'conversation') {
+                conversationId = data.conversation_id;
+            } else if (event === 'token') {
+                text += data.text;
+                bubble.innerHTML = text;
+            } else if (event === 'node' && data.name === 'tools') {
+                bubble.innerHTML = (text || '') + '<div style="font-size: 0.75rem; color: var(--text-muted);">🔎 식당을 검색하고 있어요...</div>';
+            } else if (event === 'retract') {
+                // 안전 검사에서 위험 판정 → 방금 답변을 지우고 다시 생성되는 답변을 기다림
+                text = '';
+                bubble.innerHTML = '<div style="font-size: 0.75rem; color: var(--text-muted);">🩺 더 안전한 메뉴로 다시 추천하고 있어요...</div>';
+            } else if (event === 'done') {
+                reply = data.reply || text;
+                bubble.innerHTML = reply;
+            } else if (event === 'error') {
+                throw new Error(data.error);
+            }
+        }
+        document.getElementById('chat-messages').scrollTop = document.getElementById('chat-messages').scrollHeight;
+    }
+    return reply;
+}
+
 function appendMessage(role, content, id = null) {
     const container = document.getElementById('chat-messages');
     const div = document.createElement('div');
@@ -334,18 +435,14 @@ document.getElementById('chat-input').onkeypress = (e) => {
     if (e.key === 'Enter') sendMessage();
 };
 
-async function checkProfile() {
-    try {
-        const res = await fetch('/profile_data');
-        const data = await res.json();
-        const reminder = document.getElementById('profile-reminder');
-        if (!data.gender || !data.age) {
-            reminder.classList.remove('hidden');
-        } else {
-            reminder.classList.add('hidden');
-        }
-    } catch (err) { }
+function updateProfileReminder(profile) {
+    const reminder = document.getElementById('profile-reminder');
+    if (!profile.complete) {
+        reminder.classList.remove('hidden');
+    } else {
+        reminder.classList.add('hidden');
+    }
 }
 
-// Initial check
-checkProfile();
+// Initial load
+loadDashboard();
@@ -0,0 +1,310 @@
+# storage.py
+# 업로드 이미지 저장소 - 내용 해시(sha256)를 키로 써서 같은 사진은 한 번만 저장
+# - 키: "{sha256}{확장자}" - 확장자는 내용으로 판별 (FoodLog.image_path/thumbnail_path에 그대로 저장, /media/<키>로 제공)
+# - 참조 수는 FoodLog가 가리키는 키로 계산 → 아무 기록도 가리키지 않는 파일은 gc()로 정리
+# - 백엔드: 로컬 디스크(기본) 또는 S3 호환 저장소 (boto3 패키지가 있을 때만, MinIO 등은 STORAGE_S3_ENDPOINT로)
+import io
+import os
+import re
+import time
+import hashlib
+import tempfile
+import threading
+import mimetypes
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")                # local 또는 s3
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "static/uploads")
+STORAGE_S3_BUCKET = os.getenv("STORAGE_S3_BUCKET")
+STORAGE_S3_PREFIX = os.getenv("STORAGE_S3_PREFIX", "uploads/")
+STORAGE_S3_ENDPOINT = os.getenv("STORAGE_S3_ENDPOINT")                 # S3 호환 저장소 주소 (비우면 AWS)
+STORAGE_CHUNK_SIZE = int(os.getenv("STORAGE_CHUNK_SIZE", 64 * 1024))  # 스트리밍 저장 단위 (바이트)
+STORAGE_GC_GRACE = int(os.getenv("STORAGE_GC_GRACE", 3600))           # 방금 저장돼 아직 FoodLog에 없는 파일 보호(초)
+
+# 키가 곧 내용이므로 브라우저/CDN이 영원히 캐시해도 됨
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 키 확장자는 업로드 파일명이 아니라 내용(파일 앞부분의 매직 바이트)으로 정함
+# → 같은 사진을 a.jpg / a.jpeg / 확장자 없이 올려도 키가 하나 (jpeg는 .jpg로 통일)
+_MAGIC_EXTENSIONS = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+_HEIF_BRANDS = {b"heic", b"heix", b"heim", b"heis", b"hevc", b"hevx", b"mif1", b"msf1"}
+SNIFF_BYTES = 16
+
+_CONTENT_KEY = re.compile(r"^[0-9a-f]{64}(\.[a-z0-9]{1,5})?$")
+# 이전 방식 파일명 ({token_hex}_{secure_filename}) - 기존 기록도 계속 제공/정리할 수 있도록 허용
+_LEGACY_KEY = re.compile(r"^[0-9a-f]{16}_[A-Za-z0-9._-]+$")
+
+
+def is_valid_key(key: str) -> bool:
+    return bool(key) and ".." not in key and bool(_CONTENT_KEY.match(key) or _LEGACY_KEY.match(key))
+
+
+def content_type(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+def sniff_extension(head: bytes) -> str:
+    """파일 앞부분(SNIFF_BYTES) → 키에 붙일 확장자 (알 수 없는 형식이면 붙이지 않음)"""
+    for magic, ext in _MAGIC_EXTENSIONS:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    if head[4:8] == b"ftyp" and head[8:12] in _HEIF_BRANDS:
+        return ".heic"
+    return ""
+
+
+class LocalBackend:
+    """로컬 디스크 - 내용 키는 앞 2글자로 하위 폴더를 나눠 한 폴더에 파일이 몰리지 않게 함"""
+
+    name = "local"
+
+    def __init__(self, root=STORAGE_LOCAL_ROOT):
+        self.root = root
+        # 임시 파일을 같은 파일 시스템에 두어야 os.replace가 원자적으로 동작
+        self.tmp_dir = os.path.join(root, ".tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        if _CONTENT_KEY.match(key):
+            return os.path.join(self.root, key[:2], key)
+        return os.path.join(self.root, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put_file(self, key: str, tmp_path: str):
+        """임시 파일을 키 위치로 옮김 (같은 키를 동시에 저장해도 내용이 같으므로 마지막 것이 남아도 무방)"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+    def touch(self, key: str):
+        # 중복 업로드로 재사용한 파일은 GC 유예 시간을 다시 시작 (FoodLog 저장 전에 지워지지 않도록)
+        os.utime(self._path(key))
+
+    def open(self, key: str):
+        return open(self._path(key), "rb")
+
+    def local_path(self, key: str) -> str:
+        return self._path(key)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self):
+        """(키, 수정 시각, 크기) - .tmp는 제외"""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d != ".tmp"]
+            for filename in filenames:
+                if not is_valid_key(filename):
+                    continue
+                stat = os.stat(os.path.join(dirpath, filename))
+                yield filename, stat.st_mtime, stat.st_size
+
+
+class S3Backend:
+    """
+    S3 호환 저장소
+    client: boto3 S3 클라이언트와 같은 메서드(head_object, upload_file, copy_object, get_object,
+            delete_object, list_objects_v2)를 가진 객체 - 테스트에서는 로컬 대역(MinIO 등)이나 가짜 객체를 넣으면 됨
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket=STORAGE_S3_BUCKET, prefix=STORAGE_S3_PREFIX, endpoint_url=STORAGE_S3_ENDPOINT,
+                 client=None):
+        if client is None:
+            import boto3
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        if not bucket:
+            raise ValueError("STORAGE_S3_BUCKET이 설정되지 않았습니다.")
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.tmp_dir = tempfile.gettempdir()
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    @staticmethod
+    def _not_found(e: Exception) -> bool:
+        code = str(getattr(e, "response", {}).get("Error", {}).get("Code", ""))
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except Exception as e:
+            if self._not_found(e):
+                return False
+            raise
+
+    def put_file(self, key: str, tmp_path: str):
+        try:
+            self.client.upload_file(tmp_path, self.bucket, self._key(key),
+                                    ExtraArgs={"ContentType": content_type(key),
+                                               "CacheControl": IMMUTABLE_CACHE_CONTROL})
+        finally:
+            os.remove(tmp_path)
+
+    def touch(self, key: str):
+        # 자기 자신으로 복사하면 LastModified가 갱신됨
+        self.client.copy_object(Bucket=self.bucket, Key=self._key(key), MetadataDirective="REPLACE",
+                                CopySource={"Bucket": self.bucket, "Key": self._key(key)},
+                                ContentType=content_type(key), CacheControl=IMMUTABLE_CACHE_CONTROL)
+
+    def open(self, key: str):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+        except Exception as e:
+            if self._not_found(e):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def local_path(self, key: str):
+        return None
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def list(self):
+        kwargs = {"Bucket": self.bucket, "Prefix": self.prefix}
+        while True:
+            page = self.client.list_objects_v2(**kwargs)
+            for obj in page.get("Contents", []):
+                key = obj["Key"][len(self.prefix):]
+                if is_valid_key(key):
+                    yield key, obj["LastModified"].timestamp(), obj["Size"]
+            if not page.get("IsTruncated"):
+                return
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+
+class UploadStorage:
+    """
+    내용 주소 저장소
+    - save_stream: 요청 본문을 청크 단위로 임시 파일에 쓰면서 해시 계산 → 이미 있는 키면 임시 파일만 버림
+    - gc: FoodLog가 가리키지 않고 유예 시간이 지난 파일 삭제
+    """
+
+    def __init__(self, backend, chunk_size=STORAGE_CHUNK_SIZE):
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.dedup_hits = 0
+        self.bytes_written = 0
+        self.bytes_deduplicated = 0
+        self.gc_deleted = 0
+
+    def save_stream(self, stream) -> dict:
+        """반환값: {"key", "size", "deduplicated"}"""
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        fd, tmp_path = tempfile.mkstemp(dir=self.backend.tmp_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    if len(head) < SNIFF_BYTES:
+                        head += chunk[:SNIFF_BYTES - len(head)]
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+
+            key = f"{digest.hexdigest()}{sniff_extension(head)}"
+            deduplicated = self.backend.exists(key)
+            if deduplicated:
+                os.remove(tmp_path)
+                self.backend.touch(key)
+            else:
+                self.backend.put_file(key, tmp_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            if deduplicated:
+                self.dedup_hits += 1
+                self.bytes_deduplicated += size
+            else:
+                self.writes += 1
+                self.bytes_written += size
+        return {"key": key, "size": size, "deduplicated": deduplicated}
+
+    def save_bytes(self, data: bytes) -> dict:
+        return self.save_stream(io.BytesIO(data))
+
+    def open(self, key: str):
+        return self.backend.open(key)
+
+    def local_path(self, key: str):
+        """로컬 백엔드면 파일 경로 (send_file이 Range/조건부 요청을 처리), 아니면 None"""
+        return self.backend.local_path(key)
+
+    def referenced_keys(self, db) -> set:
+        """FoodLog가 가리키는 키 (원본 + 썸네일)"""
+        from database import FoodLog
+
+        keys = set()
+        rows = db.query(FoodLog.image_path, FoodLog.thumbnail_path).filter(
+            (FoodLog.image_path.isnot(None)) | (FoodLog.thumbnail_path.isnot(None))
+        ).yield_per(1000)
+        for image_path, thumbnail_path in rows:
+            keys.update(k for k in (image_path, thumbnail_path) if k)
+        return keys
+
+    def gc(self, db, grace: int = STORAGE_GC_GRACE, dry_run: bool = False) -> dict:
+        """참조 없는 파일 정리. 반환값: {"scanned", "referenced", "deleted", "freed_bytes"}"""
+        referenced = self.referenced_keys(db)
+        cutoff = time.time() - grace
+        scanned = deleted = freed = 0
+        for key, mtime, size in list(self.backend.list()):
+            scanned += 1
+            if key in referenced or mtime > cutoff:
+                continue
+            if not dry_run:
+                self.backend.delete(key)
+            deleted += 1
+            freed += size
+        if not dry_run:
+            with self._lock:
+                self.gc_deleted += deleted
+        return {"scanned": scanned, "referenced": len(referenced), "deleted": deleted, "freed_bytes": freed}
+
+    def stats(self):
+        return {
+            "backend": self.backend.name,
+            "writes": self.writes,
+            "dedup_hits": self.dedup_hits,
+            "bytes_written": self.bytes_written,
+            "bytes_deduplicated": self.bytes_deduplicated,
+            "gc_deleted": self.gc_deleted,
+        }
+
+
+def _load_backend():
+    if STORAGE_BACKEND == "s3":
+        try:
+            backend = S3Backend()
+            print(f"✅ [Storage] S3 저장소 사용 (bucket={backend.bucket})")
+            return backend
+        except Exception as e:
+            print(f"⚠️ [Storage] S3 사용 불가, 로컬 디스크 사용: {e}")
+    return LocalBackend()
+
+
+upload_storage = UploadStorage(_load_backend())
@@ -0,0 +1,32 @@
+# tests/conftest.py
+# 저장소 루트의 평평한 모듈(app.py, safety_rules.py 등)을 그대로 import할 수 있게 경로 추가
+# 모듈이 import 시점에 환경 변수를 읽으므로(DB 주소, 업로드 폴더) 테스트용 임시 경로를 먼저 지정
+import os
+import sys
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="diet-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP, 'test.db')}")
+os.environ.setdefault("STORAGE_LOCAL_ROOT", os.path.join(_TMP, "uploads"))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def db():
+    """테스트용 DB 세션 (스키마는 첫 사용 때 생성, 테스트가 만든 행은 끝나면 지움)"""
+    from database import init_db, SessionLocal, Base
+
+    init_db()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for table in reversed(Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
+        session.close()
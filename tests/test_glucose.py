@@ -0,0 +1,41 @@
+# tests/test_glucose.py
+# 혈당 측정값 저장 - 단건(POST /api/health/sugar)과 일괄(/bulk) 저장이 같은 시각을 같은 값으로 저장하는지
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from database import HealthLog, User
+from glucose import reading_time
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    user = User(username="glucose-tester", hashed_password="x")
+    db.add(user)
+    db.commit()
+    monkeypatch.setattr(app_module, "get_kst_now", lambda: datetime(2026, 3, 2, 8, 30, 15, 654321))
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = user.id
+    yield client
+    app_module.db_session.remove()
+
+
+def test_reading_time_drops_microseconds():
+    assert reading_time(datetime(2026, 3, 2, 8, 30, 15, 654321)) == datetime(2026, 3, 2, 8, 30, 15)
+
+
+def test_single_and_bulk_share_precision(client, db):
+    assert client.post("/api/health/sugar", json={"sugar_level": 110}).status_code == 200
+    assert db.query(HealthLog.created_at).scalar() == datetime(2026, 3, 2, 8, 30, 15)
+
+    # CGM 기록의 같은 초(밀리초만 다름)는 이미 저장된 측정값으로 봄
+    resp = client.post("/api/health/sugar/bulk",
+                       json=[{"timestamp": "2026-03-02T08:30:15.200", "sugar_level": 112}])
+    assert resp.get_json()["duplicates"] == 1 and resp.get_json()["inserted"] == 0
+
+
+def test_single_reading_in_same_second_is_conflict(client):
+    assert client.post("/api/health/sugar", json={"sugar_level": 110}).status_code == 200
+    assert client.post("/api/health/sugar", json={"sugar_level": 115}).status_code == 409
@@ -0,0 +1,106 @@
+# tests/test_job_queue.py
+# 분석 작업 큐 (job_queue.py) - runner에 가짜 분석 함수를 넣어 LLM 없이 확인
+import asyncio
+import threading
+from datetime import timedelta
+
+import pytest
+
+from database import SessionLocal, AnalysisJob, get_kst_now
+from job_queue import AnalysisJobQueue, JobQueueFull, sweep_jobs
+
+
+def _drain(queue):
+    """스레드 풀에 넣은 작업이 모두 끝날 때까지 기다림"""
+    queue._executor.shutdown(wait=True)
+
+
+def test_backpressure_rejects_and_releases_slots(db):
+    gate = threading.Event()
+
+    def runner(payload):
+        gate.wait(5)
+        return {"food_name": payload["text"]}
+
+    queue = AnalysisJobQueue(runner, max_workers=1, max_pending=2)
+    first = queue.submit(1, {"text": "김밥"})
+    queue.submit(1, {"text": "라면"})
+    with pytest.raises(JobQueueFull):
+        queue.submit(1, {"text": "떡볶이"})
+    assert queue.stats()["rejected"] == 1
+
+    gate.set()
+    _drain(queue)
+    stats = queue.stats()
+    assert stats["queue_depth"] == 0 and stats["running"] == 0 and stats["completed"] == 2
+    assert queue.get(first, 1) == {"job_id": first, "status": "done", "result": {"food_name": "김밥"}}
+    assert queue.get(first, 2) is None  # 다른 사용자의 작업은 보이지 않음
+
+
+def test_runner_error_marks_job_and_frees_slot(db):
+    def runner(payload):
+        raise RuntimeError("LLM 응답 없음")
+
+    queue = AnalysisJobQueue(runner, max_workers=1, max_pending=1)
+    job_id = queue.submit(1, {})
+    _drain(queue)
+    assert queue.get(job_id, 1) == {"job_id": job_id, "status": "error", "error": "LLM 응답 없음"}
+    stats = queue.stats()
+    assert stats["failed"] == 1 and stats["running"] == 0 and stats["queue_depth"] == 0
+
+
+def test_status_write_failure_still_frees_slot(db):
+    class BrokenUpdates(AnalysisJobQueue):
+        def _update(self, job_id, **fields):
+            raise RuntimeError("database is locked")
+
+    queue = BrokenUpdates(lambda payload: {}, max_workers=1, max_pending=1)
+    queue.submit(1, {})
+    _drain(queue)
+    assert queue.stats()["running"] == 0 and queue.stats()["queue_depth"] == 0
+
+
+def test_reservation_is_returned_when_block_fails(db):
+    queue = AnalysisJobQueue(lambda payload: {}, max_workers=1, max_pending=1)
+    with pytest.raises(ValueError):
+        with queue.reserve():
+            raise ValueError("업로드 저장 실패")
+    assert queue.stats()["queue_depth"] == 0
+
+    with queue.reserve():
+        # 자리를 잡은 동안에는 다른 요청이 업로드를 저장하기 전에 거절됨
+        with pytest.raises(JobQueueFull):
+            with queue.reserve():
+                pass
+    assert queue.stats()["queue_depth"] == 0
+
+
+def test_asubmit_runs_on_event_loop(db):
+    async def arunner(payload):
+        return {"food_name": payload["text"]}
+
+    queue = AnalysisJobQueue(None, arunner=arunner, max_workers=1, max_pending=1)
+
+    async def main():
+        job_id = await queue.asubmit(1, {"text": "비빔밥"})
+        await asyncio.gather(*queue._tasks)
+        return job_id
+
+    job_id = asyncio.run(main())
+    assert queue.get(job_id, 1)["result"] == {"food_name": "비빔밥"}
+    assert queue.stats()["completed"] == 1 and queue.stats()["queue_depth"] == 0
+
+
+def test_sweep_fails_abandoned_and_deletes_expired_jobs(db):
+    now = get_kst_now()
+    db.add_all([
+        AnalysisJob(id="a" * 32, owner_id=1, status="running", created_at=now - timedelta(hours=1)),
+        AnalysisJob(id="b" * 32, owner_id=1, status="queued", created_at=now),
+        AnalysisJob(id="c" * 32, owner_id=1, status="done", created_at=now - timedelta(days=2)),
+    ])
+    db.commit()
+
+    assert sweep_jobs(SessionLocal, ttl=86400, stale_after=900) == {"failed": 1, "expired": 1}
+    db.expire_all()
+    jobs = {job.id[0]: job.status for job in db.query(AnalysisJob)}
+    assert jobs == {"a": "error", "b": "queued"}  # 방금 들어온 작업은 다른 워커가 처리 중일 수 있어 그대로 둠
@@ -0,0 +1,60 @@
+# tests/test_model_router.py
+# 모델 등급 라우팅 정책 (model_router.py) - 입력만 보고 결정하므로 LLM 없이 확인
+import pytest
+
+from model_router import ModelRouter, analysis_looks_confident
+
+TIERS = {"small": "mini-model", "large": "big-model"}
+
+
+@pytest.fixture
+def router():
+    return ModelRouter(tiers=TIERS, enabled=True)
+
+
+@pytest.mark.parametrize("text, has_image, tier, reason", [
+    ("삶은 계란 2개", False, "small", "short_text"),
+    ("  바나나 하나  ", False, "small", "short_text"),
+    ("", True, "large", "image"),
+    ("삶은 계란 2개", True, "large", "image"),
+    ("아침에 현미밥 반 공기와 된장찌개, 시금치나물, 고등어구이 한 토막을 먹었어요", False, "large", "long_text"),
+])
+def test_route_analysis(router, text, has_image, tier, reason):
+    route = router.route_analysis(text, has_image)
+    assert (route["tier"], route["reason"]) == (tier, reason)
+    assert route["model"] == TIERS[tier]
+
+
+@pytest.mark.parametrize("message, tier, reason", [
+    ("안녕하세요!", "small", "short"),
+    ("강남역 근처 저당 식당 알려줘", "large", "tools_likely"),
+    ("맛집", "large", "tools_likely"),
+    ("혈당이 오후마다 조금씩 오르는데 저녁 식단을 어떻게 바꾸면 좋을까요?", "large", "long"),
+])
+def test_route_chat(router, message, tier, reason):
+    route = router.route_chat(message)
+    assert (route["tier"], route["reason"]) == (tier, reason)
+
+
+def test_disabled_routing_always_uses_large_model():
+    router = ModelRouter(tiers=TIERS, enabled=False)
+    for route in (router.route_analysis("계란", False), router.route_chat("안녕"), router.route_safety()):
+        assert route["tier"] == "large" and route["reason"] == "routing_disabled"
+
+
+def test_escalation_rate_in_stats(router):
+    routes = [router.route_analysis("계란", False) for _ in range(4)]
+    router.escalate(routes[0], "ratio_sum")
+    stats = router.stats()["kinds"]["analysis"]
+    assert stats["small"] == 4 and stats["escalations"] == 1 and stats["escalation_rate"] == 0.25
+
+
+@pytest.mark.parametrize("ratios, confident", [
+    ((50, 30, 20), True),
+    ((60, 30, 20), True),    # 합 110 - 허용 범위 안
+    ((80, 30, 20), False),   # 합 130
+    ((None, None, None), False),
+])
+def test_analysis_looks_confident(ratios, confident):
+    result = dict(zip(("carbs_ratio", "protein_ratio", "fat_ratio"), ratios))
+    assert analysis_looks_confident(result) is confident
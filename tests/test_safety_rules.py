@@ -0,0 +1,39 @@
+# tests/test_safety_rules.py
+# 안전 검사 1차 규칙 판정표 (classify_answer) - LLM 없이 실행
+import pytest
+
+from safety_rules import classify_answer, SAFE, DANGER, AMBIGUOUS
+
+DAY = "12시 30분"
+NIGHT = "23시 10분"
+
+
+@pytest.mark.parametrize("answer, current_time, user_text, expected", [
+    # 낮: 위험 단어가 없거나 시스템 프롬프트가 권하는 메뉴만 있으면 LLM 검사 생략
+    ("오늘은 두부 샐러드와 닭가슴살 어떠세요?", DAY, "", SAFE),
+    ("저녁은 생선구이 정식과 회덮밥을 추천해요.", "18시 00분", "", SAFE),
+    ("현미 비빔밥 한 그릇이면 충분해요.", DAY, "", SAFE),
+    # 낮이라도 목록의 식사 메뉴를 권하면 '강력 추천' 여부는 LLM이 판단
+    ("점심으로 짜장면 곱빼기와 탕수육을 강력 추천해요!", DAY, "", AMBIGUOUS),
+    ("라면에 공기밥 말아 드세요", "13시 00분", "", AMBIGUOUS),
+    ("후식으로 케이크 한 조각 드세요", DAY, "", AMBIGUOUS),
+    # 야식 시간: 경고 문맥 없이 식사 메뉴 추천은 규칙만으로 DANGER
+    ("야식으로 국밥 한 그릇 어떠세요?", NIGHT, "", DANGER),
+    ("저녁은 생선구이 정식", "22시 00분", "", DANGER),
+    ("낮 12시라도 야식이면 피자 추천", DAY, "야식 추천해줘", DANGER),
+    # 야식 시간에 피하라고 말하는 문맥은 애매함
+    ("밤에는 라면은 피하시고 따뜻한 두유를 드세요.", NIGHT, "", AMBIGUOUS),
+    # 야식 시간에 목록에 없는 음식 → 안전하다고 단정하지 않고 LLM 검사로
+    ("삼겹살에 공기밥 한 그릇 어떠세요?", NIGHT, "", AMBIGUOUS),
+    ("탕수육이나 김치찌개 추천드려요!", NIGHT, "", AMBIGUOUS),
+    ("따뜻한 우유 한 잔 드시고 주무세요.", NIGHT, "", AMBIGUOUS),
+])
+def test_classify_answer(answer, current_time, user_text, expected):
+    verdict, reason = classify_answer(answer, current_time, user_text)
+    assert verdict == expected, reason
+
+
+def test_night_answer_without_lexicon_hit_is_never_safe():
+    for answer in ("족발 대신 보쌈 추천해요", "순대국 어떠세요", "치즈 듬뿍 나초 추천!", ""):
+        verdict, _ = classify_answer(answer, "01시 20분")
+        assert verdict != SAFE
@@ -0,0 +1,146 @@
+# tests/test_storage.py
+# 내용 주소 저장소 (storage.py) - 로컬 디스크 백엔드를 임시 폴더로
+import io
+from datetime import datetime, timezone
+
+import pytest
+from PIL import Image
+
+from storage import UploadStorage, LocalBackend, S3Backend, sniff_extension, is_valid_key
+
+
+def _jpeg_bytes(color="green"):
+    buf = io.BytesIO()
+    Image.new("RGB", (32, 32), color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+class _NotFound(Exception):
+    def __init__(self):
+        super().__init__("404")
+        self.response = {"Error": {"Code": "404"}}
+
+
+class FakeS3Client:
+    """S3Backend가 쓰는 boto3 메서드만 흉내 낸 메모리 저장소"""
+
+    def __init__(self):
+        self.objects = {}  # key -> (bytes, LastModified)
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise _NotFound()
+        return {}
+
+    def upload_file(self, path, bucket, key, ExtraArgs=None):
+        with open(path, "rb") as f:
+            self.objects[key] = (f.read(), datetime.now(timezone.utc))
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self.objects[Key] = (self.objects[CopySource["Key"]][0], datetime.now(timezone.utc))
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise _NotFound()
+        return {"Body": io.BytesIO(self.objects[Key][0])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken=None):
+        keys = sorted(k for k in self.objects if k.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + 2]  # 페이지 넘김도 확인되도록 작게
+        return {
+            "Contents": [{"Key": k, "LastModified": self.objects[k][1], "Size": len(self.objects[k][0])}
+                         for k in page],
+            "IsTruncated": start + 2 < len(keys),
+            "NextContinuationToken": str(start + 2),
+        }
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return UploadStorage(LocalBackend(root=str(tmp_path)), chunk_size=7)
+
+
+def test_same_bytes_stored_once_regardless_of_filename(storage):
+    data = _jpeg_bytes()
+    first = storage.save_stream(io.BytesIO(data))    # a.jpg
+    second = storage.save_stream(io.BytesIO(data))   # a.jpeg / 확장자 없는 파일명이어도 내용이 같으면 같은 키
+    assert first["key"] == second["key"]
+    assert first["key"].endswith(".jpg")
+    assert not first["deduplicated"] and second["deduplicated"]
+    assert [key for key, _, _ in storage.backend.list()] == [first["key"]]
+    assert storage.stats()["dedup_hits"] == 1
+
+
+def test_chunked_hash_matches_content(storage):
+    import hashlib
+
+    data = _jpeg_bytes()
+    stored = storage.save_bytes(data)
+    assert stored["key"] == hashlib.sha256(data).hexdigest() + ".jpg"
+    assert stored["size"] == len(data)
+    with storage.open(stored["key"]) as f:
+        assert f.read() == data
+
+
+@pytest.mark.parametrize("head, ext", [
+    (b"\xff\xd8\xff\xe0\x00\x10JFIF", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n\x00\x00", ".png"),
+    (b"GIF89a\x01\x00", ".gif"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", ".webp"),
+    (b"\x00\x00\x00\x18ftypheic\x00\x00", ".heic"),
+    (b"not an image", ""),
+])
+def test_sniff_extension(head, ext):
+    assert sniff_extension(head) == ext
+
+
+def test_key_validation_rejects_traversal():
+    assert is_valid_key("a" * 64 + ".jpg")
+    assert not is_valid_key("../" + "a" * 64)
+    assert not is_valid_key("")
+
+
+def _save_food_log(db, image_key):
+    from database import FoodLog
+
+    db.add(FoodLog(food_description="김밥", image_path=image_key, owner_id=1))
+    db.commit()
+
+
+@pytest.mark.parametrize("backend", ["local", "s3"])
+def test_gc_keeps_referenced_and_recent_files(db, tmp_path, backend):
+    if backend == "s3":
+        storage = UploadStorage(S3Backend(bucket="test", prefix="uploads/", client=FakeS3Client()))
+    else:
+        storage = UploadStorage(LocalBackend(root=str(tmp_path)))
+    kept = storage.save_bytes(_jpeg_bytes("green"))["key"]
+    orphans = [storage.save_bytes(_jpeg_bytes(color))["key"] for color in ("red", "blue")]
+    _save_food_log(db, kept)
+
+    # 유예 시간 안쪽이면 참조가 없어도 남김 (방금 올라와 아직 FoodLog에 없는 파일)
+    assert storage.gc(db, grace=3600)["deleted"] == 0
+
+    dry = storage.gc(db, grace=0, dry_run=True)
+    assert dry["deleted"] == 2 and len(list(storage.backend.list())) == 3
+
+    result = storage.gc(db, grace=0)
+    assert result["scanned"] == 3 and result["deleted"] == 2
+    assert [key for key, _, _ in storage.backend.list()] == [kept]
+    for key in orphans:
+        with pytest.raises(FileNotFoundError):
+            storage.open(key)
+
+
+def test_s3_dedup_refreshes_last_modified():
+    client = FakeS3Client()
+    storage = UploadStorage(S3Backend(bucket="test", prefix="uploads/", client=client))
+    data = _jpeg_bytes()
+    key = storage.save_bytes(data)["key"]
+    client.objects["uploads/" + key] = (data, datetime(2000, 1, 1, tzinfo=timezone.utc))
+
+    assert storage.save_bytes(data)["deduplicated"]
+    assert client.objects["uploads/" + key][1].year > 2000  # 다시 올라온 파일은 gc 유예 시간이 새로 시작됨
@@ -0,0 +1,75 @@
+# tests/test_stub_servers.py
+# 부하 테스트용 가짜 OpenAI/카카오 서버 (benchmarks/stub_servers.py) - 실제 클라이언트가 그대로 읽을 수 있는 응답인지 확인
+import json
+import urllib.request
+
+import pytest
+from openai import OpenAI
+
+from benchmarks.stub_servers import StubConfig, ANALYSIS_RESULT, CHAT_REPLY, start_stub_server
+
+
+@pytest.fixture(scope="module")
+def stub():
+    # 서버는 모듈에서 하나만 띄우고, StubConfig(클래스 속성)는 끝나면 원래 값으로 되돌림
+    saved = {name: getattr(StubConfig, name)
+             for name in ("openai_latency", "kakao_latency", "jitter", "small_failure_rate")}
+    server, port = start_stub_server(openai_latency_ms=0, kakao_latency_ms=0, jitter=0)
+    yield port
+    server.shutdown()
+    server.server_close()
+    for name, value in saved.items():
+        setattr(StubConfig, name, value)
+
+
+def _client(port):
+    return OpenAI(base_url=f"http://127.0.0.1:{port}/v1", api_key="stub", max_retries=0)
+
+
+def test_analysis_json_response(stub):
+    response = _client(stub).chat.completions.create(model="gpt-4o", messages=[
+        {"role": "system", "content": "식단을 분석해 JSON으로 답하세요."},
+        {"role": "user", "content": "제육볶음"},
+    ])
+    assert json.loads(response.choices[0].message.content) == ANALYSIS_RESULT
+    assert response.usage.total_tokens > 0
+
+
+def test_streaming_reassembles_reply_with_usage(stub):
+    stream = _client(stub).chat.completions.create(
+        model="gpt-4o", stream=True, stream_options={"include_usage": True},
+        messages=[{"role": "user", "content": "저녁 뭐 먹을까요?"}])
+    text, usage = "", None
+    for chunk in stream:
+        if chunk.choices:
+            text += chunk.choices[0].delta.content or ""
+        if chunk.usage:
+            usage = chunk.usage
+    assert text == CHAT_REPLY
+    assert usage is not None and usage.completion_tokens > 0
+
+
+def test_tool_call_for_station_question(stub):
+    tools = [{"type": "function", "function": {"name": "search_restaurants", "parameters": {"type": "object"}}}]
+    response = _client(stub).chat.completions.create(
+        model="gpt-4o", tools=tools, messages=[{"role": "user", "content": "강남역 근처 식당"}])
+    call = response.choices[0].message.tool_calls[0]
+    assert call.function.name == "search_restaurants"
+    assert json.loads(call.function.arguments)["location"] == "강남역"
+
+
+def test_small_model_failure_injection(stub, monkeypatch):
+    monkeypatch.setattr(StubConfig, "small_failure_rate", 1.0)
+    messages = [{"role": "system", "content": "JSON으로 답하세요."}, {"role": "user", "content": "계란"}]
+    small = _client(stub).chat.completions.create(model="gpt-4o-mini", messages=messages)
+    large = _client(stub).chat.completions.create(model="gpt-4o", messages=messages)
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(small.choices[0].message.content)  # 잘린 JSON → 앱이 큰 모델로 에스컬레이션해야 함
+    assert json.loads(large.choices[0].message.content) == ANALYSIS_RESULT
+
+
+def test_kakao_keyword_search(stub):
+    url = f"http://127.0.0.1:{stub}/v2/local/search/keyword.json?query=%EC%83%9D%EC%84%A0%EA%B5%AC%EC%9D%B4&size=2"
+    with urllib.request.urlopen(url) as resp:
+        data = json.loads(resp.read())
+    assert [doc["place_name"] for doc in data["documents"]] == ["생선구이 1호점", "생선구이 2호점"]
@@ -0,0 +1,172 @@
+# user_context.py
+# 사용자 프로필 + 최근 식사 기록 캐시 (AI 요청마다 User/FoodLog를 다시 조회하지 않도록)
+import os
+import json
+import threading
+from collections import deque
+from datetime import datetime
+
+from cache import TTLCache, MISSING
+from database import FoodLog, User
+
+USER_CONTEXT_TTL = int(os.getenv("USER_CONTEXT_TTL", 300))              # 초 (메모리 캐시일 때 다른 워커의 수정이 반영되기까지 최대 시간)
+USER_CONTEXT_MAX_USERS = int(os.getenv("USER_CONTEXT_MAX_USERS", 5000))
+RECENT_MEALS_SIZE = 5                                                   # 챗봇 프롬프트에 넣는 최근 식사 수
+REDIS_URL = os.getenv("REDIS_URL")                                      # 설정하면 모든 워커가 같은 캐시를 씀
+
+PROFILE_FIELDS = ("gender", "age", "height", "weight", "diabetes_type", "fasting_sugar",
+                  "hba1c", "activity_level", "health_goal")
+
+
+class _RedisBackend:
+    """여러 워커가 공유하는 캐시 (redis 패키지가 있을 때만 사용)"""
+
+    def __init__(self, url, ttl):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(user_id):
+        return f"user_context:{user_id}"
+
+    def get(self, user_id):
+        raw = self._redis.get(self._key(user_id))
+        return json.loads(raw) if raw else MISSING
+
+    def set(self, user_id, context):
+        self._redis.set(self._key(user_id), json.dumps(context, ensure_ascii=False), ex=self.ttl)
+
+    def delete(self, user_id):
+        self._redis.delete(self._key(user_id))
+
+
+def _load_backend():
+    if not REDIS_URL:
+        return None
+    try:
+        backend = _RedisBackend(REDIS_URL, USER_CONTEXT_TTL)
+        print("✅ [UserContext] Redis 공유 캐시 사용")
+        return backend
+    except Exception as e:
+        print(f"⚠️ [UserContext] Redis 사용 불가, 프로세스 메모리 캐시만 사용: {e}")
+        return None
+
+
+def _meal_entry(meal):
+    get = meal.get if isinstance(meal, dict) else lambda name: getattr(meal, name)
+    return {"created_at": get("created_at").isoformat(), "desc": get("food_description")}
+
+
+class UserContextCache:
+    """
+    user_id -> {"profile": {...}, "recent_meals": [{"created_at", "desc"}, ...최신순]}
+    - 프로필 수정 시 invalidate(), 식사 저장 시 add_meals()로 최근 식사 링 버퍼를 갱신
+    - REDIS_URL이 있으면 Redis만 사용 (모든 워커가 같은 항목을 보므로 수정이 즉시 반영)
+    - REDIS_URL이 없으면 워커별 메모리 캐시 (다른 워커의 수정은 TTL 안에 반영)
+    """
+
+    def __init__(self, maxsize=USER_CONTEXT_MAX_USERS, ttl=USER_CONTEXT_TTL, backend=None):
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._shared = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _load(self, db, user_id):
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            return None
+        recent = db.query(FoodLog.created_at, FoodLog.food_description)\
+                   .filter(FoodLog.owner_id == user_id)\
+                   .order_by(FoodLog.created_at.desc(), FoodLog.id.desc())\
+                   .limit(RECENT_MEALS_SIZE).all()
+        return {
+            "profile": {field: getattr(user, field) for field in PROFILE_FIELDS},
+            "recent_meals": [_meal_entry(row._asdict()) for row in recent],
+        }
+
+    def _get_cached(self, user_id):
+        # 공유 캐시가 있으면 워커 메모리에 복사해 두지 않음 → 다른 워커의 invalidate/add_meals가 바로 보임
+        if self._shared is None:
+            return self._memory.get(user_id)
+        try:
+            return self._shared.get(user_id)
+        except Exception as e:
+            print(f"⚠️ [UserContext] 공유 캐시 조회 실패: {e}")
+            return MISSING
+
+    def _store(self, user_id, context):
+        if self._shared is None:
+            self._memory.set(user_id, context)
+            return
+        try:
+            self._shared.set(user_id, context)
+        except Exception as e:
+            print(f"⚠️ [UserContext] 공유 캐시 저장 실패: {e}")
+
+    def get(self, db, user_id: int):
+        """캐시된 컨텍스트 (없으면 DB에서 읽어 채움). 사용자가 없으면 None"""
+        context = self._get_cached(user_id)
+        with self._lock:
+            if context is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if context is MISSING:
+            context = self._load(db, user_id)
+            if context is not None:
+                self._store(user_id, context)
+        return context
+
+    def get_profile(self, db, user_id: int):
+        context = self.get(db, user_id)
+        return dict(context["profile"]) if context else None
+
+    def get_recent_meals(self, db, user_id: int):
+        """챗봇 프롬프트용 [{"time": "HH:MM", "desc": ...}] (최신순)"""
+        context = self.get(db, user_id)
+        if not context:
+            return []
+        return [{"time": datetime.fromisoformat(m["created_at"]).strftime("%H:%M"), "desc": m["desc"]}
+                for m in context["recent_meals"]]
+
+    def add_meals(self, user_id: int, meals: list):
+        """
+        새로 저장한 식사(FoodLog 또는 같은 키의 dict)를 최근 식사 링 버퍼에 반영
+        캐시에 없는 사용자는 건드리지 않음 (다음 조회 때 DB에서 읽음)
+        """
+        with self._lock:
+            context = self._get_cached(user_id)
+            if context is MISSING:
+                return
+            # 과거 시각으로 가져온 기록도 있으므로 오래된 순으로 합쳐 넣으면 링 버퍼에는 최근 N개만 남음
+            merged = sorted(context["recent_meals"] + [_meal_entry(m) for m in meals],
+                            key=lambda m: m["created_at"])
+            ring = deque(merged, maxlen=RECENT_MEALS_SIZE)
+            self._store(user_id, {"profile": context["profile"], "recent_meals": list(reversed(ring))})
+
+    def invalidate(self, user_id: int):
+        self._memory.delete(user_id)
+        if self._shared is not None:
+            try:
+                self._shared.delete(user_id)
+            except Exception as e:
+                print(f"⚠️ [UserContext] 공유 캐시 삭제 실패: {e}")
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis" if self._shared is not None else "memory",
+            "entries": len(self._memory) if self._shared is None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+user_context = UserContextCache(backend=_load_backend())